@@ -0,0 +1,85 @@
+"""Shunting-yard evaluator vs. the previous ``ast.parse`` walk in ``parse_mathematical_expression``.
+
+    python benchmarks/bench_math.py [--rounds 2000]
+
+The baseline below is the pre-evaluator implementation, kept here only for comparison.
+"""
+import argparse
+import ast
+import operator
+import os
+import sys
+import time
+from typing import Optional, cast
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'bench')
+
+from utils import parser  # noqa: E402
+
+SAMPLES = [
+    "2+2", "100*3", "(100 + 50) * 2", "1500/3", "12х4", "10÷4", "-5+10", "2.5*4-1",
+    "((1+2)*(3+4))/5", "1000000*1000", "1+" * 40 + "1", "08:30", "5/0", "2**3",
+]
+
+
+def ast_evaluate(expr: str) -> Optional[float]:
+    ops = {
+        ast.Add: operator.add, ast.Sub: operator.sub,
+        ast.Mult: operator.mul, ast.Div: operator.truediv,
+    }
+
+    def _safe_eval(node: ast.AST) -> float:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        elif isinstance(node, ast.BinOp) and type(node.op) in ops:
+            left = _safe_eval(cast(ast.AST, node.left))
+            right = _safe_eval(cast(ast.AST, node.right))
+            if isinstance(node.op, ast.Div) and right == 0:
+                raise ValueError("Division by zero")
+            return ops[type(node.op)](left, right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -_safe_eval(cast(ast.AST, node.operand))
+        raise ValueError("Unsafe expression")
+
+    try:
+        expr = expr.replace('х', '*').replace('×', '*')
+        expr = expr.replace('÷', '/').replace(':', '/')
+        expr = expr.replace(' ', '')
+
+        allowed_chars = '0123456789+-*/().'
+        if not all(c in allowed_chars for c in expr):
+            return None
+
+        tree = ast.parse(expr, mode='eval')
+        return _safe_eval(tree.body)
+    except (SyntaxError, ValueError, TypeError, ZeroDivisionError, OverflowError):
+        return None
+
+
+def bench(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for sample in SAMPLES:
+            func(sample)
+    return (time.perf_counter() - started) / (rounds * len(SAMPLES)) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rounds', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    for sample in SAMPLES:
+        new, old = parser._parse_mathematical_expression(sample), ast_evaluate(sample)
+        if new != old:
+            print(f"differs: {sample!r}: shunting-yard={new} ast={old}")
+
+    ast_us = bench(ast_evaluate, args.rounds)
+    yard_us = bench(parser._parse_mathematical_expression, args.rounds)
+    print(f"{'ast.parse walk':<16}{ast_us:8.2f} us/expression")
+    print(f"{'shunting-yard':<16}{yard_us:8.2f} us/expression  ({ast_us / yard_us:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
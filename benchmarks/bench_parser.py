@@ -0,0 +1,107 @@
+"""Single-pass lexer vs. the previous regex pipeline in ``parse_amount_and_currency``.
+
+    python benchmarks/bench_parser.py [--rounds 2000]
+
+The baseline below is the pre-lexer implementation (currency alternation search + sub,
+one regex per multiplier word, then a number scan), kept here only for comparison.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'bench')
+
+from utils import parser  # noqa: E402
+from utils.currency_lexicon import CURRENCY_LEXICON  # noqa: E402
+
+SAMPLES = [
+    "100 usd", "$50", "5к рублей", "1 млн рублей", "10 000 тенге", "0.5 btc", "€200",
+    "USD 100", "10,982 KZT", "1.000,50 eur", "(100 + 50) * 2 usd", "-10 USD",
+    "сибирские пельмехи 4 евро 3кг", "сколько будет 250 долларов в рублях",
+    "привет, как дела?", "https://example.com/pay?amount=100 usd", "index.php?100",
+    "12345", "ok", "lol 😂", "2.5k eur and 100 rub", "3 ляма рублей",
+]
+
+_REGEX_PARTS = []
+for _pattern, _ in sorted(CURRENCY_LEXICON.patterns.items(), key=lambda x: len(x[0]), reverse=True):
+    _prefix = r'(?<!\w)' if re.match(r'^\w', _pattern) else ''
+    _suffix = r'(?!\w)' if re.search(r'\w$', _pattern) else ''
+    _REGEX_PARTS.append(rf'{_prefix}{re.escape(_pattern.lower())}{_suffix}')
+_CURRENCY_REGEX = re.compile('|'.join(_REGEX_PARTS), re.IGNORECASE)
+_MULTIPLIER_REGEXES = {
+    re.compile(rf'(\d+(?:[.,]\d+)?)\s*{txt}\b', re.IGNORECASE): val for txt, val in parser._MULTIPLIERS.items()
+}
+_FIND_NUMBERS_REGEX = re.compile(r'[-+]?(?:\d(?:\d|[.,]|\s(?=\d{3}))*\d|\d|[.,]\d+)(?:[eE][-+]?\d+)?')
+
+
+def regex_parse(text):
+    if not text:
+        return None, None
+    text = text.replace('−', '-').replace('–', '-').replace('—', '-').replace('‑', '-')
+    if parser._QUERY_LIKE_TEXT_REGEX.search(text):
+        return None, None
+    text_lower = parser._URL_REGEX.sub('', text).strip().lower()
+    match = _CURRENCY_REGEX.search(text_lower)
+    currency = CURRENCY_LEXICON.patterns.get(match.group(0)) if match else None
+    if not currency:
+        return None, None
+    amount_text = _CURRENCY_REGEX.sub('', text_lower).strip()
+    if any(op in amount_text for op in '+-*/()^х×÷:'):
+        result = parser.parse_mathematical_expression(amount_text)
+        if result is not None and parser._is_valid_amount(result):
+            return result, currency
+    for mult_pattern, mult_value in _MULTIPLIER_REGEXES.items():
+        match = mult_pattern.search(amount_text)
+        if match:
+            try:
+                amount = float(parser.smart_number_parse(match.group(1))) * mult_value
+            except ValueError:
+                continue
+            if parser._is_valid_amount(amount):
+                return amount, currency
+    for number_str in _FIND_NUMBERS_REGEX.findall(amount_text):
+        try:
+            amount = float(parser.smart_number_parse(number_str))
+        except ValueError:
+            continue
+        if parser._is_valid_amount(amount):
+            return amount, currency
+    return None, None
+
+
+def lexer_parse(text):
+    request = parser._parse_conversion_request(text)
+    return (request.amount, request.source) if request else (None, None)
+
+
+def bench(func, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for sample in SAMPLES:
+            func(sample)
+    return (time.perf_counter() - started) / (rounds * len(SAMPLES)) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rounds', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    for sample in SAMPLES:
+        new, old = lexer_parse(sample), regex_parse(sample)
+        if new != old:
+            print(f"differs: {sample!r}: lexer={new} regex={old}")
+
+    regex_us = bench(regex_parse, args.rounds)
+    lexer_us = bench(lexer_parse, args.rounds)
+    memo_us = bench(parser.parse_amount_and_currency, args.rounds)
+    print(f"{'regex pipeline':<18}{regex_us:8.2f} us/message")
+    print(f"{'single-pass lexer':<18}{lexer_us:8.2f} us/message  ({regex_us / lexer_us:.1f}x)")
+    print(f"{'memoized lexer':<18}{memo_us:8.2f} us/message  ({regex_us / memo_us:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
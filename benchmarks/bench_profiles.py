@@ -0,0 +1,75 @@
+"""Bytes per cached user: slot profiles with currency masks vs. the previous dicts.
+
+    python benchmarks/bench_profiles.py [--users 100000]
+
+Each cached entry is built the way ``get_user_data`` used to store it (a dict with lists of
+codes and date strings, as read from SQLite) and the way it stores it now (``UserProfile``).
+Memory is measured with tracemalloc, including the id keys of the cache dict.
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'bench')
+
+from config.config import ACTIVE_CURRENCIES, CRYPTO_CURRENCIES  # noqa: E402
+from data.profiles import UserProfile, encode_currencies, encode_day, encode_language  # noqa: E402
+
+
+def rows(count: int):
+    rng = random.Random(0)
+    for user_id in range(10_000_000, 10_000_000 + count):
+        day = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        currencies = ','.join(rng.sample(ACTIVE_CURRENCIES, 5))
+        crypto = ','.join(rng.sample(CRYPTO_CURRENCIES, 5))
+        yield user_id, (rng.randint(0, 5000), day, day, rng.choice(('ru', 'en')), 1, currencies, crypto)
+
+
+def as_dict(row) -> dict:
+    interactions, last_seen, first_seen, language, use_quote, currencies_str, crypto_str = row
+    return {
+        "interactions": interactions,
+        "last_seen": last_seen,
+        "selected_currencies": currencies_str.split(','),
+        "selected_crypto": crypto_str.split(','),
+        "language": language,
+        "first_seen": first_seen,
+        "use_quote_format": bool(use_quote),
+    }
+
+
+def as_profile(row) -> UserProfile:
+    interactions, last_seen, first_seen, language, use_quote, currencies_str, crypto_str = row
+    return UserProfile(
+        interactions, encode_day(last_seen), encode_day(first_seen), encode_language(language),
+        bool(use_quote), encode_currencies(currencies_str.split(',')), encode_currencies(crypto_str.split(',')),
+    )
+
+
+def measure(build, count: int) -> float:
+    # Rows are generated under tracing like fresh SQLite rows; whatever the cache does
+    # not keep alive is freed again, so the traced size is what the cache holds.
+    tracemalloc.start()
+    cache = {user_id: build(row) for user_id, row in rows(count)}
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(cache) == count
+    return size / count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--users', type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    old = measure(as_dict, args.users)
+    new = measure(as_profile, args.users)
+    print(f"{'dict profile':<16}{old:8.0f} B/user")
+    print(f"{'slot profile':<16}{new:8.0f} B/user  ({old / new:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Rate refresh latency and fallback behaviour against the local provider stand-in.
+
+    python benchmarks/bench_refresh.py [--rounds 20] [--port 8089]
+
+Runs without network: every provider URL points at ``utils.provider_standin``.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+_parser.add_argument('--rounds', type=int, default=20)
+_parser.add_argument('--port', type=int, default=8089)
+ARGS = _parser.parse_args()
+
+# Provider URLs are resolved at import time, so the switch must be set before importing the bot modules.
+os.environ['RATES_STANDIN'] = f"127.0.0.1:{ARGS.port}"
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'bench')
+os.environ.setdefault('COINCAP_API_KEY', 'standin')
+os.environ['RATES_CACHE_PATH'] = ''
+os.environ['RATES_HISTORY_DIR'] = ''
+
+import aiohttp  # noqa: E402
+import numpy as np  # noqa: E402
+
+import utils.http as http  # noqa: E402
+import utils.rates as rates  # noqa: E402
+from utils.provider_standin import PROVIDERS, ProviderStandin  # noqa: E402
+
+SCENARIOS = {
+    'healthy': {},
+    'slow primary': {'open.er-api': {'latency': 1.5, 'latency_sigma': 0.1}},
+    'primary 429': {'open.er-api': {'rate_limit': 1, 'retry_after': 1}},
+    'malformed fiat': {'open.er-api': {'malformed': 1}, 'exchangerate-api': {'malformed': 0.5}},
+    'partial coverage': {'open.er-api': {'coverage': 0.6}, 'coingecko': {'coverage': 0.5}},
+    'flaky everything': {name: {'error_rate': 0.3, 'latency_sigma': 1.0} for name in PROVIDERS},
+    'fiat outage': {name: {'error_rate': 1} for name in ('open.er-api', 'exchangerate-api', 'fawazahmed')},
+}
+
+
+def _reset():
+    http._validator_cache.clear()
+    http._circuit_breakers.clear()
+    rates.cache.clear()
+    rates._class_fetched_at.clear()
+    for provider in rates.provider_registry.ordered():
+        rates.provider_registry._stats[provider.name] = rates.ProviderStats()
+
+
+async def _run_scenario(standin: ProviderStandin, name: str, overrides: dict, rounds: int):
+    _reset()
+    for provider, behaviour in standin.behaviour.items():
+        behaviour.update({'latency': 0.05, 'latency_sigma': 0.5, 'rate_limit': 0, 'error_rate': 0,
+                          'malformed': 0, 'coverage': 1})
+        behaviour.update(overrides.get(provider, {}))
+        standin.stats[provider].clear()
+
+    wanted = len(rates.ACTIVE_CURRENCIES) + len(rates.CRYPTO_CURRENCIES)
+    latencies, coverage = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = await rates._fetch_rates_unlocked()
+        latencies.append(time.perf_counter() - started)
+        coverage.append(len(result) / wanted)
+        rates.cache.clear()
+
+    lat = np.array(latencies) * 1000
+    requests = sum(sum(s.values()) for s in standin.stats.values())
+    print(f"{name:<18} p50 {np.percentile(lat, 50):7.1f}ms  p95 {np.percentile(lat, 95):7.1f}ms  "
+          f"coverage {min(coverage):6.1%}  upstream requests/refresh {requests / rounds:5.1f}")
+
+
+async def main():
+    logging.basicConfig(level=logging.CRITICAL)
+    standin = ProviderStandin(seed=0)
+    runners = await standin.start('127.0.0.1', ARGS.port)
+    http.set_http_session(aiohttp.ClientSession())
+    try:
+        for name, overrides in SCENARIOS.items():
+            await _run_scenario(standin, name, overrides, ARGS.rounds)
+    finally:
+        await http.close_http_session()
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
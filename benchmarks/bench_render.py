@@ -0,0 +1,203 @@
+"""Precompiled reply templates vs. the previous per-call string building.
+
+    python benchmarks/bench_render.py [--rounds 2000]
+
+Rates are converted once up front, so only rendering is timed. The baseline below is the
+pre-template rendering code (including the old ``format_large_number``), kept here only
+for comparison.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'bench')
+
+from config.languages import LANGUAGES  # noqa: E402
+from utils.formatter import currency_label, format_large_number, get_currency_symbol  # noqa: E402
+from utils.rates import RateSnapshot  # noqa: E402
+from utils.templates import amount_head, get_template  # noqa: E402
+
+RATES = {'USD': 1.0, 'EUR': 0.92, 'RUB': 92.5, 'KZT': 480.0, 'UAH': 41.2, 'GBP': 0.79, 'BTC': 1 / 65000, 'ETH': 1 / 3400}
+FIAT = ['USD', 'EUR', 'RUB', 'KZT', 'UAH', 'GBP']
+CRYPTO = ['BTC', 'ETH']
+AMOUNTS = [1, 100, 2500, 12.5, 1000000]
+
+
+def old_format_large_number(number, is_crypto=False, is_original_amount=False):
+    if abs(number) > 1e100:
+        return "♾️ Infinity"
+
+    sign = "-" if number < 0 else ""
+    number = abs(number)
+    
+    if is_original_amount:
+        if number == int(number):
+            return f"{sign}{int(number):,}".replace(',', ' ')
+        else:
+            if 0 < number < 1e-10:
+                tiny = f"{sign}{number:.18f}".rstrip('0').rstrip('.')
+                if tiny != f"{sign}0":
+                    return tiny
+                return f"{sign}{number:.2e}"
+            formatted = f"{sign}{number:,.10f}".rstrip('0').rstrip('.')
+            parts = formatted.split('.')
+            if len(parts) == 2:
+                return parts[0].replace(',', ' ') + '.' + parts[1]
+            return parts[0].replace(',', ' ')
+    
+    if is_crypto:
+        if number == 0:
+            return "0"
+        elif number < 0.00000001:
+            return f"{sign}{number:.2e}"
+        elif number < 0.01:
+            return f"{sign}{number:.8f}".rstrip('0').rstrip('.')
+        elif number < 1:
+            return f"{sign}{number:.6f}".rstrip('0').rstrip('.')
+        elif number < 1000:
+            return f"{sign}{number:.4f}".rstrip('0').rstrip('.')
+        elif number < 1000000:
+            return f"{sign}{number:,.2f}"
+        elif number < 1000000000:
+            return f"{sign}{number/1000000:.3f}M"
+        elif number < 1000000000000:
+            return f"{sign}{number/1000000000:.3f}B"
+        else:
+            return f"{sign}{number:.2e}"
+    else:
+        if number == 0:
+            return "0"
+        if number < 0.01:
+            return f"{sign}{number:.6f}".rstrip('0').rstrip('.')
+        if number < 1:
+            return f"{sign}{number:.4f}".rstrip('0').rstrip('.')
+        return f"{sign}{number:,.2f}"
+
+
+def old_conversion_lines(from_currency, targets, row, valid, is_crypto=False):
+    return [
+        f"{old_format_large_number(value, is_crypto)} {get_currency_symbol(to_cur)}{to_cur}"
+        for to_cur, value, ok in zip(targets, row, valid)
+        if ok and to_cur != from_currency
+    ]
+
+
+def old_render_single(rows, amount, from_currency, user_lang, use_quote):
+    fiat_conversions, crypto_conversions = rows
+    response_parts = [
+        f"{old_format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n"
+    ]
+    response_parts.append(f"\n{LANGUAGES[user_lang]['fiat_currencies']}\n")
+    if use_quote:
+        response_parts.append("<blockquote expandable>" + "\n".join(fiat_conversions) + "</blockquote>")
+    else:
+        response_parts.append("\n".join(fiat_conversions))
+    response_parts.append(f"\n\n{LANGUAGES[user_lang]['cryptocurrencies_output']}\n")
+    if use_quote:
+        response_parts.append("<blockquote expandable>" + "\n".join(crypto_conversions) + "</blockquote>")
+    else:
+        response_parts.append("\n".join(crypto_conversions))
+    return "".join(response_parts).strip()
+
+
+def old_render_inline(rows, amount, from_currency, user_lang, use_quote):
+    fiat_lines, crypto_lines = rows
+    result_content = f"{old_format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n\n"
+    result_content += f"<b>{LANGUAGES[user_lang].get('fiat_currencies', 'Fiat currencies')}</b>\n\n"
+    if use_quote:
+        result_content += "<blockquote expandable>"
+    for line in fiat_lines:
+        result_content += f"{line}\n"
+    if use_quote:
+        result_content += "</blockquote>"
+    result_content += "\n"
+    result_content += f"<b>{LANGUAGES[user_lang].get('cryptocurrencies_output', 'Cryptocurrencies')}</b>\n\n"
+    if use_quote:
+        result_content += "<blockquote expandable>"
+    for line in crypto_lines:
+        result_content += f"{line}\n"
+    if use_quote:
+        result_content += "</blockquote>"
+    return result_content
+
+
+def converted_rows(snapshot):
+    results, valid = snapshot.convert_many(AMOUNTS, ['USD'] * len(AMOUNTS), FIAT + CRYPTO)
+    return list(zip(AMOUNTS, results.tolist(), valid.tolist()))
+
+
+def build_lines(line_builder, row, ok):
+    split = len(FIAT)
+    return line_builder('USD', FIAT, row[:split], ok[:split]), line_builder('USD', CRYPTO, row[split:], ok[split:], True)
+
+
+def new_conversion_lines(from_currency, targets, row, valid, is_crypto=False):
+    return [
+        f"{format_large_number(value, is_crypto)} {currency_label(to_cur)}"
+        for to_cur, value, ok in zip(targets, row, valid)
+        if ok and to_cur != from_currency
+    ]
+
+
+def run_old(rows, user_lang, use_quote):
+    out = []
+    for amount, row, ok in rows:
+        lines = build_lines(old_conversion_lines, row, ok)
+        out.append(old_render_single(lines, amount, 'USD', user_lang, use_quote))
+        out.append(old_render_inline(lines, amount, 'USD', user_lang, use_quote))
+    return out
+
+
+def run_new(rows, user_lang, use_quote):
+    template = get_template(user_lang, use_quote)
+    out = []
+    for amount, row, ok in rows:
+        fiat_lines, crypto_lines = build_lines(new_conversion_lines, row, ok)
+        head = amount_head(amount, 'USD')
+        out.append(template.single(head, fiat_lines, crypto_lines, True, True))
+        out.append(template.inline(head, fiat_lines, crypto_lines, True, True))
+    return out
+
+
+def bench(func, rows, rounds):
+    started = time.perf_counter()
+    for i in range(rounds):
+        func(rows, 'ru' if i % 2 else 'en', bool(i % 3))
+    return (time.perf_counter() - started) / (rounds * len(AMOUNTS) * 2) * 1e6
+
+
+def bench_format(func, rounds):
+    # Fiat values and whole original amounts: the magnitudes the fast path covers.
+    values = [(v, False, False) for v in (1.5, 12.5, 1234.56, 98765.4321, 1e6)] + [(v, False, True) for v in (1, 100, 5000.0)]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for value, is_crypto, is_original in values:
+            func(value, is_crypto, is_original)
+    return (time.perf_counter() - started) / (rounds * len(values)) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--rounds', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    rows = converted_rows(RateSnapshot(RATES, 1, time.time()))
+    for lang in LANGUAGES:
+        for use_quote in (False, True):
+            if run_old(rows, lang, use_quote) != run_new(rows, lang, use_quote):
+                print(f"output differs for {lang}, quote={use_quote}")
+
+    old_us = bench(run_old, rows, args.rounds)
+    new_us = bench(run_new, rows, args.rounds)
+    old_fmt = bench_format(old_format_large_number, args.rounds * 10)
+    new_fmt = bench_format(format_large_number, args.rounds * 10)
+    print(f"{'reply (old)':<22}{old_us:8.2f} us/reply")
+    print(f"{'reply (templates)':<22}{new_us:8.2f} us/reply  ({old_us / new_us:.2f}x)")
+    print(f"{'format (old)':<22}{old_fmt:8.3f} us/number (common magnitudes)")
+    print(f"{'format (fast path)':<22}{new_fmt:8.3f} us/number  ({old_fmt / new_fmt:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import os
+import socket
+import urllib.parse
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,12 +24,38 @@ if not COINCAP_API_KEY:
 DB_PATH = os.getenv('DB_PATH', 'otc.db')
 DB_BACKUP_INTERVAL_HOURS = int(os.getenv('DB_BACKUP_INTERVAL_HOURS', '24'))  # 0 disables backups
 DB_BACKUP_KEEP = int(os.getenv('DB_BACKUP_KEEP', '3'))
+# Last published rates, reloaded at startup so conversions work before the first fetch. Empty disables.
+RATES_CACHE_PATH = os.getenv('RATES_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'rates_cache.json'))
+RATES_CACHE_MAX_AGE = int(os.getenv('RATES_CACHE_MAX_AGE', '86400'))  # seconds; older files are ignored
+# Columnar history of every published rate set (one memory-mapped file per currency). Empty disables.
+RATES_HISTORY_DIR = os.getenv('RATES_HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'rates_history'))
+# Shared-memory rate snapshot for multi-process deployments: one 'writer' refreshes and publishes,
+# 'reader' workers only read the segment and never call the rate providers. Empty disables.
+RATES_SHM_NAME = os.getenv('RATES_SHM_NAME', '')
+RATES_SHM_ROLE = os.getenv('RATES_SHM_ROLE', 'reader')
+
+# Leader election between instances sharing DB_PATH: only the lease holder refreshes rates and runs backups.
+INSTANCE_ID = os.getenv('INSTANCE_ID', f"{socket.gethostname()}:{os.getpid()}")
+LEADER_LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS', '30'))
+LEADER_RENEW_INTERVAL = int(os.getenv('LEADER_RENEW_INTERVAL', '10'))
 
 CURRENT_VERSION = "1.8.3"
 
 # Cache
 CACHE_EXPIRATION_TIME = 600  # seconds
 STALE_WHILE_REVALIDATE = 300  # seconds
+# Per asset class refresh cadence and freshness (seconds): fiat sources update hourly, crypto every minute
+FIAT_REFRESH_INTERVAL = int(os.getenv('FIAT_REFRESH_INTERVAL', '1800'))
+FIAT_RATES_TTL = int(os.getenv('FIAT_RATES_TTL', '3600'))
+CRYPTO_REFRESH_INTERVAL = int(os.getenv('CRYPTO_REFRESH_INTERVAL', '120'))
+CRYPTO_RATES_TTL = int(os.getenv('CRYPTO_RATES_TTL', '300'))
+REFRESH_JITTER = 0.1  # fraction of the interval
+REFRESH_ERROR_BACKOFF = 30  # seconds, doubles per failure up to the interval
+REPLY_CACHE_SIZE = int(os.getenv('REPLY_CACHE_SIZE', '4096'))  # rendered replies kept per rate snapshot
+INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.25'))  # seconds an inline query waits for the next keystroke
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '5000'))  # user profiles kept in memory (LRU)
+CHAT_CACHE_SIZE = int(os.getenv('CHAT_CACHE_SIZE', '1000'))  # chat profiles kept in memory (LRU)
+PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '8192'))  # memoized parse results per parser function
 MIN_CONVERSION_AMOUNT = float(os.getenv('MIN_CONVERSION_AMOUNT', '0.0001'))
 MAX_CONVERSION_AMOUNT = float(os.getenv('MAX_CONVERSION_AMOUNT', '1000000000000'))
 
@@ -35,9 +63,29 @@ MAX_CONVERSION_AMOUNT = float(os.getenv('MAX_CONVERSION_AMOUNT', '1000000000000'
 HTTP_TOTAL_TIMEOUT = 5
 HTTP_CONNECT_TIMEOUT = 2
 HTTP_RETRIES = 2
+HTTP_HEDGE_DELAY = float(os.getenv('HTTP_HEDGE_DELAY', '1.0'))  # seconds before hedging a provider without latency samples
 HTTP_CONNECTOR_LIMIT = int(os.getenv('HTTP_CONNECTOR_LIMIT', '200'))
 HTTP_CONNECTOR_LIMIT_PER_HOST = int(os.getenv('HTTP_CONNECTOR_LIMIT_PER_HOST', '20'))
 HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # consecutive failed attempts per host
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))  # doubles on each failed half-open probe
+CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv('CIRCUIT_MAX_OPEN_SECONDS', '600'))
+# Rate provider endpoints. RATES_STANDIN=host:port points them at the local stand-in server
+# (python -m utils.provider_standin), one port per provider so breakers and semaphores stay per provider.
+RATES_STANDIN = os.getenv('RATES_STANDIN', '').strip()
+PROVIDER_URLS = {
+    'open.er-api': 'https://open.er-api.com/v6/latest/USD',
+    'exchangerate-api': 'https://api.exchangerate-api.com/v4/latest/USD',
+    'fawazahmed': 'https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json',
+    'coingecko': 'https://api.coingecko.com/api/v3/simple/price',
+    'coincap': 'https://rest.coincap.io/v3/assets',
+}
+if RATES_STANDIN:
+    _standin_host, _, _standin_port = RATES_STANDIN.rpartition(':')
+    PROVIDER_URLS = {
+        name: f"http://{_standin_host or '127.0.0.1'}:{int(_standin_port) + i}{urllib.parse.urlparse(url).path}"
+        for i, (name, url) in enumerate(PROVIDER_URLS.items())
+    }
 SEMAPHORE_LIMITS = {
     'open.er-api.com': 5,
     'api.coingecko.com': 3,
@@ -1,5 +1,5 @@
 import logging
-from typing import Any, List, Protocol
+from typing import List, Optional, Protocol
 
 import asyncio
 
@@ -7,32 +7,36 @@ from aiosqlite import IntegrityError
 import aiosqlite
 
 from config.config import ACTIVE_CURRENCIES, CRYPTO_CURRENCIES
+from data.known_ids import KnownIds
+from data.profiles import ChatProfile, decode_currencies, decode_language, encode_currencies, encode_language
+from utils.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
 
 class _ChatRepoDeps(Protocol):
-    chat_data: dict[int, dict[str, Any]]
+    chat_data: LRUCache
+    known_chats: KnownIds
     _write_lock: asyncio.Lock
 
     async def _ensure_chat(self, chat_id: int): ...
+    async def _load_chat_profile(self, chat_id: int) -> Optional[ChatProfile]: ...
     async def _get_read_conn(self) -> aiosqlite.Connection: ...
     async def _get_write_conn(self) -> aiosqlite.Connection: ...
-    def _cleanup_cache_if_needed(self) -> None: ...
 
 
 class ChatRepoMixin:
     async def _ensure_chat(self: _ChatRepoDeps, chat_id: int):
-        if chat_id in self.chat_data:
+        if chat_id in self.known_chats:
             return
 
         async with self._write_lock:
-            if chat_id in self.chat_data:
+            if chat_id in self.known_chats:
                 return
             conn = await self._get_write_conn()
             async with conn.execute("SELECT chat_id FROM chats WHERE chat_id=?", (chat_id,)) as cursor:
                 if await cursor.fetchone() is not None:
-                    self.chat_data.setdefault(chat_id, {})
+                    self.known_chats.add(chat_id)
                     return
             default_currencies = ACTIVE_CURRENCIES[:5]
             default_crypto = CRYPTO_CURRENCIES[:5]
@@ -43,23 +47,24 @@ class ChatRepoMixin:
                 crypto_data = [(chat_id, s) for s in default_crypto]
                 await conn.executemany("INSERT OR IGNORE INTO chat_crypto(chat_id, symbol) VALUES(?, ?)", crypto_data)
                 await conn.commit()
-                self.chat_data[chat_id] = {
-                    'currencies': list(default_currencies),
-                    'crypto': list(default_crypto),
-                    'quote_format': False,
-                    'language': 'en',
-                }
+                self.known_chats.add(chat_id)
+                self.chat_data[chat_id] = ChatProfile(
+                    encode_language('en'), False, encode_currencies(default_currencies), encode_currencies(default_crypto),
+                )
             except IntegrityError:
+                self.known_chats.add(chat_id)
                 logger.debug("Chat %s already exists (race condition handled)", chat_id)
             except Exception:
                 logger.exception("Error registering chat %s", chat_id)
 
-    async def get_chat_data(self: _ChatRepoDeps, chat_id: int) -> dict:
+    async def _load_chat_profile(self: _ChatRepoDeps, chat_id: int) -> Optional[ChatProfile]:
         cached = self.chat_data.get(chat_id)
-        if isinstance(cached, dict) and 'currencies' in cached and 'language' in cached:
+        if cached is not None:
             return cached
-
         await self._ensure_chat(chat_id)
+        cached = self.chat_data.peek(chat_id)
+        if cached is not None:
+            return cached
         conn = await self._get_read_conn()
 
         async with conn.execute("""
@@ -72,20 +77,23 @@ class ChatRepoMixin:
             row = await cursor.fetchone()
 
         if not row:
-            return {'currencies': [], 'crypto': [], 'quote_format': False, 'language': 'en'}
+            return None
 
         quote_format, language, currencies_str, crypto_str = row
-        currencies = currencies_str.split(',') if currencies_str else []
-        crypto = crypto_str.split(',') if crypto_str else []
-
-        data = {
-            'currencies': currencies,
-            'crypto': crypto,
-            'quote_format': bool(quote_format) if quote_format else False,
-            'language': language or 'en',
-        }
-        self.chat_data[chat_id] = data
-        return data
+        profile = ChatProfile(
+            encode_language(language or 'en'),
+            bool(quote_format),
+            encode_currencies(currencies_str.split(',') if currencies_str else ()),
+            encode_currencies(crypto_str.split(',') if crypto_str else ()),
+        )
+        self.chat_data[chat_id] = profile
+        return profile
+
+    async def get_chat_data(self: _ChatRepoDeps, chat_id: int) -> dict:
+        profile = await self._load_chat_profile(chat_id)
+        if profile is None:
+            return {'currencies': [], 'crypto': [], 'quote_format': False, 'language': 'en'}
+        return profile.to_dict()
 
     async def initialize_chat_settings(self: _ChatRepoDeps, chat_id: int):
         await self._ensure_chat(chat_id)
@@ -96,18 +104,8 @@ class ChatRepoMixin:
         logger.debug(f"Invalidated chat cache for chat {chat_id}")
 
     async def get_chat_quote_format(self: _ChatRepoDeps, chat_id: int) -> bool:
-        cached = self.chat_data.get(chat_id)
-        if isinstance(cached, dict) and 'quote_format' in cached:
-            return cached['quote_format']
-        await self._ensure_chat(chat_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT quote_format FROM chats WHERE chat_id=?", (chat_id,)) as cursor:
-            row = await cursor.fetchone()
-        result = bool(row[0]) if row else False
-        if chat_id not in self.chat_data or not isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id] = {}
-        self.chat_data[chat_id]['quote_format'] = result
-        return result
+        profile = await self._load_chat_profile(chat_id)
+        return profile.quote_format if profile else False
 
     async def set_chat_quote_format(self: _ChatRepoDeps, chat_id: int, use_quote: bool):
         await self._ensure_chat(chat_id)
@@ -115,22 +113,13 @@ class ChatRepoMixin:
             conn = await self._get_write_conn()
             await conn.execute("UPDATE chats SET quote_format=? WHERE chat_id=?", (1 if use_quote else 0, chat_id))
             await conn.commit()
-        if chat_id in self.chat_data and isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id]['quote_format'] = use_quote
+        profile = self.chat_data.peek(chat_id)
+        if profile is not None:
+            profile.quote_format = use_quote
 
     async def get_chat_currencies(self: _ChatRepoDeps, chat_id: int) -> list:
-        cached = self.chat_data.get(chat_id)
-        if isinstance(cached, dict) and 'currencies' in cached:
-            return cached['currencies']
-        await self._ensure_chat(chat_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT currency FROM chat_currencies WHERE chat_id=?", (chat_id,)) as cursor:
-            rows = await cursor.fetchall()
-        currencies = [r[0] for r in rows]
-        if chat_id not in self.chat_data or not isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id] = {}
-        self.chat_data[chat_id]['currencies'] = currencies
-        return currencies
+        profile = await self._load_chat_profile(chat_id)
+        return decode_currencies(profile.currencies) if profile else []
 
     async def set_chat_currencies(self: _ChatRepoDeps, chat_id: int, currencies: List[str]):
         await self._ensure_chat(chat_id)
@@ -139,22 +128,13 @@ class ChatRepoMixin:
             await conn.execute("DELETE FROM chat_currencies WHERE chat_id=?", (chat_id,))
             await conn.executemany("INSERT OR IGNORE INTO chat_currencies(chat_id, currency) VALUES(?, ?)", [(chat_id, c) for c in currencies])
             await conn.commit()
-        if chat_id in self.chat_data and isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id]['currencies'] = currencies
+        profile = self.chat_data.peek(chat_id)
+        if profile is not None:
+            profile.currencies = encode_currencies(currencies)
 
     async def get_chat_crypto(self: _ChatRepoDeps, chat_id: int) -> list:
-        cached = self.chat_data.get(chat_id)
-        if isinstance(cached, dict) and 'crypto' in cached:
-            return cached['crypto']
-        await self._ensure_chat(chat_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT symbol FROM chat_crypto WHERE chat_id=?", (chat_id,)) as cursor:
-            rows = await cursor.fetchall()
-        crypto = [r[0] for r in rows]
-        if chat_id not in self.chat_data or not isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id] = {}
-        self.chat_data[chat_id]['crypto'] = crypto
-        return crypto
+        profile = await self._load_chat_profile(chat_id)
+        return decode_currencies(profile.crypto) if profile else []
 
     async def set_chat_crypto(self: _ChatRepoDeps, chat_id: int, crypto_list: List[str]):
         await self._ensure_chat(chat_id)
@@ -163,22 +143,13 @@ class ChatRepoMixin:
             await conn.execute("DELETE FROM chat_crypto WHERE chat_id=?", (chat_id,))
             await conn.executemany("INSERT OR IGNORE INTO chat_crypto(chat_id, symbol) VALUES(?, ?)", [(chat_id, s) for s in crypto_list])
             await conn.commit()
-        if chat_id in self.chat_data and isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id]['crypto'] = crypto_list
+        profile = self.chat_data.peek(chat_id)
+        if profile is not None:
+            profile.crypto = encode_currencies(crypto_list)
 
     async def get_chat_language(self: _ChatRepoDeps, chat_id: int) -> str:
-        cached = self.chat_data.get(chat_id)
-        if isinstance(cached, dict) and 'language' in cached:
-            return cached['language']
-        await self._ensure_chat(chat_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT language FROM chats WHERE chat_id=?", (chat_id,)) as cursor:
-            row = await cursor.fetchone()
-        lang = row[0] if row and row[0] else 'en'
-        if chat_id not in self.chat_data or not isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id] = {}
-        self.chat_data[chat_id]['language'] = lang
-        return lang
+        profile = await self._load_chat_profile(chat_id)
+        return decode_language(profile.language) if profile else 'en'
 
     async def set_chat_language(self: _ChatRepoDeps, chat_id: int, language: str):
         await self._ensure_chat(chat_id)
@@ -186,6 +157,6 @@ class ChatRepoMixin:
             conn = await self._get_write_conn()
             await conn.execute("UPDATE chats SET language=? WHERE chat_id=?", (language, chat_id))
             await conn.commit()
-        if chat_id not in self.chat_data or not isinstance(self.chat_data[chat_id], dict):
-            self.chat_data[chat_id] = {}
-        self.chat_data[chat_id]['language'] = language
+        profile = self.chat_data.peek(chat_id)
+        if profile is not None:
+            profile.language = encode_language(language)
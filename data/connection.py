@@ -4,7 +4,7 @@ import os
 import sqlite3
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import aiosqlite
 from aiosqlite import OperationalError
@@ -12,20 +12,24 @@ from aiosqlite import OperationalError
 from config.config import (
     DB_PATH, SQLITE_BUSY_TIMEOUT_MS, SQLITE_WAL_AUTOCHECKPOINT_PAGES,
     DB_BACKUP_INTERVAL_HOURS, DB_BACKUP_KEEP,
+    INSTANCE_ID, LEADER_LEASE_SECONDS, LEADER_RENEW_INTERVAL, USER_CACHE_SIZE, CHAT_CACHE_SIZE,
 )
+from data.known_ids import KnownIds
 from data.schema import INIT_SQL, MIGRATIONS
+from utils.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseMixin:
-    MAX_CACHE_SIZE = 5000
-    MAX_CHAT_CACHE_SIZE = 1000
     FLUSH_INTERVAL = 30
+    LEADER_LEASE = 'leader'
 
     def __init__(self):
-        self.user_data: Dict[int, Any] = {}
-        self.chat_data: Dict[int, Any] = {}
+        self.user_data = LRUCache(USER_CACHE_SIZE)
+        self.chat_data = LRUCache(CHAT_CACHE_SIZE)
+        self.known_users = KnownIds()
+        self.known_chats = KnownIds()
         self.bot_launch_date = datetime.now().strftime('%Y-%m-%d')
         self._read_conn: Optional[aiosqlite.Connection] = None
         self._write_conn: Optional[aiosqlite.Connection] = None
@@ -34,22 +38,21 @@ class DatabaseMixin:
         self._pending_last_seen: Dict[int, str] = {}
         self._flush_task: Optional[asyncio.Task] = None
         self._backup_task: Optional[asyncio.Task] = None
-
-    def _cleanup_cache_if_needed(self):
-        if len(self.user_data) > self.MAX_CACHE_SIZE:
-            sorted_users = sorted(
-                self.user_data.items(),
-                key=lambda x: x[1].get('last_seen', '1970-01-01') if isinstance(x[1], dict) else '1970-01-01'
-            )
-            for key, _ in sorted_users[:len(sorted_users) // 2]:
-                del self.user_data[key]
-            logger.info(f"User cache cleanup: reduced from {len(sorted_users)} to {len(self.user_data)}")
-
-        if len(self.chat_data) > self.MAX_CHAT_CACHE_SIZE:
-            items = list(self.chat_data.items())
-            for key, _ in items[:len(items) // 2]:
-                del self.chat_data[key]
-            logger.info(f"Chat cache cleanup: reduced from {len(items)} to {len(self.chat_data)}")
+        self._lease_task: Optional[asyncio.Task] = None
+        self.instance_id = INSTANCE_ID
+        self.is_leader = False
+        self._leadership_listeners: List[Callable[[bool], None]] = []
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {'users': self.user_data.stats(), 'chats': self.chat_data.stats()}
+
+    async def _load_known_ids(self):
+        conn = await self._get_read_conn()
+        async with conn.execute("SELECT user_id FROM users") as cursor:
+            self.known_users = KnownIds(row[0] for row in await cursor.fetchall())
+        async with conn.execute("SELECT chat_id FROM chats") as cursor:
+            self.known_chats = KnownIds(row[0] for row in await cursor.fetchall())
+        logger.info(f"Loaded {len(self.known_users)} known users and {len(self.known_chats)} known chats")
 
     @staticmethod
     async def _open_connection(readonly: bool = False) -> aiosqlite.Connection:
@@ -154,7 +157,7 @@ class DatabaseMixin:
         while True:
             try:
                 age = self._latest_backup_age()
-                if age is None or age >= interval:
+                if self.is_leader and (age is None or age >= interval):
                     await self.backup_db()
             except asyncio.CancelledError:
                 raise
@@ -162,6 +165,57 @@ class DatabaseMixin:
                 logger.exception("Scheduled DB backup failed")
             await asyncio.sleep(min(interval, 3600))
 
+    def add_leadership_listener(self, listener: Callable[[bool], None]):
+        self._leadership_listeners.append(listener)
+        listener(self.is_leader)
+
+    def _set_leader(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        logger.info(f"Instance {self.instance_id} {'acquired' if is_leader else 'lost'} the {self.LEADER_LEASE} lease")
+        for listener in self._leadership_listeners:
+            listener(is_leader)
+
+    async def try_acquire_lease(self, name: str = LEADER_LEASE, ttl: float = LEADER_LEASE_SECONDS) -> bool:
+        """Take or renew lease ``name``; an expired lease can be taken over by anyone."""
+        now = time.time()
+        async with self._write_lock:
+            conn = await self._get_write_conn()
+            try:
+                await conn.execute(
+                    "INSERT INTO leases(name, holder, expires_at) VALUES(?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, expires_at=excluded.expires_at "
+                    "WHERE leases.holder=excluded.holder OR leases.expires_at < ?",
+                    (name, self.instance_id, now + ttl, now)
+                )
+                await conn.commit()
+            except sqlite3.Error:
+                await conn.rollback()
+                raise
+            async with conn.execute("SELECT holder FROM leases WHERE name=?", (name,)) as cursor:
+                row = await cursor.fetchone()
+        return bool(row) and row[0] == self.instance_id
+
+    async def release_lease(self, name: str = LEADER_LEASE):
+        async with self._write_lock:
+            conn = await self._get_write_conn()
+            await conn.execute("DELETE FROM leases WHERE name=? AND holder=?", (name, self.instance_id))
+            await conn.commit()
+
+    async def _renew_leadership(self):
+        try:
+            self._set_leader(await self.try_acquire_lease())
+        except sqlite3.Error:
+            # Without a confirmed renewal another instance may take over, so step down rather than risk two leaders.
+            logger.exception("Leader lease renewal failed")
+            self._set_leader(False)
+
+    async def _periodic_lease_renewal(self):
+        while True:
+            await asyncio.sleep(LEADER_RENEW_INTERVAL)
+            await self._renew_leadership()
+
     @staticmethod
     async def _get_schema_version(conn) -> int:
         try:
@@ -171,7 +225,8 @@ class DatabaseMixin:
         except OperationalError:
             return 0
 
-    async def init_db(self):
+    async def init_db(self, contend_for_lease: bool = True):
+        """Open the DB; ``contend_for_lease=False`` keeps this instance a follower for good."""
         async with self._write_lock:
             conn = await self._get_write_conn()
             for stmt in INIT_SQL:
@@ -201,7 +256,10 @@ class DatabaseMixin:
             await conn.commit()
             logger.info("DB initialized.")
 
-        await self._get_read_conn()
+        await self._load_known_ids()
+        if contend_for_lease:
+            await self._renew_leadership()
+            self._start_lease_task()
         self._start_flush_task()
         self._start_backup_task()
 
@@ -229,6 +287,17 @@ class DatabaseMixin:
             self._backup_task = backup_task
             backup_task.add_done_callback(_on_backup_done)
 
+    def _start_lease_task(self):
+        lease_task = self._lease_task
+        if lease_task is None or lease_task.done():
+            def _on_lease_done(t: asyncio.Task):
+                if not t.cancelled() and t.exception():
+                    logger.error(f"Lease task failed: {t.exception()}")
+
+            lease_task = asyncio.create_task(self._periodic_lease_renewal(), name="db_leader_lease")
+            self._lease_task = lease_task
+            lease_task.add_done_callback(_on_lease_done)
+
     async def _periodic_flush(self):
         while True:
             await asyncio.sleep(self.FLUSH_INTERVAL)
@@ -279,7 +348,7 @@ class DatabaseMixin:
             logger.debug(f"Flushed {len(pending)} interaction updates")
 
     async def close(self):
-        for task in (self._flush_task, self._backup_task):
+        for task in (self._flush_task, self._backup_task, self._lease_task):
             if task is not None:
                 task.cancel()
                 try:
@@ -288,6 +357,14 @@ class DatabaseMixin:
                     pass
         self._flush_task = None
         self._backup_task = None
+        self._lease_task = None
+
+        if self.is_leader:
+            try:
+                await self.release_lease()
+            except sqlite3.Error:
+                logger.exception("Error releasing leader lease")
+            self._set_leader(False)
 
         try:
             await self._flush_interactions()
@@ -0,0 +1,30 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+
+class KnownIds:
+    """Sorted array of ids that exist in the DB; 8 bytes per id, lookups by bisection.
+
+    Membership is checked without any lock. Inserts shift the tail of the array, which is
+    fine for how rarely new users and chats appear compared to lookups.
+    """
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._ids = array('q', sorted(set(ids)))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item: int) -> bool:
+        ids = self._ids
+        i = bisect_left(ids, item)
+        return i < len(ids) and ids[i] == item
+
+    def add(self, item: int):
+        ids = self._ids
+        i = bisect_left(ids, item)
+        if i == len(ids) or ids[i] != item:
+            ids.insert(i, item)
@@ -0,0 +1,100 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from config.config import ALL_CURRENCIES
+
+# Bit i of a currency mask stands for the i-th code of ALL_CURRENCIES.
+_CURRENCY_CODES = tuple(ALL_CURRENCIES)
+_CURRENCY_BITS = {code: 1 << i for i, code in enumerate(_CURRENCY_CODES)}
+
+# Language codes are interned to small ints; new codes are appended on first use.
+_LANGUAGES: List[str] = ['ru', 'en']
+_LANGUAGE_IDS: Dict[str, int] = {lang: i for i, lang in enumerate(_LANGUAGES)}
+
+
+def encode_currencies(codes: Iterable[str]) -> int:
+    """Bitmask of the given codes; codes outside ALL_CURRENCIES are dropped."""
+    mask = 0
+    for code in codes:
+        mask |= _CURRENCY_BITS.get(code, 0)
+    return mask
+
+
+def decode_currencies(mask: int) -> List[str]:
+    """Codes set in ``mask``, in ALL_CURRENCIES order."""
+    codes = []
+    i = 0
+    while mask:
+        if mask & 1:
+            codes.append(_CURRENCY_CODES[i])
+        mask >>= 1
+        i += 1
+    return codes
+
+
+def encode_language(language: str) -> int:
+    lang_id = _LANGUAGE_IDS.get(language)
+    if lang_id is None:
+        lang_id = _LANGUAGE_IDS[language] = len(_LANGUAGES)
+        _LANGUAGES.append(language)
+    return lang_id
+
+
+def decode_language(lang_id: int) -> str:
+    return _LANGUAGES[lang_id]
+
+
+def encode_day(day: Optional[str]) -> int:
+    """'YYYY-MM-DD' as a proleptic Gregorian ordinal; 0 when unknown."""
+    return date.fromisoformat(day).toordinal() if day else 0
+
+
+def decode_day(ordinal: int) -> Optional[str]:
+    return date.fromordinal(ordinal).isoformat() if ordinal else None
+
+
+class UserProfile:
+    """Cached user settings: currency masks, an interned language id and day ordinals."""
+
+    __slots__ = ('interactions', 'last_seen', 'first_seen', 'language', 'use_quote_format', 'currencies', 'crypto')
+
+    def __init__(self, interactions: int, last_seen: int, first_seen: int, language: int,
+                 use_quote_format: bool, currencies: int, crypto: int):
+        self.interactions = interactions
+        self.last_seen = last_seen
+        self.first_seen = first_seen
+        self.language = language
+        self.use_quote_format = use_quote_format
+        self.currencies = currencies
+        self.crypto = crypto
+
+    def to_dict(self) -> dict:
+        return {
+            "interactions": self.interactions,
+            "last_seen": decode_day(self.last_seen),
+            "selected_currencies": decode_currencies(self.currencies),
+            "selected_crypto": decode_currencies(self.crypto),
+            "language": decode_language(self.language),
+            "first_seen": decode_day(self.first_seen),
+            "use_quote_format": self.use_quote_format,
+        }
+
+
+class ChatProfile:
+    """Cached chat settings, stored like ``UserProfile``."""
+
+    __slots__ = ('language', 'quote_format', 'currencies', 'crypto')
+
+    def __init__(self, language: int, quote_format: bool, currencies: int, crypto: int):
+        self.language = language
+        self.quote_format = quote_format
+        self.currencies = currencies
+        self.crypto = crypto
+
+    def to_dict(self) -> dict:
+        return {
+            'currencies': decode_currencies(self.currencies),
+            'crypto': decode_currencies(self.crypto),
+            'quote_format': self.quote_format,
+            'language': decode_language(self.language),
+        }
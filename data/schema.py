@@ -58,6 +58,13 @@ INIT_SQL = [
     "CREATE INDEX IF NOT EXISTS idx_chat_currencies_chat ON chat_currencies(chat_id);",
     "CREATE INDEX IF NOT EXISTS idx_chat_crypto_chat ON chat_crypto(chat_id);",
     "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL);",
+    """
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """,
 ]
 
 MIGRATIONS = [
@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime
-from typing import Any, List, Optional, Protocol
+from typing import List, Optional, Protocol
 
 import asyncio
 
@@ -9,12 +9,18 @@ import aiosqlite
 from aiosqlite import IntegrityError
 
 from config.config import ACTIVE_CURRENCIES, CRYPTO_CURRENCIES
+from data.known_ids import KnownIds
+from data.profiles import (
+    UserProfile, decode_currencies, decode_language, encode_currencies, encode_day, encode_language,
+)
+from utils.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
 
 class _UserRepoDeps(Protocol):
-    user_data: dict[int, dict[str, Any]]
+    user_data: LRUCache
+    known_users: KnownIds
     _write_lock: asyncio.Lock
     _pending_interactions: dict[int, int]
     _pending_last_seen: dict[int, str]
@@ -22,9 +28,9 @@ class _UserRepoDeps(Protocol):
     @staticmethod
     def _detect_language(language_code: Optional[str] = None) -> str: ...
     async def _ensure_user(self, user_id: int, language_code: Optional[str] = None): ...
+    async def _load_user_profile(self, user_id: int) -> Optional[UserProfile]: ...
     async def _get_read_conn(self) -> aiosqlite.Connection: ...
     async def _get_write_conn(self) -> aiosqlite.Connection: ...
-    def _cleanup_cache_if_needed(self) -> None: ...
 
 
 class UserRepoMixin:
@@ -36,16 +42,17 @@ class UserRepoMixin:
         return 'ru' if language_code.lower().startswith(cis_codes) else 'en'
 
     async def _ensure_user(self: _UserRepoDeps, user_id: int, language_code: Optional[str] = None):
-        if user_id in self.user_data:
+        if user_id in self.known_users:
             return
 
         async with self._write_lock:
-            if user_id in self.user_data:
+            if user_id in self.known_users:
                 return
             conn = await self._get_write_conn()
+            # Another instance sharing the DB may have registered the user since startup.
             async with conn.execute("SELECT user_id FROM users WHERE user_id=?", (user_id,)) as cursor:
                 if await cursor.fetchone() is not None:
-                    self.user_data.setdefault(user_id, {})
+                    self.known_users.add(user_id)
                     return
             default_lang = self._detect_language(language_code)
             today = datetime.now().strftime('%Y-%m-%d')
@@ -61,27 +68,26 @@ class UserRepoMixin:
                 crypto_data = [(user_id, s) for s in default_crypto]
                 await conn.executemany("INSERT OR IGNORE INTO user_crypto(user_id, symbol) VALUES(?, ?)", crypto_data)
                 await conn.commit()
-                self.user_data[user_id] = {
-                    "interactions": 0,
-                    "last_seen": today,
-                    "first_seen": today,
-                    "selected_currencies": list(default_currencies),
-                    "selected_crypto": list(default_crypto),
-                    "language": default_lang,
-                    "use_quote_format": True,
-                }
+                self.known_users.add(user_id)
+                self.user_data[user_id] = UserProfile(
+                    0, encode_day(today), encode_day(today), encode_language(default_lang), True,
+                    encode_currencies(default_currencies), encode_currencies(default_crypto),
+                )
                 logger.info(f"New user {user_id} registered with language '{default_lang}'")
             except IntegrityError:
+                self.known_users.add(user_id)
                 logger.debug("User %s already exists (race condition handled)", user_id)
             except Exception:
                 logger.exception("Error registering user %s", user_id)
 
-    async def get_user_data(self: _UserRepoDeps, user_id: int) -> dict:
-        self._cleanup_cache_if_needed()
+    async def _load_user_profile(self: _UserRepoDeps, user_id: int) -> Optional[UserProfile]:
         cached = self.user_data.get(user_id)
-        if cached and 'selected_currencies' in cached and 'language' in cached:
+        if cached is not None:
             return cached
         await self._ensure_user(user_id)
+        cached = self.user_data.peek(user_id)
+        if cached is not None:
+            return cached
         conn = await self._get_read_conn()
         async with conn.execute("""
             SELECT 
@@ -92,45 +98,41 @@ class UserRepoMixin:
         """, (user_id,)) as cursor:
             row = await cursor.fetchone()
         if not row:
-            return {}
+            return None
         interactions, last_seen, first_seen, language, use_quote, currencies_str, crypto_str = row
-        currencies = currencies_str.split(',') if currencies_str else []
-        crypto = crypto_str.split(',') if crypto_str else []
-        data = {
-            "interactions": interactions,
-            "last_seen": last_seen,
-            "selected_currencies": currencies,
-            "selected_crypto": crypto,
-            "language": language or 'ru',
-            "first_seen": first_seen,
-            "use_quote_format": bool(use_quote),
-        }
-        self.user_data[user_id] = data
-        return data
+        profile = UserProfile(
+            interactions,
+            encode_day(last_seen),
+            encode_day(first_seen),
+            encode_language(language or 'ru'),
+            bool(use_quote),
+            encode_currencies(currencies_str.split(',') if currencies_str else ()),
+            encode_currencies(crypto_str.split(',') if crypto_str else ()),
+        )
+        self.user_data[user_id] = profile
+        return profile
+
+    async def get_user_data(self: _UserRepoDeps, user_id: int) -> dict:
+        profile = await self._load_user_profile(user_id)
+        return profile.to_dict() if profile else {}
 
     async def update_user_data(self: _UserRepoDeps, user_id: int, language_code: Optional[str] = None):
         await self._ensure_user(user_id, language_code=language_code)
         today = datetime.now().strftime('%Y-%m-%d')
-        self._cleanup_cache_if_needed()
-        user_cache = self.user_data.get(user_id)
-        is_today = user_cache and user_cache.get("last_seen") == today
+        today_ordinal = encode_day(today)
+        profile = self.user_data.peek(user_id)
+        is_today = profile is not None and profile.last_seen == today_ordinal
         self._pending_interactions[user_id] = self._pending_interactions.get(user_id, 0) + 1
         if not is_today:
             self._pending_last_seen[user_id] = today
-        if user_cache:
-            user_cache["interactions"] = user_cache.get("interactions", 0) + 1
+        if profile is not None:
+            profile.interactions += 1
             if not is_today:
-                user_cache["last_seen"] = today
+                profile.last_seen = today_ordinal
 
     async def get_user_currencies(self: _UserRepoDeps, user_id: int) -> list:
-        cached = self.user_data.get(user_id)
-        if cached and "selected_currencies" in cached:
-            return cached["selected_currencies"]
-        await self._ensure_user(user_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT currency FROM user_currencies WHERE user_id=?", (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-        return [r[0] for r in rows]
+        profile = await self._load_user_profile(user_id)
+        return decode_currencies(profile.currencies) if profile else []
 
     async def set_user_currencies(self: _UserRepoDeps, user_id: int, currencies: List[str]):
         await self._ensure_user(user_id)
@@ -139,18 +141,13 @@ class UserRepoMixin:
             await conn.execute("DELETE FROM user_currencies WHERE user_id=?", (user_id,))
             await conn.executemany("INSERT OR IGNORE INTO user_currencies(user_id, currency) VALUES(?, ?)", [(user_id, c) for c in currencies])
             await conn.commit()
-        if user_id in self.user_data:
-            self.user_data[user_id]["selected_currencies"] = currencies
+        profile = self.user_data.peek(user_id)
+        if profile is not None:
+            profile.currencies = encode_currencies(currencies)
 
     async def get_user_crypto(self: _UserRepoDeps, user_id: int) -> List[str]:
-        cached = self.user_data.get(user_id)
-        if cached and "selected_crypto" in cached:
-            return cached["selected_crypto"]
-        await self._ensure_user(user_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT symbol FROM user_crypto WHERE user_id=?", (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-        return [r[0] for r in rows]
+        profile = await self._load_user_profile(user_id)
+        return decode_currencies(profile.crypto) if profile else []
 
     async def set_user_crypto(self: _UserRepoDeps, user_id: int, crypto_list: List[str]):
         await self._ensure_user(user_id)
@@ -159,18 +156,13 @@ class UserRepoMixin:
             await conn.execute("DELETE FROM user_crypto WHERE user_id=?", (user_id,))
             await conn.executemany("INSERT OR IGNORE INTO user_crypto(user_id, symbol) VALUES(?, ?)", [(user_id, s) for s in crypto_list])
             await conn.commit()
-        if user_id in self.user_data:
-            self.user_data[user_id]["selected_crypto"] = crypto_list
+        profile = self.user_data.peek(user_id)
+        if profile is not None:
+            profile.crypto = encode_currencies(crypto_list)
 
     async def get_user_language(self: _UserRepoDeps, user_id: int) -> str:
-        cached = self.user_data.get(user_id)
-        if cached and "language" in cached:
-            return cached["language"]
-        await self._ensure_user(user_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT language FROM users WHERE user_id=?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-        return row[0] if row and row[0] else 'ru'
+        profile = await self._load_user_profile(user_id)
+        return decode_language(profile.language) if profile else 'ru'
 
     async def set_user_language(self: _UserRepoDeps, user_id: int, language: str):
         await self._ensure_user(user_id)
@@ -178,18 +170,13 @@ class UserRepoMixin:
             conn = await self._get_write_conn()
             await conn.execute("UPDATE users SET language=? WHERE user_id=?", (language, user_id))
             await conn.commit()
-        if user_id in self.user_data:
-            self.user_data[user_id]["language"] = language
+        profile = self.user_data.peek(user_id)
+        if profile is not None:
+            profile.language = encode_language(language)
 
     async def get_user_quote_format(self: _UserRepoDeps, user_id: int) -> bool:
-        cached = self.user_data.get(user_id)
-        if cached and "use_quote_format" in cached:
-            return cached["use_quote_format"]
-        await self._ensure_user(user_id)
-        conn = await self._get_read_conn()
-        async with conn.execute("SELECT use_quote_format FROM users WHERE user_id=?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-        return bool(row[0]) if row else True
+        profile = await self._load_user_profile(user_id)
+        return profile.use_quote_format if profile else True
 
     async def set_user_quote_format(self: _UserRepoDeps, user_id: int, use_quote: bool):
         await self._ensure_user(user_id)
@@ -197,8 +184,9 @@ class UserRepoMixin:
             conn = await self._get_write_conn()
             await conn.execute("UPDATE users SET use_quote_format=? WHERE user_id=?", (1 if use_quote else 0, user_id))
             await conn.commit()
-        if user_id in self.user_data:
-            self.user_data[user_id]["use_quote_format"] = use_quote
+        profile = self.user_data.peek(user_id)
+        if profile is not None:
+            profile.use_quote_format = use_quote
 
     async def get_statistics(self: _UserRepoDeps) -> dict:
         today = datetime.now().strftime('%Y-%m-%d')
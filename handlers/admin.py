@@ -13,6 +13,8 @@ from config.languages import LANGUAGES
 from loader import bot, user_data
 from states.states import AdminStates
 from utils.middleware import get_metrics
+from utils.prefilter import message_prefilter
+from utils.parser import parse_cache_stats
 from utils.button_styles import success_button, danger_button
 
 logger = logging.getLogger(__name__)
@@ -57,12 +59,19 @@ async def cmd_health(message: Message):
     stats = await user_data.get_statistics()
 
     db_ok = "✅" if await user_data.ping_db() else "❌"
+    prefilter = message_prefilter.stats()
+    parse_memo = parse_cache_stats()['request']
+    profile_cache = user_data.cache_stats()['users']
 
     text = (
         f"🏥 <b>Bot Health</b>\n\n"
         f"⏱ Uptime: {metrics['uptime']}\n"
         f"📨 Requests: {metrics['total_requests']}\n"
         f"❌ Errors: {metrics['total_errors']}\n"
+        f"🧹 Pre-filter: {prefilter['dropped']} dropped / {prefilter['passed']} passed\n"
+        f"🧠 Parse memo: {parse_memo['size']} entries, hit rate {parse_memo['hit_rate']}\n"
+        f"🗂 User cache: {profile_cache['size']}/{profile_cache['maxsize']}, hit rate {profile_cache['hit_rate']}, "
+        f"{profile_cache['evictions']} evicted\n"
         f"🗄 DB: {db_ok}\n"
         f"👥 Active today: {stats['active_today']}\n"
         f"👤 Total users: {stats['total_users']}"
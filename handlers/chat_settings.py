@@ -40,7 +40,7 @@ async def _safe_edit_text(message: Any, text: str, reply_markup=None):
 
 
 async def _ensure_chat_initialized(chat_id: int):
-    if chat_id not in user_data.chat_data:
+    if chat_id not in user_data.known_chats:
         await user_data.initialize_chat_settings(chat_id)
 
 
@@ -1,8 +1,8 @@
-import difflib
+import asyncio
 import re
 import logging
 from decimal import Decimal, InvalidOperation
-from typing import List, Tuple, Optional
+from typing import Dict, List, Set, Tuple, Optional
 
 from aiogram import Router, types, Bot
 from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent, ChatMemberUpdated
@@ -10,42 +10,41 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from config.config import (
     ALL_CURRENCIES,
-    CURRENCY_SYMBOLS,
-    CURRENCY_ABBREVIATIONS,
     CRYPTO_CURRENCIES,
     MAX_CONVERSION_AMOUNT,
     MIN_CONVERSION_AMOUNT,
+    INLINE_DEBOUNCE,
+    REPLY_CACHE_SIZE,
 )
 from config.languages import LANGUAGES
 from loader import user_data
-from utils.rates import get_exchange_rates, convert_currency
-from utils.formatter import format_large_number, get_currency_symbol
-from utils.parser import parse_amount_and_currency, parse_mathematical_expression
+from utils.rates import RateSnapshot, add_snapshot_listener, get_rate_snapshot
+from utils.reply_cache import ReplyCache
+from utils.currency_lexicon import CURRENCY_LEXICON
+from utils.prefilter import message_prefilter
+from utils.suggestions import SUGGESTION_INDEX
+from utils.formatter import currency_label, format_large_number
+from utils.templates import amount_head, get_template, targeted
+from utils.parser import parse_conversion_request, parse_mathematical_expression
 from utils.button_styles import danger_button, primary_button, EMOJI
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Rendered conversion replies for the current rate snapshot; dropped whenever a new one is published.
+reply_cache = ReplyCache(REPLY_CACHE_SIZE)
+add_snapshot_listener(lambda snapshot: reply_cache.invalidate(snapshot.generation))
 
-_TARGET_CURRENCY_PATTERNS = {}
-_TARGET_CURRENCY_PATTERNS.update(CURRENCY_SYMBOLS)
-_TARGET_CURRENCY_PATTERNS.update(CURRENCY_ABBREVIATIONS)
-_TARGET_CURRENCY_PATTERNS.update({k.upper(): k.upper() for k in ALL_CURRENCIES.keys()})
+# Inline answers (results, cache_time) by (generation, query, user prefs), the task handling
+# each user's latest inline query, and the tasks currently in their debounce sleep.
+inline_cache = ReplyCache(REPLY_CACHE_SIZE)
+add_snapshot_listener(lambda snapshot: inline_cache.invalidate(snapshot.generation))
+_inline_tasks: Dict[int, asyncio.Task] = {}
+_inline_debouncing: Set[asyncio.Task] = set()
 
-_TARGET_PATTERNS_LOWER = {p.lower(): c for p, c in _TARGET_CURRENCY_PATTERNS.items()}
 
-_KNOWN_CURRENCY_REGEX_PARTS = []
-for pattern in sorted(_TARGET_PATTERNS_LOWER.keys(), key=len, reverse=True):
-    pattern_str = str(pattern)
-    starts_with_word = re.match(r'^\w', pattern_str, re.UNICODE) is not None
-    ends_with_word = re.search(r'\w$', pattern_str, re.UNICODE) is not None
-    prefix = r'(?<!\w)' if starts_with_word else ''
-    suffix = r'(?!\w)' if ends_with_word else ''
-    _KNOWN_CURRENCY_REGEX_PARTS.append(rf'{prefix}{re.escape(pattern_str)}{suffix}')
-_KNOWN_CURRENCY_REGEX = re.compile('|'.join(_KNOWN_CURRENCY_REGEX_PARTS), re.IGNORECASE)
+_TARGET_PATTERNS_LOWER = CURRENCY_LEXICON.patterns
 
-_SPLIT_TOKENS_REGEX = re.compile(r'[\s,]+')
-_SKIP_TOKENS_REGEX = re.compile(r'^[\d.,+\-*/()^×÷:хk]+$')
 _QUERY_LIKE_TEXT_REGEX = re.compile(
     r'https?://\S+|\b\S+\.(?:php|aspx?|jsp|html?)\?\S*\b|\b[a-zA-Z]{2,10}\?\d+\b',
     re.IGNORECASE,
@@ -68,33 +67,9 @@ _BARE_NUMBER_REGEX = re.compile(
 _MAX_SAFE_CONVERSION_AMOUNT = MAX_CONVERSION_AMOUNT
 _MIN_SAFE_CONVERSION_AMOUNT = MIN_CONVERSION_AMOUNT
 
-_ALL_KNOWN_CODES = set(k.upper() for k in ALL_CURRENCIES.keys())
-_ALL_KNOWN_WORDS = set()
-for p in CURRENCY_SYMBOLS:
-    _ALL_KNOWN_WORDS.add(p.lower())
-for p in CURRENCY_ABBREVIATIONS:
-    _ALL_KNOWN_WORDS.add(p.lower())
-for k in ALL_CURRENCIES:
-    _ALL_KNOWN_WORDS.add(k.lower())
-
 
 def _find_similar_currencies(text: str, max_results: int = 3) -> List[str]:
-    text_upper = text.upper().strip()
-    text_lower = text.lower().strip()
-    
-    suggestions = []
-    
-    code_matches = difflib.get_close_matches(text_upper, _ALL_KNOWN_CODES, n=max_results, cutoff=0.5)
-    suggestions.extend(code_matches)
-    
-    if len(suggestions) < max_results:
-        word_matches = difflib.get_close_matches(text_lower, _ALL_KNOWN_WORDS, n=max_results, cutoff=0.5)
-        for w in word_matches:
-            code = _TARGET_PATTERNS_LOWER.get(w)
-            if code and code not in suggestions:
-                suggestions.append(code)
-    
-    return suggestions[:max_results]
+    return list(SUGGESTION_INDEX.suggest(text, max_results))
 
 
 def _extract_unknown_currency(text: str) -> Optional[str]:
@@ -114,24 +89,10 @@ def _extract_unknown_currency(text: str) -> Optional[str]:
 
 
 
-def _find_target_currency(text: str, from_currency: str) -> Optional[str]:
-    tokens = _SPLIT_TOKENS_REGEX.split(text.strip())
-    found = []
-    for token in tokens:
-        token_lower = token.lower().strip()
-        if not token_lower or _SKIP_TOKENS_REGEX.match(token_lower):
-            continue
-        code = _TARGET_PATTERNS_LOWER.get(token_lower)
-        if code and code != from_currency and code not in found:
-            found.append(code)
-
-    return found[0] if len(found) == 1 else None
-
-
 def _contains_known_currency(text: str) -> bool:
     if _QUERY_LIKE_TEXT_REGEX.search(text):
         return False
-    return _KNOWN_CURRENCY_REGEX.search(text.lower()) is not None
+    return CURRENCY_LEXICON.first(text.lower()) is not None
 
 
 def _too_large_message(user_lang: str) -> str:
@@ -151,7 +112,7 @@ def _too_small_message(user_lang: str) -> str:
 
 
 def _detect_amount_bounds_from_text(text: str) -> Optional[str]:
-    amount_text = _KNOWN_CURRENCY_REGEX.sub('', text.lower()).replace(' ', '')
+    amount_text = CURRENCY_LEXICON.strip(text.lower()).replace(' ', '')
     candidates = re.findall(r'[-+]?(?:\d+(?:[.,]\d+)?|[.,]\d+)(?:[eE][-+]?\d+)?', amount_text)
 
     max_amount = Decimal(str(_MAX_SAFE_CONVERSION_AMOUNT))
@@ -189,12 +150,97 @@ async def _validate_amount_or_reply(message: types.Message, user_lang: str, amou
     return True
 
 
-async def _get_rates_or_reply(message: types.Message, user_lang: str):
-    rates = await get_exchange_rates()
-    if not rates:
+async def _get_rates_or_reply(message: types.Message, user_lang: str) -> Optional[RateSnapshot]:
+    snapshot = await get_rate_snapshot()
+    if not snapshot:
         await message.answer(LANGUAGES[user_lang]['error'])
         return None
-    return rates
+    return snapshot
+
+
+def _conversion_lines(from_currency: str, targets: List[str], row: List[float], valid: List[bool], is_crypto: bool = False) -> List[str]:
+    return [
+        f"{format_large_number(value, is_crypto)} {currency_label(to_cur)}"
+        for to_cur, value, ok in zip(targets, row, valid)
+        if ok and to_cur != from_currency
+    ]
+
+
+def _convert_for_prefs(
+    snapshot: RateSnapshot,
+    requests: List[Tuple[float, str]],
+    user_currencies: List[str],
+    user_crypto: List[str],
+) -> List[Tuple[List[str], List[str]]]:
+    targets = list(user_currencies) + list(user_crypto)
+    split = len(user_currencies)
+    results, valid = snapshot.convert_many([a for a, _ in requests], [c for _, c in requests], targets)
+    rendered = []
+    for (_, from_currency), row, ok in zip(requests, results.tolist(), valid.tolist()):
+        rendered.append((
+            _conversion_lines(from_currency, user_currencies, row[:split], ok[:split]),
+            _conversion_lines(from_currency, user_crypto, row[split:], ok[split:], is_crypto=True),
+        ))
+    return rendered
+
+
+def _render_conversion_reply(
+    snapshot: RateSnapshot,
+    amount: float,
+    from_currency: str,
+    user_currencies: List[str],
+    user_crypto: List[str],
+    user_lang: str,
+    use_quote: bool,
+) -> str:
+    fiat_lines, crypto_lines = _convert_for_prefs(
+        snapshot, [(amount, from_currency)], user_currencies, user_crypto
+    )[0]
+    return get_template(user_lang, use_quote).single(
+        amount_head(amount, from_currency), fiat_lines, crypto_lines, bool(user_currencies), bool(user_crypto)
+    )
+
+
+def _render_inline_reply(
+    snapshot: RateSnapshot,
+    amount: float,
+    from_currency: str,
+    user_currencies: List[str],
+    user_crypto: List[str],
+    user_lang: str,
+    use_quote: bool,
+) -> str:
+    fiat_lines, crypto_lines = _convert_for_prefs(
+        snapshot, [(amount, from_currency)], user_currencies, user_crypto
+    )[0]
+    return get_template(user_lang, use_quote).inline(
+        amount_head(amount, from_currency), fiat_lines, crypto_lines, bool(user_currencies), bool(user_crypto)
+    )
+
+
+def _render_targeted_reply(snapshot: RateSnapshot, amount: float, from_currency: str, targets: List[str]) -> Optional[str]:
+    results, valid = snapshot.convert_many([amount], [from_currency], targets)
+    lines = [
+        f"{format_large_number(value, to_cur in CRYPTO_CURRENCIES)} {currency_label(to_cur)}"
+        for to_cur, value, ok in zip(targets, results[0].tolist(), valid[0].tolist())
+        if ok
+    ]
+    if not lines:
+        return None
+    return targeted(amount_head(amount, from_currency), lines)
+
+
+def _cached_reply(render, snapshot: RateSnapshot, amount: float, from_currency: str,
+                  user_currencies: List[str], user_crypto: List[str], user_lang: str, use_quote: bool) -> str:
+    key = (
+        snapshot.generation, render.__name__, float(amount), from_currency,
+        tuple(user_currencies), tuple(user_crypto), user_lang, bool(use_quote),
+    )
+    text = reply_cache.get(key)
+    if text is None:
+        text = render(snapshot, amount, from_currency, user_currencies, user_crypto, user_lang, use_quote)
+        reply_cache.put(key, text)
+    return text
 
 
 async def _resolve_chat_user_prefs(message: types.Message):
@@ -239,40 +285,27 @@ def _build_delete_conversion_kb(user_lang: str):
 
 
 def _build_math_response(user_lang: str, expression: str, result: float) -> str:
-    result_str = format_large_number(result)
-    total_len = len(expression) + len(result_str)
-    if total_len <= 35:
-        template_key = 'math_result_short'
-        fallback = '{expression} = <b>{result}</b>'
-    else:
-        template_key = 'math_result_long'
-        fallback = '{expression}\n= <b>{result}</b>'
-    return LANGUAGES[user_lang].get(template_key, fallback).format(expression=expression, result=result_str)
+    return get_template(user_lang).math(expression, result)
 
 
-async def process_targeted_conversion(message: types.Message, amount: float, from_currency: str, to_currency: str):
+async def process_targeted_conversion(message: types.Message, amount: float, from_currency: str, targets: List[str]):
     user_lang, _, _, _, user_id, _ = await _resolve_chat_user_prefs(message)
 
     try:
         if not await _validate_amount_or_reply(message, user_lang, amount):
             return
 
-        rates = await _get_rates_or_reply(message, user_lang)
-        if rates is None:
+        snapshot = await _get_rates_or_reply(message, user_lang)
+        if snapshot is None:
             return
 
-        converted = convert_currency(amount, from_currency, to_currency, rates)
-        is_crypto = to_currency in CRYPTO_CURRENCIES
-
-        response = (
-            f"{format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n"
-            f"= {format_large_number(converted, is_crypto)} {get_currency_symbol(to_currency)}{to_currency}"
-        )
+        response = _render_targeted_reply(snapshot, amount, from_currency, targets)
+        if response is None:
+            await message.answer(LANGUAGES[user_lang]['error'])
+            return
 
         kb = _build_delete_conversion_kb(user_lang)
         await message.reply(text=response, reply_markup=kb.as_markup())
-    except KeyError:
-        await message.answer(LANGUAGES[user_lang]['error'])
     except Exception:
         logger.exception("Error in targeted conversion for user %s", user_id)
         await message.answer(LANGUAGES[user_lang]['error'])
@@ -281,60 +314,27 @@ async def process_multiple_conversions(message: types.Message, requests: List[Tu
     user_lang, user_currencies, user_crypto, use_quote, user_id, _ = await _resolve_chat_user_prefs(message)
 
     try:
-        rates = await _get_rates_or_reply(message, user_lang)
-        if rates is None:
+        snapshot = await _get_rates_or_reply(message, user_lang)
+        if snapshot is None:
             return
         
-        final_response = ""
-        skipped_too_large = False
-
-        for amount, from_currency in requests:
-            if amount <= 0 or amount > _MAX_SAFE_CONVERSION_AMOUNT:
-                if amount > _MAX_SAFE_CONVERSION_AMOUNT:
-                    skipped_too_large = True
-                continue
-            
-            response = f"{format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n"
-            conversion_parts = []
-            
-            if user_currencies:
-                conversion_parts.append(f"{LANGUAGES[user_lang]['fiat_currencies']}")
-                fiat_parts = []
-                for to_cur in user_currencies:
-                    if to_cur != from_currency:
-                        try:
-                            converted = convert_currency(amount, from_currency, to_cur, rates)
-                            fiat_parts.append(f"{format_large_number(converted)} {get_currency_symbol(to_cur)}{to_cur}")
-                        except (KeyError, OverflowError):
-                            continue
-                if fiat_parts:
-                    conversion_parts.append("\n".join(fiat_parts))
-            
-            if user_crypto:
-                conversion_parts.append(f"{LANGUAGES[user_lang]['cryptocurrencies_output']}")
-                crypto_parts = []
-                for to_cur in user_crypto:
-                    if to_cur != from_currency:
-                        try:
-                            converted = convert_currency(amount, from_currency, to_cur, rates)
-                            crypto_parts.append(f"{format_large_number(converted, True)} {get_currency_symbol(to_cur)}{to_cur}")
-                        except (KeyError, OverflowError):
-                            continue
-                if crypto_parts:
-                    conversion_parts.append("\n".join(crypto_parts))
-            
-            content = "\n\n".join(conversion_parts)
-            if use_quote:
-                response += "<blockquote expandable>" + content + "</blockquote>\n\n"
-            else:
-                response += content + "\n\n"
-            final_response += response
-        
+        skipped_too_large = any(amount > _MAX_SAFE_CONVERSION_AMOUNT for amount, _ in requests)
+        requests = [(amount, c) for amount, c in requests if 0 < amount <= _MAX_SAFE_CONVERSION_AMOUNT]
+        rendered = _convert_for_prefs(snapshot, requests, user_currencies, user_crypto) if requests else []
+        final_response = get_template(user_lang, use_quote).multi(
+            [
+                (amount_head(amount, from_currency), fiat_parts, crypto_parts)
+                for (amount, from_currency), (fiat_parts, crypto_parts) in zip(requests, rendered)
+            ],
+            bool(user_currencies),
+            bool(user_crypto),
+        )
+
         if final_response:
             kb = _build_delete_conversion_kb(user_lang)
 
             await message.reply(
-                text=final_response.strip(),
+                text=final_response,
                 reply_markup=kb.as_markup()
             )
         elif skipped_too_large:
@@ -351,50 +351,15 @@ async def process_conversion(message: types.Message, amount: float, from_currenc
         if not await _validate_amount_or_reply(message, user_lang, amount):
             return
 
-        rates = await _get_rates_or_reply(message, user_lang)
-        if rates is None:
+        snapshot = await _get_rates_or_reply(message, user_lang)
+        if snapshot is None:
             return
         
-        response_parts = [
-            f"{format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n"
-        ]
-
-        if user_currencies:
-            response_parts.append(f"\n{LANGUAGES[user_lang]['fiat_currencies']}\n")
-            fiat_conversions = []
-            for to_cur in user_currencies:
-                if to_cur != from_currency:
-                    try:
-                        converted = convert_currency(amount, from_currency, to_cur, rates)
-                        conversion_line = f"{format_large_number(converted)} {get_currency_symbol(to_cur)}{to_cur}"
-                        fiat_conversions.append(conversion_line)
-                    except KeyError:
-                        continue
-            if use_quote:
-                response_parts.append("<blockquote expandable>" + "\n".join(fiat_conversions) + "</blockquote>")
-            else:
-                response_parts.append("\n".join(fiat_conversions))
-        
-        if user_crypto:
-            response_parts.append(f"\n\n{LANGUAGES[user_lang]['cryptocurrencies_output']}\n")
-            crypto_conversions = []
-            for to_cur in user_crypto:
-                if to_cur != from_currency:
-                    try:
-                        converted = convert_currency(amount, from_currency, to_cur, rates)
-                        conversion_line = f"{format_large_number(converted, True)} {get_currency_symbol(to_cur)}{to_cur}"
-                        crypto_conversions.append(conversion_line)
-                    except KeyError:
-                        continue
-            if use_quote:
-                response_parts.append("<blockquote expandable>" + "\n".join(crypto_conversions) + "</blockquote>")
-            else:
-                response_parts.append("\n".join(crypto_conversions))
-        
+        final_response = _cached_reply(
+            _render_conversion_reply, snapshot, amount, from_currency, user_currencies, user_crypto, user_lang, use_quote
+        )
         kb = _build_delete_conversion_kb(user_lang)
 
-        final_response = "".join(response_parts).strip()
-        
         await message.reply(
             text=final_response,
             reply_markup=kb.as_markup()
@@ -419,6 +384,9 @@ async def handle_message(message: types.Message):
     if from_user.is_bot:
         return
 
+    if not message_prefilter.check(message.text):
+        return
+
     if len(message.text) > 500:
         logger.debug("Message too long from user %s, ignoring", from_user.id)
         return
@@ -429,9 +397,6 @@ async def handle_message(message: types.Message):
 
     user_id = from_user.id
 
-    if message.text.startswith('/'):
-        return 
-
     parts = _SEPARATORS_REGEX.split(message.text)
     
     requests = []
@@ -445,9 +410,9 @@ async def handle_message(message: types.Message):
     valid_requests = []
     
     for request in requests:
-        parsed_result = parse_amount_and_currency(request)
-        if parsed_result[0] is not None and parsed_result[1] is not None:
-            valid_requests.append((parsed_result, request))
+        parsed_request = parse_conversion_request(request)
+        if parsed_request is not None:
+            valid_requests.append(parsed_request)
     
     if valid_requests:
         await user_data.update_user_data(user_id, language_code=from_user.language_code)
@@ -457,19 +422,15 @@ async def handle_message(message: types.Message):
             logger.warning(f"User {user_id} sent too many conversion requests, truncated to 10")
 
         if len(valid_requests) > 1:
-            await process_multiple_conversions(message, [(a, c) for (a, c), _ in valid_requests])
+            await process_multiple_conversions(message, [(r.amount, r.source) for r in valid_requests])
         else:
-            (amount, currency), original_text = valid_requests[0]
-            target = _find_target_currency(original_text, currency)
-            if target and target in ALL_CURRENCIES:
-                await process_targeted_conversion(message, amount, currency, target)
+            request = valid_requests[0]
+            targets = [code for code in request.targets if code in ALL_CURRENCIES]
+            if targets:
+                await process_targeted_conversion(message, request.amount, request.source, targets)
             else:
-                await process_conversion(message, amount, currency)
+                await process_conversion(message, request.amount, request.source)
     else:
-        has_numbers = any(char.isdigit() for char in message.text)
-        if not has_numbers:
-            return
-        
         if message.chat.type in ('group', 'supergroup'):
             user_lang = (await user_data.get_chat_data(message.chat.id)).get('language', 'ru')
         else:
@@ -542,20 +503,13 @@ async def handle_message(message: types.Message):
         
         logger.debug("No valid conversion requests found in message: %s from user %s", message.text, user_id)
 
-@router.inline_query()
-async def inline_query_handler(query: InlineQuery):
-    if len(query.query) > 100:
-        return
-
-    user_lang = 'en'
+async def _build_inline_answer(
+    query_text: str, user_id: int, data: dict, snapshot: Optional[RateSnapshot]
+) -> Optional[Tuple[List[InlineQueryResultArticle], int]]:
+    """Results and cache_time for one inline query, or None when it should go unanswered."""
+    user_lang = data.get('language', 'ru')
 
-    if _QUERY_LIKE_TEXT_REGEX.search(query.query):
-        return
-
-    if not query.query.strip():
-        await user_data.update_user_data(query.from_user.id, language_code=query.from_user.language_code)
-        data = await user_data.get_user_data(query.from_user.id)
-        user_lang = data.get('language', 'ru')
+    if not query_text.strip():
         empty_input_result = InlineQueryResultArticle(
             id="empty_input",
             title=LANGUAGES[user_lang].get('empty_input_title', "Enter amount and currency"),
@@ -565,17 +519,12 @@ async def inline_query_handler(query: InlineQuery):
                 "Please enter an amount and currency code to convert, e.g., '100 USD' or '10,982 KZT'.")
             )
         )
-        await query.answer(results=[empty_input_result], cache_time=60)
-        return
+        return [empty_input_result], 60
 
-    amount, from_currency = parse_amount_and_currency(query.query)
+    request = parse_conversion_request(query_text)
 
-    if amount is None or from_currency is None:
-        await user_data.update_user_data(query.from_user.id, language_code=query.from_user.language_code)
-        data = await user_data.get_user_data(query.from_user.id)
-        user_lang = data.get('language', 'ru')
-
-        text = query.query.strip()
+    if request is None:
+        text = query_text.strip()
         
         math_operators = {'+', '-', '*', '/', '^', '×', '÷', ':', 'х'}
         if _MATH_ONLY_REGEX.match(text) and any(op in text for op in math_operators) and not _BARE_NUMBER_REGEX.match(text):
@@ -593,8 +542,7 @@ async def inline_query_handler(query: InlineQuery):
                         parse_mode="HTML"
                     )
                 )
-                await query.answer(results=[math_article], cache_time=60)
-                return
+                return [math_article], 60
 
         unknown_cur = _extract_unknown_currency(text)
         if unknown_cur:
@@ -604,15 +552,14 @@ async def inline_query_handler(query: InlineQuery):
                 for i, code in enumerate(suggestions):
                     results.append(InlineQueryResultArticle(
                         id=f"suggest_{code}",
-                        title=f"{get_currency_symbol(code)}{code}",
+                        title=currency_label(code),
                         description=LANGUAGES[user_lang].get('invalid_input_description', "Tap to use this currency"),
                         input_message_content=InputTextMessageContent(
                             message_text=LANGUAGES[user_lang].get('empty_input_message',
                             "Enter amount and currency code to convert.")
                         )
                     ))
-                await query.answer(results=results, cache_time=60)
-                return
+                return results, 60
 
         if _contains_known_currency(text):
             bounds_state = _detect_amount_bounds_from_text(text)
@@ -623,8 +570,7 @@ async def inline_query_handler(query: InlineQuery):
                     description=LANGUAGES[user_lang].get('invalid_input_description', 'Check your input format'),
                     input_message_content=InputTextMessageContent(message_text=_too_large_message(user_lang)),
                 )
-                await query.answer(results=[too_large_result], cache_time=30)
-                return
+                return [too_large_result], 30
             if bounds_state == 'too_small':
                 too_small_result = InlineQueryResultArticle(
                     id="too_small_invalid",
@@ -632,8 +578,7 @@ async def inline_query_handler(query: InlineQuery):
                     description=LANGUAGES[user_lang].get('invalid_input_description', 'Check your input format'),
                     input_message_content=InputTextMessageContent(message_text=_too_small_message(user_lang)),
                 )
-                await query.answer(results=[too_small_result], cache_time=30)
-                return
+                return [too_small_result], 30
 
         error_result = InlineQueryResultArticle(
             id="error",
@@ -644,13 +589,11 @@ async def inline_query_handler(query: InlineQuery):
                 "Enter amount and currency code: 100 USD or 10,982 KZT.")
             )
         )
-        await query.answer(results=[error_result], cache_time=60)
-        return
+        return [error_result], 60
+
+    amount, from_currency = request.amount, request.source
 
     try:
-        await user_data.update_user_data(query.from_user.id, language_code=query.from_user.language_code)
-        data = await user_data.get_user_data(query.from_user.id)
-        user_lang = data.get('language', 'ru')
         use_quote = data.get('use_quote_format', True)
         user_currencies = data.get('selected_currencies', [])
         user_crypto = data.get('selected_crypto', [])
@@ -667,8 +610,7 @@ async def inline_query_handler(query: InlineQuery):
                     message_text=_too_large_message(user_lang)
                 )
             )
-            await query.answer(results=[too_large_result], cache_time=30)
-            return
+            return [too_large_result], 30
 
         if amount < _MIN_SAFE_CONVERSION_AMOUNT:
             too_small_result = InlineQueryResultArticle(
@@ -679,34 +621,26 @@ async def inline_query_handler(query: InlineQuery):
                     message_text=_too_small_message(user_lang)
                 )
             )
-            await query.answer(results=[too_small_result], cache_time=30)
-            return
+            return [too_small_result], 30
 
-        rates = await get_exchange_rates()
-        if not rates:
-            return
+        if not snapshot:
+            return None
 
-        inline_target = _find_target_currency(query.query, from_currency)
-        if inline_target is not None and inline_target in ALL_CURRENCIES and inline_target != from_currency:
-            target_currency = inline_target
-            assert target_currency is not None
-            converted = convert_currency(amount, from_currency, target_currency, rates)
-            is_crypto = target_currency in CRYPTO_CURRENCIES
-            targeted_content = (
-                f"{format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n"
-                f"= {format_large_number(converted, is_crypto)} {get_currency_symbol(target_currency)}{target_currency}"
-            )
+        inline_targets = [code for code in request.targets if code in ALL_CURRENCIES]
+        targeted_content = (
+            _render_targeted_reply(snapshot, amount, from_currency, inline_targets) if inline_targets else None
+        )
+        if targeted_content is not None:
             targeted_result = InlineQueryResultArticle(
-                id=f"{from_currency}_{target_currency}",
-                title=f"{from_currency} -> {target_currency}",
+                id=f"{from_currency}_{'_'.join(inline_targets)}"[:64],
+                title=f"{from_currency} -> {', '.join(inline_targets)}",
                 description=LANGUAGES[user_lang].get('conversion_result', "Conversion Result"),
                 input_message_content=InputTextMessageContent(
                     message_text=targeted_content,
                     parse_mode="HTML"
                 )
             )
-            await query.answer(results=[targeted_result], cache_time=60)
-            return
+            return [targeted_result], 60
 
         if not user_currencies and not user_crypto:
             no_currency_result = InlineQueryResultArticle(
@@ -718,39 +652,11 @@ async def inline_query_handler(query: InlineQuery):
                     "You haven't selected any currencies. Please go to bot settings to select currencies for conversion.")
                 )
             )
-            await query.answer(results=[no_currency_result], cache_time=60)
-            return
+            return [no_currency_result], 60
 
-        result_content = f"{format_large_number(amount, is_original_amount=True)} {get_currency_symbol(from_currency)}{from_currency}\n\n"
-        
-        if user_currencies:
-            result_content += f"<b>{LANGUAGES[user_lang].get('fiat_currencies', 'Fiat currencies')}</b>\n\n"
-            if use_quote:
-                result_content += "<blockquote expandable>"
-            for to_cur in user_currencies:
-                if to_cur != from_currency:
-                    try:
-                        converted = convert_currency(amount, from_currency, to_cur, rates)
-                        result_content += f"{format_large_number(converted)} {get_currency_symbol(to_cur)}{to_cur}\n"
-                    except (KeyError, OverflowError):
-                        continue
-            if use_quote:
-                result_content += "</blockquote>"
-            result_content += "\n"
-
-        if user_crypto:
-            result_content += f"<b>{LANGUAGES[user_lang].get('cryptocurrencies_output', 'Cryptocurrencies')}</b>\n\n"
-            if use_quote:
-                result_content += "<blockquote expandable>"
-            for to_cur in user_crypto:
-                if to_cur != from_currency:
-                    try:
-                        converted = convert_currency(amount, from_currency, to_cur, rates)
-                        result_content += f"{format_large_number(converted, True)} {get_currency_symbol(to_cur)}{to_cur}\n"
-                    except (KeyError, OverflowError):
-                        continue
-            if use_quote:
-                result_content += "</blockquote>"
+        result_content = _cached_reply(
+            _render_inline_reply, snapshot, amount, from_currency, user_currencies, user_crypto, user_lang, use_quote
+        )
 
         result = InlineQueryResultArticle(
             id=f"{from_currency}_all",
@@ -762,8 +668,8 @@ async def inline_query_handler(query: InlineQuery):
             )
         )
 
-        logger.info(f"Successful inline conversion for user {query.from_user.id}: {amount} {from_currency}")
-        await query.answer(results=[result], cache_time=60)
+        logger.info(f"Successful inline conversion for user {user_id}: {amount} {from_currency}")
+        return [result], 60
     except ValueError as ve:
         error_result = InlineQueryResultArticle(
             id="error",
@@ -774,19 +680,88 @@ async def inline_query_handler(query: InlineQuery):
                 "Invalid input. Please enter amount and currency code, e.g., '100 USD'.")
             )
         )
-        await query.answer(results=[error_result], cache_time=60)
-    except Exception:
-        logger.exception("Error during inline conversion for user %s", query.from_user.id)
-        error_result = InlineQueryResultArticle(
-            id="error",
-            title=LANGUAGES[user_lang].get('error', "Error"),
-            description=LANGUAGES[user_lang].get('error_occurred', "An error occurred. Please try again."),
-            input_message_content=InputTextMessageContent(
-                message_text=LANGUAGES[user_lang].get('error_message', 
-                "An error occurred. Please try again.")
-            )
+        return [error_result], 60
+
+
+def _inline_failure_result(user_lang: str) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id="error",
+        title=LANGUAGES[user_lang].get('error', "Error"),
+        description=LANGUAGES[user_lang].get('error_occurred', "An error occurred. Please try again."),
+        input_message_content=InputTextMessageContent(
+            message_text=LANGUAGES[user_lang].get('error_message', 
+            "An error occurred. Please try again.")
         )
-        await query.answer(results=[error_result], cache_time=60)
+    )
+
+
+def _inline_cache_key(snapshot: Optional[RateSnapshot], query_text: str, prefs: tuple) -> tuple:
+    # Parsing is case-insensitive and ignores runs of spaces, so "100 USD" and "100  usd" share an entry.
+    return snapshot.generation if snapshot else 0, ' '.join(query_text.lower().split()), prefs
+
+
+async def _inline_debounce(user_id: int) -> bool:
+    """Wait for the next keystroke; False when a newer query from the user already arrived."""
+    task = asyncio.current_task()
+    if _inline_tasks.get(user_id) is not task:
+        return False
+    _inline_debouncing.add(task)
+    try:
+        await asyncio.sleep(INLINE_DEBOUNCE)
+    finally:
+        _inline_debouncing.discard(task)
+    return True
+
+
+@router.inline_query()
+async def inline_query_handler(query: InlineQuery):
+    if len(query.query) > 100:
+        return
+
+    if _QUERY_LIKE_TEXT_REGEX.search(query.query):
+        return
+
+    # Telegram sends a query per keystroke: a newer one from the same user supersedes this
+    # one, so only the last of a burst gets rendered. Only the debounce sleep is cancelled;
+    # a query caught in its profile writes finishes them and then skips the debounce.
+    user_id = query.from_user.id
+    task = asyncio.current_task()
+    previous = _inline_tasks.get(user_id)
+    if previous in _inline_debouncing:
+        previous.cancel()
+    _inline_tasks[user_id] = task
+    try:
+        await user_data.update_user_data(user_id, language_code=query.from_user.language_code)
+        data = await user_data.get_user_data(user_id)
+        prefs = (
+            data.get('language', 'ru'), bool(data.get('use_quote_format', True)),
+            tuple(data.get('selected_currencies', [])), tuple(data.get('selected_crypto', [])),
+        )
+        snapshot = await get_rate_snapshot()
+        answer = inline_cache.get(_inline_cache_key(snapshot, query.query, prefs))
+        if answer is None:
+            # Only work that is not cached yet waits for the next keystroke.
+            if INLINE_DEBOUNCE > 0:
+                if not await _inline_debounce(user_id):
+                    return
+                snapshot = await get_rate_snapshot()
+            try:
+                answer = await _build_inline_answer(query.query, user_id, data, snapshot)
+            except Exception:
+                # Not cached: a transient failure must not stick until the next snapshot.
+                logger.exception("Error during inline conversion for user %s", user_id)
+                await query.answer(results=[_inline_failure_result(prefs[0])], cache_time=5, is_personal=True)
+                return
+            if answer is None:
+                return
+            inline_cache.put(_inline_cache_key(snapshot, query.query, prefs), answer)
+
+        results, cache_time = answer
+        await query.answer(results=results, cache_time=cache_time, is_personal=True)
+    finally:
+        if _inline_tasks.get(user_id) is task:
+            del _inline_tasks[user_id]
+
 
 @router.my_chat_member()
 async def handle_my_chat_member(event: ChatMemberUpdated, bot: Bot):
@@ -14,14 +14,21 @@ from config.config import (
     LOG_LEVEL,
     HTTP_TOTAL_TIMEOUT,
     HTTP_CONNECT_TIMEOUT,
-    CACHE_EXPIRATION_TIME,
     HTTP_CONNECTOR_LIMIT,
     HTTP_CONNECTOR_LIMIT_PER_HOST,
     HTTP_DNS_CACHE_TTL,
+    FIAT_REFRESH_INTERVAL,
+    CRYPTO_REFRESH_INTERVAL,
+    REFRESH_JITTER,
+    REFRESH_ERROR_BACKOFF,
 )
 from loader import bot, dp, user_data
 from utils.http import set_http_session, close_http_session, safe_bg_task
-from utils.rates import get_exchange_rates, refresh_rates
+from utils.rates import (
+    get_exchange_rates, refresh_asset_class, load_persisted_rates,
+    open_shared_rates, close_shared_rates, is_shared_reader, set_refresh_leader,
+)
+from utils.scheduler import RefreshJob, RefreshScheduler
 from utils.log_handler import setup_telegram_logging
 
 from utils.middleware import RateLimitMiddleware, RetryMiddleware, ErrorBoundaryMiddleware
@@ -44,25 +51,21 @@ async def _warmup_rates():
     except (ClientError, asyncio.TimeoutError, RuntimeError, ValueError, TypeError, KeyError):
         logger.exception("Warmup failed")
 
-async def _periodic_refresh():
-    normal_interval = max(CACHE_EXPIRATION_TIME - 60, 60)
-    error_interval = 30
-    while True:
-        await asyncio.sleep(normal_interval)
-        try:
-            await asyncio.wait_for(refresh_rates(force=True), timeout=30.0)
-            logger.info("Periodic rate refresh completed")
-        except asyncio.CancelledError:
-            raise
-        except asyncio.TimeoutError:
-            logger.warning("Periodic rate refresh timed out, retrying in %ds", error_interval)
-            await asyncio.sleep(error_interval)
-        except (ClientError, RuntimeError, ValueError, TypeError, KeyError):
-            logger.exception("Periodic rate refresh failed, retrying in %ds", error_interval)
-            await asyncio.sleep(error_interval)
+rate_scheduler = RefreshScheduler()
+rate_scheduler.add(RefreshJob(
+    'fiat_rates', lambda: refresh_asset_class('fiat'), FIAT_REFRESH_INTERVAL,
+    jitter=REFRESH_JITTER, error_backoff=REFRESH_ERROR_BACKOFF,
+))
+rate_scheduler.add(RefreshJob(
+    'crypto_rates', lambda: refresh_asset_class('crypto'), CRYPTO_REFRESH_INTERVAL,
+    jitter=REFRESH_JITTER, error_backoff=REFRESH_ERROR_BACKOFF,
+))
 
 async def on_startup():
     await setup_telegram_logging(bot)
+    open_shared_rates()
+    if not is_shared_reader():
+        load_persisted_rates()
     session = ClientSession(
         timeout=ClientTimeout(total=HTTP_TOTAL_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
         connector=TCPConnector(
@@ -74,10 +77,15 @@ async def on_startup():
     )
     set_http_session(session)
     
-    await user_data.init_db()
+    # Instances sharing DB_PATH elect one rate refresher; followers adopt its persisted rates.
+    # Shared-memory readers never refresh rates, so they must not win the election.
+    await user_data.init_db(contend_for_lease=not is_shared_reader())
+    user_data.add_leadership_listener(set_refresh_leader)
     
     _bg_tasks.append(safe_bg_task(_warmup_rates(), name="warmup_rates"))
-    _bg_tasks.append(safe_bg_task(_periodic_refresh(), name="periodic_refresh"))
+    if not is_shared_reader():
+        # Shared-memory readers get rates from the writer process and never call the providers.
+        _bg_tasks.extend(rate_scheduler.start())
 
 async def on_shutdown():
     for task in _bg_tasks:
@@ -88,6 +96,7 @@ async def on_shutdown():
         except asyncio.CancelledError:
             pass
     _bg_tasks.clear()
+    close_shared_rates()
     try:
         await close_http_session()
     except RuntimeError:
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import config.config as config
+
+# loader builds the Bot at import time, which validates the token format.
+if 'loader' not in sys.modules:
+    config.BOT_TOKEN = '123456:TEST-token'
+
+import handlers.conversion as conversion
+from utils.rates import RateSnapshot
+
+RATES = {'USD': 1.0, 'EUR': 0.9, 'RUB': 90.0, 'BTC': 1 / 60000}
+
+
+class _StubUserData:
+    async def update_user_data(self, user_id, language_code=None):
+        pass
+
+    async def get_user_data(self, user_id):
+        return {'language': 'en', 'selected_currencies': ['EUR', 'RUB'], 'selected_crypto': ['BTC'],
+                'use_quote_format': False}
+
+    async def get_chat_data(self, chat_id):
+        return {'language': 'ru', 'currencies': ['EUR'], 'crypto': [], 'quote_format': False}
+
+
+class _StubMessage:
+    def __init__(self, chat_type='private'):
+        self.from_user = SimpleNamespace(id=1, language_code='en')
+        self.chat = SimpleNamespace(id=-100 if chat_type != 'private' else 1, type=chat_type)
+        self.replies = []
+        self.answers = []
+
+    async def reply(self, text, reply_markup=None):
+        self.replies.append(text)
+
+    async def answer(self, text, reply_markup=None):
+        self.answers.append(text)
+
+
+@pytest.fixture
+def handler_env(monkeypatch):
+    snapshot = RateSnapshot(RATES, 1, time.time())
+
+    async def get_snapshot():
+        return snapshot
+
+    monkeypatch.setattr(conversion, 'user_data', _StubUserData())
+    monkeypatch.setattr(conversion, 'get_rate_snapshot', get_snapshot)
+    conversion.reply_cache.invalidate()
+
+
+class TestProcessConversion:
+    def test_private_chat_uses_user_prefs(self, handler_env):
+        message = _StubMessage()
+        asyncio.run(conversion.process_conversion(message, 100, 'USD'))
+        assert message.answers == []
+        assert len(message.replies) == 1
+        text = message.replies[0]
+        assert 'EUR' in text and 'RUB' in text and 'BTC' in text
+
+    def test_group_chat_uses_chat_prefs(self, handler_env):
+        message = _StubMessage('supergroup')
+        asyncio.run(conversion.process_conversion(message, 100, 'USD'))
+        assert message.answers == []
+        text = message.replies[0]
+        assert 'EUR' in text and 'RUB' not in text and 'BTC' not in text
+
+    def test_targeted_and_multiple(self, handler_env):
+        message = _StubMessage()
+        asyncio.run(conversion.process_targeted_conversion(message, 10, 'USD', ['RUB']))
+        asyncio.run(conversion.process_multiple_conversions(message, [(1, 'USD'), (2, 'EUR')]))
+        assert message.answers == []
+        assert len(message.replies) == 2
+
+
+class _StubInlineQuery:
+    def __init__(self, text):
+        self.query = text
+        self.from_user = SimpleNamespace(id=1, language_code='en')
+        self.answers = []
+
+    async def answer(self, results, cache_time, is_personal=False):
+        self.answers.append(([r.id for r in results], cache_time))
+
+
+class TestInlineQueryHandler:
+    def test_cache_hit_skips_debounce(self, handler_env, monkeypatch):
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 0)
+        conversion.inline_cache.invalidate()
+        asyncio.run(conversion.inline_query_handler(_StubInlineQuery("100 usd")))
+
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 30)
+        query = _StubInlineQuery("100 usd")
+        asyncio.run(asyncio.wait_for(conversion.inline_query_handler(query), timeout=1))
+        assert query.answers == [(["USD_all"], 60)]
+
+    def test_cache_key_ignores_case_and_spacing(self, handler_env, monkeypatch):
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 0)
+        conversion.inline_cache.invalidate()
+        asyncio.run(conversion.inline_query_handler(_StubInlineQuery("100 USD")))
+
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 30)
+        query = _StubInlineQuery(" 100   usd ")
+        asyncio.run(asyncio.wait_for(conversion.inline_query_handler(query), timeout=1))
+        assert query.answers == [(["USD_all"], 60)]
+
+    def test_failures_are_not_cached(self, handler_env, monkeypatch):
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 0)
+        conversion.inline_cache.invalidate()
+
+        def broken(*args, **kwargs):
+            raise RuntimeError("transient")
+
+        monkeypatch.setattr(conversion, '_render_inline_reply', broken)
+        query = _StubInlineQuery("100 usd")
+        asyncio.run(conversion.inline_query_handler(query))
+        assert query.answers == [(["error"], 5)]
+        assert len(conversion.inline_cache) == 0
+
+    def test_newer_query_cancels_only_the_debounce(self, handler_env, monkeypatch):
+        monkeypatch.setattr(conversion, 'INLINE_DEBOUNCE', 0.05)
+        conversion.inline_cache.invalidate()
+        slow_write = asyncio.Event()
+
+        class _SlowUserData(_StubUserData):
+            async def update_user_data(self, user_id, language_code=None):
+                if not slow_write.is_set():
+                    slow_write.set()
+                    await asyncio.sleep(0.02)
+
+        monkeypatch.setattr(conversion, 'user_data', _SlowUserData())
+
+        async def scenario():
+            # The second query arrives while the first is still writing the profile.
+            first = _StubInlineQuery("100 usd")
+            first_task = asyncio.create_task(conversion.inline_query_handler(first))
+            await slow_write.wait()
+            second = _StubInlineQuery("200 usd")
+            second_task = asyncio.create_task(conversion.inline_query_handler(second))
+            await asyncio.sleep(0.03)
+            # Now the second is debouncing, so a third query supersedes it.
+            third = _StubInlineQuery("300 usd")
+            await conversion.inline_query_handler(third)
+            results = await asyncio.gather(first_task, second_task, return_exceptions=True)
+            return first, second, third, results
+
+        first, second, third, results = asyncio.run(scenario())
+        # The first finished its write uncancelled and then stepped aside for the second.
+        assert results[0] is None and first.answers == []
+        assert isinstance(results[1], asyncio.CancelledError) and second.answers == []
+        assert third.answers == [(["USD_all"], 60)]
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.currency_lexicon import CURRENCY_LEXICON, CurrencyLexicon
+
+
+class TestCurrencyLexicon:
+    def test_mentions_with_positions(self):
+        mentions = CURRENCY_LEXICON.find_all("100 usd в eur")
+        assert [(m.start, m.end, m.code) for m in mentions] == [(4, 7, "USD"), (10, 13, "EUR")]
+
+    def test_word_boundaries(self):
+        assert CURRENCY_LEXICON.find_all("100usd") == []
+        assert CURRENCY_LEXICON.find_all("usdx долларx") == []
+        assert CURRENCY_LEXICON.first("$100").code == "USD"
+
+    def test_longest_pattern_wins_at_same_position(self):
+        lexicon = CurrencyLexicon({"ab": "A", "abc": "B", "c d": "C"})
+        assert [m.code for m in lexicon.find_all("abc d")] == ["B"]
+        assert [m.code for m in lexicon.find_all("ab c d")] == ["A", "C"]
+
+    def test_overlapping_suffix_patterns(self):
+        lexicon = CurrencyLexicon({"$": "USD", "us$": "USD2", "s$": "X"})
+        assert [(m.start, m.code) for m in lexicon.find_all("us$ $")] == [(0, "USD2"), (4, "USD")]
+
+    def test_strip(self):
+        assert CURRENCY_LEXICON.strip("5 usd + $10") == "5  + 10"
@@ -2,12 +2,15 @@ import asyncio
 import os
 import sqlite3
 import sys
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pytest
 
 import data.connection as connection
+from data.known_ids import KnownIds
+from data.profiles import UserProfile
 from data.user_data import UserData
 
 
@@ -66,6 +69,65 @@ class TestUserRepo:
 
         _run(scenario())
 
+    def test_cache_holds_profiles_and_returns_copies(self, db_path):
+        async def scenario():
+            db = UserData()
+            await db.init_db()
+            try:
+                data = await db.get_user_data(5)
+                data["selected_currencies"].append("XYZ")
+                assert isinstance(db.user_data.peek(5), UserProfile)
+                assert "XYZ" not in (await db.get_user_data(5))["selected_currencies"]
+                await db.set_user_currencies(5, ["RUB", "USD"])
+                assert await db.get_user_currencies(5) == ["USD", "RUB"]  # table order
+            finally:
+                await db.close()
+
+        _run(scenario())
+
+    def test_profile_cache_is_bounded(self, db_path, monkeypatch):
+        monkeypatch.setattr(connection, "USER_CACHE_SIZE", 2)
+
+        async def scenario():
+            db = UserData()
+            await db.init_db()
+            try:
+                for user_id in (1, 2, 3):
+                    await db.get_user_data(user_id)
+                await db.get_user_data(3)
+                stats = db.cache_stats()["users"]
+                assert stats["size"] == 2 and stats["evictions"] == 1 and stats["hits"] == 1
+                assert 1 not in db.user_data
+                assert (await db.get_user_data(1))["language"] == "ru"  # reloaded from the DB
+            finally:
+                await db.close()
+
+        _run(scenario())
+
+    def test_setters_do_not_count_as_cache_lookups(self, db_path):
+        async def scenario():
+            db = UserData()
+            await db.init_db()
+            try:
+                await db.get_user_data(9)
+                await db.get_chat_data(-9)
+                before = db.cache_stats()
+                await db.update_user_data(9)
+                await db.set_user_currencies(9, ["USD"])
+                await db.set_user_crypto(9, ["BTC"])
+                await db.set_user_language(9, "en")
+                await db.set_user_quote_format(9, False)
+                await db.set_chat_currencies(-9, ["EUR"])
+                await db.set_chat_crypto(-9, ["TON"])
+                await db.set_chat_language(-9, "ru")
+                await db.set_chat_quote_format(-9, False)
+                assert db.cache_stats() == before
+                assert (await db.get_user_data(9))["selected_currencies"] == ["USD"]
+            finally:
+                await db.close()
+
+        _run(scenario())
+
     def test_quote_format_toggle(self, db_path):
         async def scenario():
             db = UserData()
@@ -151,6 +213,47 @@ class TestChatRepo:
         _run(scenario())
 
 
+class TestKnownIds:
+    def test_known_ids_loaded_at_startup(self, db_path):
+        async def scenario():
+            db1 = UserData()
+            await db1.init_db()
+            await db1.get_user_data(11)
+            await db1.get_chat_data(-22)
+            await db1.close()
+
+            db2 = UserData()
+            await db2.init_db()
+            try:
+                assert 11 in db2.known_users and -22 in db2.known_chats
+                assert 12 not in db2.known_users
+                # Known ids never wait for the write lock, even when not cached.
+                async with db2._write_lock:
+                    data = await asyncio.wait_for(db2.get_user_data(11), timeout=1)
+                    await asyncio.wait_for(db2.update_user_data(11), timeout=1)
+                assert data["language"] == "ru"
+            finally:
+                await db2.close()
+
+        _run(scenario())
+
+    def test_new_user_is_added(self, db_path):
+        async def scenario():
+            db = UserData()
+            await db.init_db()
+            try:
+                await db.update_user_data(5, language_code="en")
+                assert 5 in db.known_users
+                db.known_users = KnownIds()  # as if another instance had inserted it
+                db.user_data.pop(5)
+                assert await db.get_user_language(5) == "en"
+                assert 5 in db.known_users
+            finally:
+                await db.close()
+
+        _run(scenario())
+
+
 class TestBackups:
     def test_backup_db_creates_valid_copy(self, db_path, monkeypatch):
         monkeypatch.setattr(connection, "DB_BACKUP_INTERVAL_HOURS", 0)
@@ -205,6 +308,81 @@ class TestBackups:
         assert len(connection.DatabaseMixin._list_backups()) == 1
 
 
+class TestLeaderLease:
+    def test_single_leader_and_takeover_after_expiry(self, db_path):
+        async def scenario():
+            first, second = UserData(), UserData()
+            first.instance_id, second.instance_id = "a", "b"
+            await first.init_db()
+            await second.init_db()
+            try:
+                assert first.is_leader is True
+                assert second.is_leader is False
+                assert await first.try_acquire_lease() is True  # renewal by the holder
+
+                changes = []
+                second.add_leadership_listener(changes.append)
+                assert await first.try_acquire_lease(ttl=-1) is True  # lease now expired
+                await second._renew_leadership()
+                assert second.is_leader is True
+                assert changes == [False, True]
+                assert await first.try_acquire_lease() is False
+            finally:
+                await first.close()
+                await second.close()
+
+        _run(scenario())
+
+    def test_non_contender_never_takes_the_lease(self, db_path):
+        async def scenario():
+            reader, writer = UserData(), UserData()
+            reader.instance_id, writer.instance_id = "reader", "writer"
+            await reader.init_db(contend_for_lease=False)  # starts first, with no lease held
+            await writer.init_db()
+            try:
+                assert reader.is_leader is False
+                assert reader._lease_task is None
+                assert writer.is_leader is True
+            finally:
+                await reader.close()
+                await writer.close()
+
+        _run(scenario())
+
+    def test_close_releases_lease(self, db_path):
+        async def scenario():
+            first, second = UserData(), UserData()
+            first.instance_id, second.instance_id = "a", "b"
+            await first.init_db()
+            await first.close()
+            await second.init_db()
+            try:
+                return second.is_leader
+            finally:
+                await second.close()
+
+        assert _run(scenario()) is True
+
+    def test_follower_skips_backups(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("INSERT INTO leases VALUES ('leader', 'other', ?)", (time.time() + 60,))
+        conn.commit()
+        conn.close()
+
+        async def scenario():
+            follower = UserData()
+            await follower.init_db()
+            try:
+                await asyncio.sleep(0.1)
+                return follower.is_leader
+            finally:
+                await follower.close()
+
+        assert _run(scenario()) is False
+        assert connection.DatabaseMixin._list_backups() == []
+
+
 class TestFlushFailureRecovery:
     def test_failed_flush_restores_pending(self, db_path):
         async def scenario():
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+import pytest
+
+import utils.http as http
+from utils.http import hedged_requests, CircuitBreaker, CircuitOpenError
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestHedgedRequests:
+    def test_fast_primary_never_hedges(self):
+        started = []
+
+        def attempt(name, delay, result):
+            async def _go():
+                started.append(name)
+                await asyncio.sleep(delay)
+                return result
+            return _go
+
+        results = []
+
+        def on_result(r):
+            results.append(r)
+            return True
+
+        done = _run(hedged_requests(
+            [(attempt("a", 0.01, "A"), 0.2), (attempt("b", 0.01, "B"), 0.2)], on_result
+        ))
+        assert done is True
+        assert started == ["a"]
+        assert results == ["A"]
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        cancelled = []
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append("slow")
+                raise
+            return "slow"
+
+        async def fast():
+            return "fast"
+
+        results = []
+
+        def on_result(r):
+            results.append(r)
+            return True
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            t0 = loop.time()
+            done = await hedged_requests([(slow, 0.05), (fast, 0.05)], on_result)
+            return done, loop.time() - t0
+
+        done, elapsed = _run(scenario())
+        assert done is True
+        assert results == ["fast"]
+        assert cancelled == ["slow"]
+        assert elapsed < 1.0
+
+    def test_failure_starts_next_immediately(self):
+        async def broken():
+            raise RuntimeError("boom")
+
+        async def ok():
+            return "ok"
+
+        results = []
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            t0 = loop.time()
+            done = await hedged_requests([(broken, 10.0), (ok, 10.0)], lambda r: results.append(r) or True)
+            return done, loop.time() - t0
+
+        done, elapsed = _run(scenario())
+        assert done is True
+        assert results == ["ok"]
+        assert elapsed < 1.0
+
+    def test_partial_results_keep_going_until_complete(self):
+        async def part(value):
+            return value
+
+        collected = set()
+
+        def on_result(r):
+            collected.update(r)
+            return collected >= {"x", "y"}
+
+        done = _run(hedged_requests(
+            [(lambda: part({"x"}), 1.0), (lambda: part({"y"}), 1.0), (lambda: part({"z"}), 1.0)], on_result
+        ))
+        assert done is True
+        assert collected == {"x", "y"}
+
+    def test_exhausted_returns_false(self):
+        async def nothing():
+            return None
+
+        assert _run(hedged_requests([(nothing, 0.1)], lambda r: bool(r))) is False
+        assert _run(hedged_requests([], lambda r: True)) is False
+
+
+def _response_error(status, headers=None):
+    return aiohttp.ClientResponseError(request_info=None, history=(), status=status, headers=headers)
+
+
+class TestCircuitBreaker:
+    def setup_method(self):
+        http._circuit_breakers.clear()
+
+    def test_opens_after_threshold_and_fails_fast(self, monkeypatch):
+        monkeypatch.setattr(http, "CIRCUIT_FAILURE_THRESHOLD", 2)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            raise aiohttp.ClientConnectionError("down")
+
+        for _ in range(2):
+            with pytest.raises(aiohttp.ClientConnectionError):
+                _run(http._with_retries(failing, "example.test", retries=0))
+        assert http.get_circuit_breaker("example.test").state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            _run(http._with_retries(failing, "example.test", retries=0))
+        assert len(calls) == 2
+
+    def test_429_opens_for_retry_after_without_retrying(self):
+        calls = []
+
+        async def limited():
+            calls.append(1)
+            raise _response_error(429, {"Retry-After": "120"})
+
+        with pytest.raises(aiohttp.ClientResponseError):
+            _run(http._with_retries(limited, "api.test", retries=3))
+        breaker = http.get_circuit_breaker("api.test")
+        assert len(calls) == 1
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.open_until - http.time.monotonic() > 100
+
+    def test_half_open_probe_closes_on_success(self, monkeypatch):
+        breaker = http.get_circuit_breaker("probe.test")
+        breaker.record_failure(retry_after=0.0)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        async def ok():
+            return "ok"
+
+        assert _run(http._with_retries(ok, "probe.test", retries=0)) == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker("single.test")
+        breaker.record_failure(retry_after=0.0)
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_failed_probe_reopens_with_longer_cool_down(self):
+        breaker = CircuitBreaker("backoff.test")
+        breaker.record_failure(retry_after=0.0)
+        breaker.before_call()
+        initial = breaker.open_seconds
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.open_seconds == initial * 2
+
+    def test_client_errors_do_not_trip(self, monkeypatch):
+        monkeypatch.setattr(http, "CIRCUIT_FAILURE_THRESHOLD", 1)
+
+        async def not_found():
+            raise _response_error(404)
+
+        with pytest.raises(aiohttp.ClientResponseError):
+            _run(http._with_retries(not_found, "notfound.test", retries=0))
+        assert http.get_circuit_breaker("notfound.test").state == CircuitBreaker.CLOSED
+
+
+class _FakeResponse:
+    def __init__(self, status, body=b"", headers=None):
+        self.status = status
+        self._body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise _response_error(self.status)
+
+    async def read(self):
+        return self._body
+
+
+class _FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    async def get(self, url, timeout=None, headers=None):
+        self.sent_headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+class TestConditionalGet:
+    URL = "https://rates.test/latest"
+
+    def setup_method(self):
+        http._validator_cache.clear()
+        http._circuit_breakers.clear()
+
+    def test_validators_sent_and_304_reuses_payload(self):
+        session = _FakeSession([
+            _FakeResponse(200, b'{"rates": {"EUR": 0.9}}', {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+            _FakeResponse(304),
+        ])
+        first, changed_first = _run(http.get_json_conditional(session, self.URL, None))
+        second, changed_second = _run(http.get_json_conditional(session, self.URL, None))
+        assert changed_first is True and changed_second is False
+        assert second is first
+        assert session.sent_headers[0] == {}
+        assert session.sent_headers[1] == {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        }
+
+    def test_identical_body_short_circuits_decode(self):
+        body = b'{"rates": {"EUR": 0.9}}'
+        session = _FakeSession([_FakeResponse(200, body), _FakeResponse(200, body), _FakeResponse(200, b'{"rates": {}}')])
+        first, _ = _run(http.get_json_conditional(session, self.URL, None))
+        second, changed = _run(http.get_json_conditional(session, self.URL, None))
+        assert changed is False and second is first
+        third, changed = _run(http.get_json_conditional(session, self.URL, None))
+        assert changed is True and third == {"rates": {}}
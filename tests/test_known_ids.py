@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.known_ids import KnownIds
+
+
+class TestKnownIds:
+    def test_membership(self):
+        ids = KnownIds([5, -100123, 3, 5])
+        assert len(ids) == 3
+        assert 5 in ids and -100123 in ids and 3 in ids
+        assert 4 not in ids and 0 not in ids and 10 ** 12 not in ids
+
+    def test_add_keeps_order_and_ignores_duplicates(self):
+        ids = KnownIds()
+        for user_id in (7, 1, 9, 7, -3):
+            ids.add(user_id)
+        assert list(ids._ids) == [-3, 1, 7, 9]
+        assert 9 in ids and 8 not in ids
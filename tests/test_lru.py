@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lru import LRUCache
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache[1] = "a"
+        cache[2] = "b"
+        cache.get(1)
+        cache[3] = "c"
+        assert 2 not in cache
+        assert cache.get(1) == "a" and cache.get(3) == "c"
+        assert cache.stats()["evictions"] == 1
+
+    def test_counters(self):
+        cache = LRUCache(4)
+        assert cache.get(1) is None
+        cache[1] = "a"
+        assert cache.get(1) == "a"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_none_value_is_a_miss(self):
+        cache = LRUCache(4)
+        cache[7] = None
+        assert 7 in cache
+        assert cache.get(7) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_peek_and_contains_keep_order(self):
+        cache = LRUCache(2)
+        cache[1] = "a"
+        cache[2] = "b"
+        assert cache.peek(1) == "a" and 1 in cache
+        cache[3] = "c"
+        assert 1 not in cache
+        assert cache.stats()["hits"] == 0
+
+    def test_pop(self):
+        cache = LRUCache(2)
+        cache[1] = "a"
+        assert cache.pop(1) == "a"
+        assert cache.pop(1) is None
+        assert len(cache) == 0
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.prefilter import MessagePrefilter
+
+
+class TestMessagePrefilter:
+    def test_drops_chatter_and_commands(self):
+        prefilter = MessagePrefilter()
+        assert prefilter.check("привет всем, как дела?") is False
+        assert prefilter.check("/settings 2") is False
+        assert prefilter.stats() == {'passed': 0, 'dropped': 2, 'drop_rate': 1.0}
+
+    def test_passes_anything_with_a_digit(self):
+        prefilter = MessagePrefilter()
+        for text in ("100$", "5к рублей", "2+2", "конвертировать 10"):
+            assert prefilter.check(text) is True
+        assert prefilter.stats()['passed'] == 4
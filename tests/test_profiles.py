@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import ALL_CURRENCIES
+from data.profiles import (
+    ChatProfile, UserProfile, decode_currencies, decode_day, decode_language,
+    encode_currencies, encode_day, encode_language,
+)
+
+
+class TestCurrencyMask:
+    def test_round_trip_in_table_order(self):
+        mask = encode_currencies(['TON', 'EUR', 'USD'])
+        assert decode_currencies(mask) == ['USD', 'EUR', 'TON']
+
+    def test_every_code_has_its_own_bit(self):
+        codes = list(ALL_CURRENCIES)
+        mask = encode_currencies(codes)
+        assert mask == (1 << len(codes)) - 1
+        assert decode_currencies(mask) == codes
+
+    def test_unknown_codes_and_duplicates(self):
+        assert encode_currencies(['USD', 'USD', 'XYZ']) == encode_currencies(['USD'])
+        assert decode_currencies(0) == []
+
+
+class TestScalars:
+    def test_day_round_trip(self):
+        assert decode_day(encode_day('2026-04-16')) == '2026-04-16'
+        assert encode_day('2026-04-17') - encode_day('2026-04-16') == 1
+        assert encode_day(None) == 0 and decode_day(0) is None
+
+    def test_language_interning(self):
+        assert encode_language('ru') == 0 and encode_language('en') == 1
+        lang_id = encode_language('de')
+        assert encode_language('de') == lang_id
+        assert decode_language(lang_id) == 'de'
+
+
+class TestProfiles:
+    def test_user_profile_to_dict(self):
+        profile = UserProfile(3, encode_day('2026-04-16'), encode_day('2026-01-02'), encode_language('en'),
+                              False, encode_currencies(['USD', 'RUB']), encode_currencies(['BTC']))
+        assert profile.to_dict() == {
+            "interactions": 3,
+            "last_seen": '2026-04-16',
+            "selected_currencies": ['USD', 'RUB'],
+            "selected_crypto": ['BTC'],
+            "language": 'en',
+            "first_seen": '2026-01-02',
+            "use_quote_format": False,
+        }
+
+    def test_chat_profile_to_dict(self):
+        profile = ChatProfile(encode_language('ru'), True, encode_currencies(['JPY']), 0)
+        assert profile.to_dict() == {'currencies': ['JPY'], 'crypto': [], 'quote_format': True, 'language': 'ru'}
+
+    def test_profiles_have_no_instance_dict(self):
+        assert not hasattr(UserProfile(0, 0, 0, 0, True, 0, 0), '__dict__')
+        assert not hasattr(ChatProfile(0, False, 0, 0), '__dict__')
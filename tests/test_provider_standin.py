@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+import utils.http as http
+import utils.rates as rates
+from utils.provider_standin import ProviderStandin
+
+
+def _provider_for(name, base_url):
+    path = urlparse(rates.PROVIDER_URLS[name]).path
+    if name == 'coingecko':
+        return rates.CoinGeckoProvider(base_url + path)
+    if name == 'coincap':
+        return rates.CoinCapProvider(base_url + path)
+    return rates.FiatJsonProvider(name, base_url + path)
+
+
+def _fetch(standin, name, wanted):
+    async def scenario():
+        server = TestServer(standin.app_for(name))
+        await server.start_server()
+        try:
+            provider = _provider_for(name, str(server.make_url('')).rstrip('/'))
+            async with aiohttp.ClientSession() as session:
+                return await provider.fetch(session, aiohttp.ClientTimeout(total=5), set(wanted))
+        finally:
+            await server.close()
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def fresh_http_state():
+    http._validator_cache.clear()
+    http._circuit_breakers.clear()
+    http._domain_semaphores.clear()
+
+
+@pytest.fixture
+def standin():
+    return ProviderStandin(seed=1, defaults={'latency': 0.0})
+
+
+class TestProviderStandin:
+    @pytest.mark.parametrize("name", ["open.er-api", "exchangerate-api", "fawazahmed"])
+    def test_fiat_shapes_parse(self, standin, name):
+        result = _fetch(standin, name, rates.ACTIVE_CURRENCIES)
+        assert set(result) >= set(rates.ACTIVE_CURRENCIES)
+        assert result["EUR"] == pytest.approx(standin.fiat_rates["EUR"])
+
+    @pytest.mark.parametrize("name", ["coingecko", "coincap"])
+    def test_crypto_shapes_parse(self, standin, name):
+        result = _fetch(standin, name, ["BTC", "ETH"])
+        assert set(result) == {"BTC", "ETH"}
+        assert result["BTC"] == pytest.approx(1.0 / standin.crypto_prices["BTC"])
+
+    def test_partial_coverage_is_stable(self, standin):
+        standin.behaviour["coingecko"].coverage = 0.5
+        first = _fetch(standin, "coingecko", rates.CRYPTO_CURRENCIES)
+        http._validator_cache.clear()
+        second = _fetch(standin, "coingecko", rates.CRYPTO_CURRENCIES)
+        assert len(first) == len(rates.CRYPTO_CURRENCIES) // 2
+        assert set(first) == set(second)
+
+    def test_rate_limit_sends_retry_after(self, standin):
+        standin.behaviour["open.er-api"].update({"rate_limit": 1, "retry_after": 42})
+        with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+            _fetch(standin, "open.er-api", ["EUR"])
+        assert exc_info.value.status == 429
+        assert standin.stats["open.er-api"] == {"429": 1}
+
+    def test_malformed_payload_rejected(self, standin):
+        standin.behaviour["exchangerate-api"].malformed = 1.0
+        with pytest.raises(ValueError):
+            _fetch(standin, "exchangerate-api", ["EUR"])
+
+    def test_unknown_knob_rejected(self, standin):
+        with pytest.raises(KeyError):
+            standin.behaviour["coincap"].update({"bogus": 1})
@@ -4,10 +4,25 @@ import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import pytest
+
 import utils.rates as rates
+from utils.rate_history import RateHistory
 from utils.rates import normalize_fiat_payload, convert_currency
 
 
+@pytest.fixture(autouse=True)
+def rates_cache_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "rates_cache.json")
+    monkeypatch.setattr(rates, "RATES_CACHE_PATH", path)
+    monkeypatch.setattr(rates, "RATES_HISTORY_DIR", "")
+    monkeypatch.setattr(rates, "_history", None)
+    monkeypatch.setattr(rates, "_class_fetched_at", {})
+    monkeypatch.setattr(rates, "_refresh_leader", True)
+    monkeypatch.setattr(rates, "_persisted_mtime", 0.0)
+    return path
+
+
 class TestNormalizeFiatPayload:
     def test_er_api_shape(self):
         # open.er-api.com: {"result": "success", "rates": {...}}
@@ -111,3 +126,443 @@ class TestConvertCurrency:
         import pytest
         with pytest.raises(KeyError):
             convert_currency(1, "USD", "XXX", self.RATES)
+
+
+class TestRateSnapshot:
+    RATES = {"EUR": 0.9, "RUB": 90.0, "BTC": 0.00002, "XXX": 5.0}
+
+    def setup_method(self):
+        rates.cache.clear()
+
+    def test_convert_matches_convert_currency(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        for src, dst in [("USD", "EUR"), ("EUR", "USD"), ("RUB", "EUR"), ("BTC", "RUB")]:
+            expected = convert_currency(123.0, src, dst, self.RATES)
+            assert abs(snap.convert(123.0, src, dst) - expected) < 1e-9 * abs(expected)
+
+    def test_convert_outside_table_falls_back_to_rates(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        assert snap.convert(10, "USD", "XXX") == 50.0
+
+    def test_missing_rate_raises(self):
+        import pytest
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        with pytest.raises(KeyError):
+            snap.convert(1, "USD", "GBP")
+
+    def test_convert_to_row(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        result = snap.convert_to(100, "USD", ["EUR", "GBP", "RUB", "NOPE"])
+        assert result[0] == 90.0
+        assert result[2] == 9000.0
+        assert result[1] != result[1] and result[3] != result[3]  # NaN
+
+    def test_snapshot_is_immutable(self):
+        import pytest
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        with pytest.raises(AttributeError):
+            snap.generation = 2
+        with pytest.raises(ValueError):
+            snap.matrix[0, 0] = 2.0
+        with pytest.raises(TypeError):
+            snap.rates["EUR"] = 1.0
+
+    def test_store_rates_publishes_new_generation(self):
+        rates._store_rates({"EUR": 0.9})
+        first = rates.get_current_snapshot()
+        rates._store_rates({"EUR": 0.8})
+        second = rates.get_current_snapshot()
+        assert second.generation > first.generation
+        assert second.convert(1, "USD", "EUR") == 0.8
+        assert first.convert(1, "USD", "EUR") == 0.9
+
+    def test_unchanged_fetch_keeps_generation_but_refreshes_ttl(self):
+        rates._store_rates({"EUR": 0.9})
+        first = rates.get_current_snapshot()
+        stale_ts = time.time() - rates.CACHE_EXPIRATION_TIME - 10
+        rates.cache["exchange_rates"] = (rates.cache["exchange_rates"][0], stale_ts)
+        rates._store_rates({"EUR": 0.9})
+        assert rates.get_current_snapshot() is first
+        assert rates.get_cached_data("exchange_rates") == {"EUR": 0.9}
+
+    def test_get_rate_snapshot_from_externally_cached_rates(self):
+        import asyncio
+        rates.set_cached_data("exchange_rates", {"EUR": 0.5})
+        snap = asyncio.run(rates.get_rate_snapshot())
+        assert snap.convert(2, "USD", "EUR") == 1.0
+        assert asyncio.run(rates.get_rate_snapshot()) is snap
+
+
+class TestConvertMany:
+    RATES = {"EUR": 0.9, "RUB": 90.0, "BTC": 0.00002}
+
+    def test_batch_shape_and_values(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        result, valid = rates.convert_many([100, 200, 5000], ["USD", "EUR", "RUB"], ["EUR", "RUB", "GBP"], snapshot=snap)
+        assert result.shape == valid.shape == (3, 3)
+        assert result[0, 0] == 90.0
+        assert abs(result[1, 1] - 20000.0) < 1e-6
+        assert abs(result[2, 0] - 50.0) < 1e-9
+        assert valid[:, :2].all()
+        assert not valid[:, 2].any()
+
+    def test_unknown_source_row_is_invalid(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        _, valid = snap.convert_many([1, 1], ["NOPE", "USD"], ["EUR"])
+        assert valid.tolist() == [[False], [True]]
+
+    def test_empty_targets(self):
+        snap = rates.RateSnapshot(self.RATES, generation=1, fetched_at=0.0)
+        result, valid = snap.convert_many([1], ["USD"], [])
+        assert result.shape == (1, 0)
+
+    def test_without_snapshot_raises(self, monkeypatch):
+        import pytest
+        monkeypatch.setattr(rates, "_snapshot", None)
+        with pytest.raises(KeyError):
+            rates.convert_many([1], ["USD"], ["EUR"])
+
+    def test_defaults_to_current_snapshot(self):
+        rates.cache.clear()
+        rates._store_rates({"EUR": 0.5})
+        result, valid = rates.convert_many([4], ["USD"], ["EUR"])
+        assert result[0, 0] == 2.0 and valid[0, 0]
+
+
+class TestPersistedRates:
+    def setup_method(self):
+        rates.cache.clear()
+
+    def test_store_then_reload_after_restart(self, rates_cache_path):
+        rates._store_rates({"EUR": 0.9, "RUB": 90.0})
+        assert os.path.exists(rates_cache_path)
+        rates.cache.clear()
+
+        assert rates.load_persisted_rates() is True
+        assert rates.cache["exchange_rates"][0] == {"EUR": 0.9, "RUB": 90.0}
+        assert rates.get_cached_data("exchange_rates") is None  # due for revalidation
+        assert rates.get_current_snapshot().convert(1, "USD", "RUB") == 90.0
+
+    def test_reloaded_rates_served_stale_while_revalidating(self, monkeypatch):
+        import asyncio
+        refreshed = []
+
+        async def fake_refresh(*args):
+            refreshed.append(True)
+
+        monkeypatch.setattr(rates, "_bg_refresh_rates", fake_refresh)
+        rates._store_rates({"EUR": 0.9})
+        rates.cache.clear()
+        rates.load_persisted_rates()
+
+        async def scenario():
+            result = await rates.get_exchange_rates()
+            await asyncio.sleep(0)
+            return result
+
+        assert asyncio.run(scenario()) == {"EUR": 0.9}
+        assert refreshed == [True]
+
+    def test_old_file_does_not_block_first_lookup(self, rates_cache_path, monkeypatch):
+        import asyncio
+        import ujson
+
+        async def slow_fetch(session, timeout, asset_class, wanted, hedge=False):
+            await asyncio.sleep(30)
+            return {}
+
+        monkeypatch.setattr(rates, "_fetch_asset_class", slow_fetch)
+        with open(rates_cache_path, "w") as f:
+            f.write(ujson.dumps({"ts": time.time() - 30 * 60, "rates": {"EUR": 0.9}}))
+        assert rates.load_persisted_rates() is True
+
+        result = asyncio.run(asyncio.wait_for(rates.get_exchange_rates(), timeout=1))
+        assert result == {"EUR": 0.9}
+
+    def test_missing_file(self):
+        assert rates.load_persisted_rates() is False
+        assert "exchange_rates" not in rates.cache
+
+    def test_corrupt_file_ignored(self, rates_cache_path):
+        with open(rates_cache_path, "w") as f:
+            f.write("{not json")
+        assert rates.load_persisted_rates() is False
+
+    def test_too_old_file_ignored(self, rates_cache_path):
+        import ujson
+        with open(rates_cache_path, "w") as f:
+            f.write(ujson.dumps({"ts": time.time() - rates.RATES_CACHE_MAX_AGE - 1, "rates": {"EUR": 0.9}}))
+        assert rates.load_persisted_rates() is False
+
+    def test_does_not_override_live_cache(self):
+        rates._store_rates({"EUR": 0.9})
+        rates.set_cached_data("exchange_rates", {"EUR": 0.8})
+        assert rates.load_persisted_rates() is False
+        assert rates.cache["exchange_rates"][0] == {"EUR": 0.8}
+
+
+class TestRateHistory:
+    def test_append_and_rate_at(self, tmp_path):
+        history = RateHistory(str(tmp_path / "hist"), ["USD", "EUR", "RUB"])
+        assert history.rate_at("USD", "EUR", 100) is None
+        assert history.append(100, {"EUR": 0.9, "RUB": 90.0})
+        assert history.append(200, {"EUR": 0.8, "RUB": 80.0})
+        assert len(history) == 2
+        assert history.rate_at("USD", "EUR", 99) is None
+        assert history.rate_at("USD", "EUR", 100) == 0.9
+        assert history.rate_at("USD", "EUR", 150) == 0.9
+        assert history.rate_at("USD", "EUR", 10_000) == 0.8
+        assert abs(history.rate_at("RUB", "EUR", 200) - 0.01) < 1e-12
+
+    def test_non_monotonic_append_skipped(self, tmp_path):
+        history = RateHistory(str(tmp_path / "hist"), ["USD", "EUR"])
+        assert history.append(100, {"EUR": 0.9})
+        assert not history.append(50, {"EUR": 0.8})
+        assert len(history) == 1
+
+    def test_same_second_append_replaces_last_row(self, tmp_path):
+        directory = str(tmp_path / "hist")
+        history = RateHistory(directory, ["USD", "EUR"])
+        assert history.append(100, {"EUR": 0.9})
+        assert history.append(200.2, {"EUR": 0.8})
+        assert history.rate_at("USD", "EUR", 200) == 0.8
+        assert history.append(200.7, {"EUR": 0.7})
+        assert len(history) == 2
+        assert history.rate_at("USD", "EUR", 200) == 0.7
+        assert history.rate_at("USD", "EUR", 100) == 0.9
+        assert RateHistory(directory, ["USD", "EUR"]).rate_at("USD", "EUR", 200) == 0.7
+
+    def test_series_bounds(self, tmp_path):
+        history = RateHistory(str(tmp_path / "hist"), ["USD", "EUR"])
+        for i in range(10):
+            history.append(1000 + i * 10, {"EUR": 1.0 + i})
+        ts, values = history.series("USD", "EUR", 1020, 1050)
+        assert ts.tolist() == [1020, 1030, 1040, 1050]
+        assert values.tolist() == [3.0, 4.0, 5.0, 6.0]
+        ts, values = history.series("USD", "EUR", 5000, 6000)
+        assert len(ts) == 0 and len(values) == 0
+
+    def test_missing_rate_is_nan(self, tmp_path):
+        history = RateHistory(str(tmp_path / "hist"), ["USD", "EUR", "GBP"])
+        history.append(100, {"EUR": 0.9})
+        assert history.rate_at("USD", "GBP", 100) is None
+
+    def test_reopen_and_repair(self, tmp_path):
+        directory = str(tmp_path / "hist")
+        history = RateHistory(directory, ["USD", "EUR"])
+        history.append(100, {"EUR": 0.9})
+        history.append(200, {"EUR": 0.8})
+        # simulate a crash after writing a value column but before the timestamp
+        with open(os.path.join(directory, "EUR.col"), "ab") as f:
+            f.write(b"\0" * 8)
+
+        reopened = RateHistory(directory, ["USD", "EUR", "GBP"])
+        assert len(reopened) == 2
+        assert reopened.rate_at("USD", "EUR", 250) == 0.8
+        assert reopened.rate_at("USD", "GBP", 250) is None
+        assert reopened.append(300, {"EUR": 0.7, "GBP": 0.6})
+        assert reopened.rate_at("EUR", "GBP", 300) == 0.6 / 0.7
+
+    def test_store_rates_appends_history(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(rates, "RATES_HISTORY_DIR", str(tmp_path / "hist"))
+        rates.cache.clear()
+        rates._store_rates({"EUR": 0.9})
+        history = rates.get_rate_history()
+        assert len(history) == 1
+        assert history.rate_at("USD", "EUR", time.time() + 1) == 0.9
+
+
+class _FakeProvider(rates.RateProvider):
+    def __init__(self, name, asset_class, currencies, result=None, error=None):
+        super().__init__(name, asset_class, currencies)
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    async def fetch(self, session, timeout, wanted):
+        self.calls.append(set(wanted))
+        if self.error:
+            raise self.error
+        return {k: v for k, v in self.result.items() if k in wanted}
+
+
+class TestProviderRegistry:
+    def setup_method(self):
+        self.registry = rates.ProviderRegistry()
+
+    def _run(self, coro):
+        import asyncio
+        return asyncio.run(coro)
+
+    def test_unmeasured_keep_registration_order(self):
+        a = self.registry.register(_FakeProvider("a", "fiat", ["EUR"], {"EUR": 1.0}))
+        b = self.registry.register(_FakeProvider("b", "fiat", ["EUR"], {"EUR": 1.0}))
+        c = self.registry.register(_FakeProvider("c", "crypto", ["BTC"], {"BTC": 1.0}))
+        assert self.registry.ordered("fiat") == [a, b]
+        assert self.registry.ordered("crypto") == [c]
+
+    def test_failures_and_latency_demote_provider(self):
+        a = self.registry.register(_FakeProvider("a", "fiat", ["EUR"]))
+        b = self.registry.register(_FakeProvider("b", "fiat", ["EUR"]))
+        self.registry.stats("a").record(0.1, ok=False)
+        self.registry.stats("b").record(0.5, ok=True)
+        assert self.registry.ordered("fiat") == [b, a]
+
+        self.registry.stats("a").record(0.05, ok=True)
+        for _ in range(10):
+            self.registry.stats("a").record(0.05, ok=True)
+        assert self.registry.ordered("fiat") == [a, b]
+
+    def test_call_keeps_only_provider_currencies(self):
+        p = self.registry.register(_FakeProvider("fiat", "fiat", ["EUR"], {"EUR": 0.9, "BTC": 1 / 30000}))
+        assert self._run(self.registry.call(p, None, None, {"EUR", "BTC"})) == {"EUR": 0.9}
+
+    def test_fallback_providers_go_last(self):
+        class _Fallback(_FakeProvider):
+            fallback = True
+
+        fallback = self.registry.register(_Fallback("single", "crypto", ["BTC"], {"BTC": 1.0}))
+        bulk = self.registry.register(_FakeProvider("bulk", "crypto", ["BTC"], {"BTC": 1.0}))
+        self.registry.stats("bulk").record(3.0, ok=False)
+        assert self.registry.ordered("crypto") == [bulk, fallback]
+
+    def test_coingecko_single_fallback_only_without_coincap_key(self, monkeypatch):
+        import config.config as config
+        names = lambda: [p.name for p in rates.provider_registry.ordered("crypto")]
+        monkeypatch.setattr(config, "COINCAP_API_KEY", None)
+        assert names()[-1] == "coingecko-single" and "coincap" not in names()
+        monkeypatch.setattr(config, "COINCAP_API_KEY", "key")
+        assert "coingecko-single" not in names()
+
+    def test_call_records_failure(self):
+        p = self.registry.register(_FakeProvider("a", "fiat", ["EUR"], error=ValueError("bad")))
+        assert self._run(self.registry.call(p, None, None, {"EUR"})) is None
+        stats = self.registry.stats("a")
+        assert stats.calls == 1 and stats.failures == 1 and stats.error_rate > 0
+
+    def test_cancelled_call_records_lower_bound_latency(self, monkeypatch):
+        import asyncio
+        monkeypatch.setattr(rates, "provider_registry", self.registry)
+
+        class _Slow(_FakeProvider):
+            async def fetch(self, session, timeout, wanted):
+                await asyncio.sleep(10)
+
+        slow = self.registry.register(_Slow("slow", "fiat", ["EUR"]))
+        fast = self.registry.register(_FakeProvider("fast", "fiat", ["EUR"], {"EUR": 0.9}))
+        self.registry.stats("slow").record(0.01, ok=True)  # tried first, hedged after ~10ms
+        self.registry.stats("fast").record(0.05, ok=True)
+
+        result = self._run(rates._fetch_asset_class(None, None, "fiat", ["EUR"], hedge=True))
+        assert result == {"EUR": 0.9}
+        stats = self.registry.stats("slow")
+        assert stats.calls == 1 and stats.failures == 0
+        assert len(stats.latencies) == 2 and stats.latencies[-1] >= 0.01
+        assert fast.calls == [{"EUR"}]
+
+    def test_pipeline_skips_providers_once_covered(self, monkeypatch):
+        monkeypatch.setattr(rates, "provider_registry", self.registry)
+        first = self.registry.register(_FakeProvider("first", "fiat", ["EUR", "RUB"], {"EUR": 0.9, "RUB": 90.0}))
+        second = self.registry.register(_FakeProvider("second", "fiat", ["EUR", "RUB"], {"EUR": 0.8}))
+        result = self._run(rates._fetch_asset_class(None, None, "fiat", ["EUR", "RUB"]))
+        assert result == {"EUR": 0.9, "RUB": 90.0}
+        assert second.calls == []
+
+    def test_pipeline_queries_only_missing(self, monkeypatch):
+        monkeypatch.setattr(rates, "provider_registry", self.registry)
+        self.registry.register(_FakeProvider("broken", "crypto", ["BTC", "ETH"], error=RuntimeError("down")))
+        partial = self.registry.register(_FakeProvider("partial", "crypto", ["BTC", "ETH"], {"BTC": 1e-5}))
+        other = self.registry.register(_FakeProvider("other", "crypto", ["ETH", "TON"], {"ETH": 1e-3}))
+        unrelated = self.registry.register(_FakeProvider("unrelated", "crypto", ["TON"], {"TON": 0.2}))
+        result = self._run(rates._fetch_asset_class(None, None, "crypto", ["BTC", "ETH"]))
+        assert result == {"BTC": 1e-5, "ETH": 1e-3}
+        assert other.calls == [{"ETH"}]
+        assert unrelated.calls == []
+        assert partial.calls == [{"BTC", "ETH"}]
+
+    def test_default_registry_covers_all_currencies(self):
+        covered = set()
+        for provider in rates.provider_registry.ordered():
+            covered |= provider.currencies
+        assert set(rates.ACTIVE_CURRENCIES + rates.CRYPTO_CURRENCIES) <= covered
+
+
+class TestAssetClassRefresh:
+    def _run(self, coro):
+        import asyncio
+        return asyncio.run(coro)
+
+    def test_classes_go_stale_independently(self):
+        now = time.time()
+        rates._class_fetched_at.update({"fiat": now - 60, "crypto": now - rates.ASSET_CLASS_TTL["crypto"] - 1})
+        assert rates.stale_asset_classes(now) == ["crypto"]
+        assert rates.stale_asset_classes(now, grace=rates.STALE_WHILE_REVALIDATE) == []
+
+    def test_unstamped_class_falls_back_to_cache_entry(self):
+        rates.cache.clear()
+        assert rates.stale_asset_classes() == ["fiat", "crypto"]
+        rates.cache["exchange_rates"] = ({"EUR": 0.9}, time.time())
+        assert rates.stale_asset_classes() == []
+
+    def test_refresh_fetches_only_stale_class(self, monkeypatch):
+        fetched = []
+
+        async def fake_fetch(session, timeout, asset_class, wanted, hedge=False):
+            fetched.append(asset_class)
+            return {"BTC": 1e-5} if asset_class == "crypto" else {"EUR": 0.9}
+
+        monkeypatch.setattr(rates, "_fetch_asset_class", fake_fetch)
+        rates.cache["exchange_rates"] = ({"EUR": 0.8}, time.time())
+        rates._class_fetched_at.update({"fiat": time.time(), "crypto": 0.0})
+
+        result = self._run(rates.refresh_rates())
+        assert fetched == ["crypto"]
+        assert result["EUR"] == 0.8 and result["BTC"] == 1e-5
+
+    def test_fiat_refresh_leaves_crypto_untouched(self, monkeypatch):
+        async def leaky_fetch(session, timeout, asset_class, wanted, hedge=False):
+            return {"EUR": 0.9, "BTC": 1 / 30000}
+
+        monkeypatch.setattr(rates, "_fetch_asset_class", leaky_fetch)
+        rates.cache["exchange_rates"] = ({"EUR": 0.8, "BTC": 1 / 60000}, time.time())
+        rates._class_fetched_at.update({"fiat": 0.0, "crypto": time.time()})
+
+        result = self._run(rates.refresh_rates())
+        assert result["EUR"] == 0.9
+        assert 1 / result["BTC"] == 60000
+
+    def test_refresh_asset_class_reports_failure(self, monkeypatch):
+        async def failing_fetch(session, timeout, asset_class, wanted, hedge=False):
+            return {}
+
+        monkeypatch.setattr(rates, "_fetch_asset_class", failing_fetch)
+        assert self._run(rates.refresh_asset_class("crypto")) is False
+        assert "crypto" not in rates._class_fetched_at
+
+
+class TestRefreshFollower:
+    def test_follower_adopts_leader_rates_without_fetching(self, monkeypatch):
+        import asyncio
+
+        async def no_network(*args, **kwargs):
+            raise AssertionError("followers must not call the providers")
+
+        rates._class_fetched_at.update({"fiat": time.time(), "crypto": time.time() - 5})
+        rates._store_rates({"EUR": 0.9, "BTC": 1e-5})  # written by the leader
+        leader_stamps = dict(rates._class_fetched_at)
+        rates.cache.clear()
+        rates._class_fetched_at.clear()
+
+        monkeypatch.setattr(rates, "_fetch_asset_class", no_network)
+        rates.set_refresh_leader(False)
+        assert asyncio.run(rates.refresh_asset_class("crypto")) is True
+        assert asyncio.run(rates.get_exchange_rates()) == {"EUR": 0.9, "BTC": 1e-5}
+        assert rates._class_fetched_at == pytest.approx(leader_stamps)
+        assert rates.stale_asset_classes() == []
+
+    def test_follower_without_leader_file(self):
+        import asyncio
+        rates.cache.clear()
+        rates.set_refresh_leader(False)
+        assert asyncio.run(rates.refresh_asset_class("fiat")) is False
+        assert asyncio.run(rates.refresh_rates(force=True)) == {}
@@ -0,0 +1,55 @@
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.rates as rates
+from utils.reply_cache import ReplyCache
+
+
+class TestReplyCache:
+    def test_hit_and_miss_counters(self):
+        cache = ReplyCache(maxsize=4)
+        key = (1, "render", 100.0, "USD", ("EUR",), (), "en", True)
+        assert cache.get(key) is None
+        cache.put(key, "100 USD = 90 EUR")
+        assert cache.get(key) == "100 USD = 90 EUR"
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = ReplyCache(maxsize=2)
+        cache.put((1, "a"), "A")
+        cache.put((1, "b"), "B")
+        cache.get((1, "a"))
+        cache.put((1, "c"), "C")
+        assert cache.get((1, "b")) is None
+        assert cache.get((1, "a")) == "A" and cache.get((1, "c")) == "C"
+
+    def test_new_generation_drops_everything(self):
+        cache = ReplyCache()
+        cache.put((1, "a"), "old")
+        cache.put((2, "b"), "new")
+        assert len(cache) == 1
+        assert cache.get((1, "a")) is None
+
+    def test_late_put_from_old_snapshot_ignored(self):
+        cache = ReplyCache()
+        cache.invalidate(5)
+        cache.put((4, "a"), "stale")
+        assert len(cache) == 0 and cache.generation == 5
+
+    def test_invalidated_on_snapshot_publish(self, monkeypatch):
+        monkeypatch.setattr(rates, "_snapshot_listeners", [])
+        monkeypatch.setattr(rates, "RATES_CACHE_PATH", "")
+        monkeypatch.setattr(rates, "RATES_HISTORY_DIR", "")
+        monkeypatch.setattr(rates, "_snapshot", None)
+        monkeypatch.setattr(rates, "_snapshot_generation", itertools.count(1))
+        cache = ReplyCache()
+        rates.add_snapshot_listener(lambda snapshot: cache.invalidate(snapshot.generation))
+
+        first = rates._publish_snapshot({"EUR": 0.9})
+        cache.put((first.generation, "a"), "text")
+        second = rates._publish_snapshot({"EUR": 0.8})
+        assert len(cache) == 0
+        assert cache.generation == second.generation
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.scheduler import RefreshJob, RefreshScheduler
+
+
+def _job(func=None, **kwargs):
+    async def ok():
+        return True
+    return RefreshJob("job", func or ok, interval=100.0, **kwargs)
+
+
+class TestRefreshJob:
+    def test_delay_jitters_around_interval(self):
+        job = _job(jitter=0.1)
+        for _ in range(50):
+            assert 90.0 <= job.next_delay() <= 110.0
+        assert _job(jitter=0.0).next_delay() == 100.0
+
+    def test_backoff_doubles_and_caps_at_interval(self):
+        job = _job(jitter=0.0, error_backoff=30.0)
+        job.failures = 1
+        assert job.next_delay() == 30.0
+        job.failures = 2
+        assert job.next_delay() == 60.0
+        job.failures = 5
+        assert job.next_delay() == 100.0
+
+    def test_run_once_tracks_failures(self):
+        results = [False, True]
+
+        async def flaky():
+            return results.pop(0)
+
+        job = _job(flaky)
+        assert asyncio.run(job.run_once()) is False
+        assert job.failures == 1 and job.last_success is None
+        assert asyncio.run(job.run_once()) is True
+        assert job.failures == 0 and job.last_success is not None
+
+    def test_errors_and_timeouts_count_as_failures(self):
+        async def broken():
+            raise RuntimeError("down")
+
+        async def hangs():
+            await asyncio.sleep(5)
+
+        assert asyncio.run(_job(broken).run_once()) is False
+        job = _job(hangs, timeout=0.01)
+        assert asyncio.run(job.run_once()) is False
+        assert job.failures == 1
+
+
+class TestRefreshScheduler:
+    def test_jobs_run_independently(self):
+        calls = []
+
+        def make(name):
+            async def _refresh():
+                calls.append(name)
+                return True
+            return _refresh
+
+        scheduler = RefreshScheduler()
+        scheduler.add(RefreshJob("fast", make("fast"), interval=1.0, jitter=0.0))
+        scheduler.add(RefreshJob("slow", make("slow"), interval=60.0, jitter=0.0))
+
+        async def scenario():
+            tasks = scheduler.start()
+            await asyncio.sleep(1.1)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run(scenario())
+        assert calls == ["fast"]
+        assert scheduler.status()["slow"]["age"] is None
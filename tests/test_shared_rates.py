@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+import utils.rates as rates
+import utils.shared_rates as shared_rates
+from utils.shared_rates import SharedRateSegment
+
+CODES = ("USD", "EUR", "RUB")
+
+
+@pytest.fixture
+def shm_name():
+    name = f"rates_test_{uuid.uuid4().hex[:8]}"
+    yield name
+    try:
+        segment = SharedRateSegment(name, rates.CURRENCY_CODES)
+    except (OSError, ValueError):
+        try:
+            segment = SharedRateSegment(name, CODES)
+        except (OSError, ValueError):
+            return
+    segment.unlink()
+    segment.close()
+
+
+@pytest.fixture
+def isolated_rates(monkeypatch, tmp_path):
+    monkeypatch.setattr(rates, "RATES_CACHE_PATH", str(tmp_path / "rates_cache.json"))
+    monkeypatch.setattr(rates, "RATES_HISTORY_DIR", "")
+    monkeypatch.setattr(rates, "_snapshot", None)
+    monkeypatch.setattr(rates, "_shared_retry_at", 0.0)
+    rates.cache.clear()
+    yield
+    rates.close_shared_rates()
+    rates.cache.clear()
+
+
+class TestSharedRateSegment:
+    def test_reader_sees_published_rates(self, shm_name):
+        writer = SharedRateSegment(shm_name, CODES, writer=True)
+        reader = SharedRateSegment(shm_name, CODES)
+        assert reader.read() is None
+
+        writer.publish(7, 1234.5, np.array([1.0, 0.9, 90.0, np.nan]))
+        generation, fetched_at, usd_rates = reader.read()
+        assert (generation, fetched_at) == (7, 1234.5)
+        assert usd_rates.tolist() == [1.0, 0.9, 90.0]
+        writer.close()
+        reader.close()
+
+    def test_read_during_write_gives_up(self, shm_name, monkeypatch):
+        monkeypatch.setattr(shared_rates, "_READ_ATTEMPTS", 3)
+        writer = SharedRateSegment(shm_name, CODES, writer=True)
+        writer.publish(1, 1.0, np.ones(3))
+        writer._header[0] += 1  # writer stalled mid-publish
+        assert SharedRateSegment(shm_name, CODES).read() is None
+        writer.close()
+
+    def test_layout_mismatch_rejected(self, shm_name):
+        writer = SharedRateSegment(shm_name, CODES, writer=True)
+        with pytest.raises(ValueError):
+            SharedRateSegment(shm_name, ("USD", "RUB", "EUR"))
+        writer.close()
+
+    def test_restarted_writer_keeps_generation(self, shm_name):
+        writer = SharedRateSegment(shm_name, CODES, writer=True)
+        writer.publish(5, 1.0, np.ones(3))
+        writer.close()
+        assert SharedRateSegment(shm_name, CODES, writer=True).generation == 5
+
+
+class TestSharedRatesMode:
+    def test_writer_publishes_stored_rates(self, shm_name, isolated_rates):
+        assert rates.open_shared_rates(shm_name, "writer") is True
+        rates._store_rates({"EUR": 0.9, "RUB": 90.0})
+        generation, _, usd_rates = SharedRateSegment(shm_name, rates.CURRENCY_CODES).read()
+        assert generation == rates.get_current_snapshot().generation
+        assert usd_rates[rates.CURRENCY_INDEX["RUB"]] == 90.0
+
+    def test_reader_never_fetches(self, shm_name, isolated_rates, monkeypatch):
+        async def no_network(*args, **kwargs):
+            raise AssertionError("reader must not refresh rates")
+
+        monkeypatch.setattr(rates, "refresh_rates", no_network)
+        assert rates.open_shared_rates(shm_name, "reader") is False  # writer not up yet
+        assert asyncio.run(rates.get_exchange_rates()) == {}
+
+        writer = SharedRateSegment(shm_name, rates.CURRENCY_CODES, writer=True)
+        usd_rates = np.full(len(rates.CURRENCY_CODES), np.nan)
+        usd_rates[rates.CURRENCY_INDEX["USD"]] = 1.0
+        usd_rates[rates.CURRENCY_INDEX["EUR"]] = 0.9
+        writer.publish(42, 1000.0, usd_rates)
+        monkeypatch.setattr(rates, "_shared_retry_at", 0.0)
+
+        snapshot = asyncio.run(rates.get_rate_snapshot())
+        assert snapshot.generation == 42
+        assert snapshot.convert(10, "USD", "EUR") == pytest.approx(9.0)
+        assert asyncio.run(rates.get_rate_snapshot()) is snapshot
+        assert asyncio.run(rates.get_exchange_rates()) == {"USD": 1.0, "EUR": 0.9}
+        writer.close()
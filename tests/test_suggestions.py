@@ -0,0 +1,35 @@
+import difflib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.suggestions import SUGGESTION_INDEX, SuggestionIndex
+
+
+class TestSuggestionIndex:
+    def test_typos_find_the_currency(self):
+        assert SUGGESTION_INDEX.suggest("uds")[0] == "USD"
+        assert SUGGESTION_INDEX.suggest("evro")[0] == "EUR"
+        assert SUGGESTION_INDEX.suggest("qwerty") == ()
+
+    def test_matches_without_shared_trigrams(self):
+        assert SUGGESTION_INDEX.suggest("grivna")[0] == "UAH"
+        assert SUGGESTION_INDEX.suggest("real")[0] == "BRL"
+
+    def test_same_matches_as_difflib(self):
+        words = {w: w.upper() for w in ("euro", "ron", "brl", "hryvnia", "dollar", "bitcoin")}
+        index = SuggestionIndex(words)
+        for text in ("evro", "real", "grivna", "dolar", "bitcon", "xyz"):
+            expected = difflib.get_close_matches(text, list(words), n=10, cutoff=0.5)
+            assert sorted(index.suggest(text, max_results=10)) == sorted(w.upper() for w in expected)
+
+    def test_aliases_map_to_codes_without_duplicates(self):
+        index = SuggestionIndex({"USD": "USD", "доллар": "USD", "долларов": "USD", "SOL": "SOL"})
+        assert index.suggest("долар") == ("USD",)
+
+    def test_repeated_lookups_are_memoized(self):
+        index = SuggestionIndex({"EUR": "EUR"})
+        index.suggest("eurr")
+        index.suggest("eurr")
+        assert index.suggest.cache_info().hits == 1
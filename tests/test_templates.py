@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.languages import LANGUAGES
+from utils.formatter import currency_label, get_currency_symbol
+from utils.templates import amount_head, get_template, targeted
+
+
+class TestReplyTemplates:
+    def test_single_with_quote(self):
+        text = get_template("en", True).single("100 USD", ["90.00 EUR"], ["0.001 BTC"], True, True)
+        assert text == (
+            f"100 USD\n\n{LANGUAGES['en']['fiat_currencies']}\n<blockquote expandable>90.00 EUR</blockquote>"
+            f"\n\n{LANGUAGES['en']['cryptocurrencies_output']}\n<blockquote expandable>0.001 BTC</blockquote>"
+        )
+
+    def test_single_without_crypto(self):
+        text = get_template("ru", False).single("100 USD", ["90.00 EUR"], [], True, False)
+        assert text == f"100 USD\n\n{LANGUAGES['ru']['fiat_currencies']}\n90.00 EUR"
+
+    def test_targeted(self):
+        assert targeted("100 USD", ["90.00 EUR", "9,000.00 RUB"]) == "100 USD\n= 90.00 EUR\n= 9,000.00 RUB"
+
+    def test_math_switches_to_long_form(self):
+        assert get_template("en").math("2+2", 4) == "2+2 = <b>4.00</b>"
+        assert "\n= " in get_template("en").math("1+" * 20 + "1", 21)
+
+    def test_amount_head_uses_precomputed_label(self):
+        assert currency_label("USD") == f"{get_currency_symbol('USD')}USD"
+        assert amount_head(1000, "USD") == f"1 000 {currency_label('USD')}"
@@ -7,7 +7,11 @@ from utils.parser import (
     parse_amount_and_currency,
     smart_number_parse,
     parse_mathematical_expression,
+    tokenize,
+    parse_cache_stats,
+    parse_conversion_request,
 )
+from utils import parser
 from utils.rates import convert_currency
 from utils.formatter import format_large_number
 
@@ -167,6 +171,16 @@ class TestParseAmountAndCurrency:
         assert amount == -10.0
         assert currency == "USD"
 
+    @pytest.mark.parametrize("text, expected, code", [
+        ("-1,5тыс руб", -1500.0, "RUB"),
+        ("рублей -1,5тыс", -1500.0, "RUB"),
+        ("-2,5 млн usd", -2500000.0, "USD"),
+    ])
+    def test_negative_comma_decimal_with_multiplier(self, text, expected, code):
+        amount, currency = parse_amount_and_currency(text)
+        assert amount == pytest.approx(expected)
+        assert currency == code
+
     def test_query_like_php_path_is_ignored(self):
         amount, currency = parse_amount_and_currency("index.php?100")
         assert amount is None
@@ -199,6 +213,89 @@ class TestParseAmountAndCurrency:
         assert currency == "EUR"
 
 
+class TestTokenize:
+    def test_token_kinds(self):
+        tokens = tokenize("5к usd + 10 000 €")
+        assert [t.kind for t in tokens] == [
+            "number", "multiplier", "separator", "currency", "separator", "operator",
+            "separator", "number", "separator", "currency",
+        ]
+        assert tokens[3].value == "USD" and tokens[-1].value == "EUR"
+        assert tokens[7].text == "10 000"
+
+    def test_glued_currency_word_is_not_currency(self):
+        assert [t.kind for t in tokenize("100usd")] == ["number", "word"]
+        assert parse_amount_and_currency("100usd") == (None, None)
+
+    def test_multiplier_scales_whole_number(self):
+        assert parse_amount_and_currency("1 500к рублей") == (1500000.0, "RUB")
+
+    def test_multiplier_after_currency(self):
+        assert parse_amount_and_currency("2.5 usd k") == (2500.0, "USD")
+
+    def test_url_ignored(self):
+        assert parse_amount_and_currency("https://example.com/eur 100 usd") == (100.0, "USD")
+
+    def test_comma_after_word_is_a_separator(self):
+        assert parse_amount_and_currency("usd,2.5k") == (2500.0, "USD")
+        assert parse_amount_and_currency("итого,2.5 млн руб") == (2500000.0, "RUB")
+        assert parse_amount_and_currency(".5 usd") == (0.5, "USD")
+
+
+class TestConversionRequest:
+    def test_multiple_targets_in_order(self):
+        request = parse_conversion_request("100 usd to eur rub kzt eur")
+        assert (request.amount, request.source) == (100.0, "USD")
+        assert request.targets == ("EUR", "RUB", "KZT")
+
+    def test_source_repeated_is_not_a_target(self):
+        assert parse_conversion_request("$100 usd").targets == ()
+
+    def test_expression_recorded(self):
+        request = parse_conversion_request("(100 + 50) * 2 usd")
+        assert request.amount == 300.0
+        assert request.expression == "(100 + 50) * 2"
+
+    def test_no_amount(self):
+        assert parse_conversion_request("usd to eur") is None
+
+
+class TestParseMemo:
+    def test_repeated_input_is_a_hit(self):
+        parser._memo_conversion_request.cache_clear()
+        assert parse_amount_and_currency("100 USD") == (100.0, "USD")
+        assert parse_amount_and_currency("  100 usd ") == (100.0, "USD")
+        stats = parse_cache_stats()["request"]
+        assert (stats["size"], stats["hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 0.5
+
+    def test_math_memo(self):
+        parser._memo_mathematical_expression.cache_clear()
+        assert parse_mathematical_expression("2*3") == 6.0
+        assert parse_mathematical_expression("2*3 ") == 6.0
+        assert parse_cache_stats()["math"]["hits"] == 1
+
+
+class TestMathEvaluator:
+    def test_precedence_and_unary_minus(self):
+        assert parse_mathematical_expression("2+3*4") == 14.0
+        assert parse_mathematical_expression("-(2+3)*-2") == 10.0
+        assert parse_mathematical_expression("10-4-3") == 3.0
+
+    def test_long_chain_has_no_recursion_limit(self):
+        assert parse_mathematical_expression("1+" * 250 + "1") == 251.0
+
+    def test_limits(self):
+        assert parse_mathematical_expression("1+" * 600 + "1") is None
+        assert parse_mathematical_expression("(" * 100 + "1" + ")" * 100) is None
+        assert parse_mathematical_expression("1" + "0" * 60 + "*" + "1" + "0" * 60) is None
+
+    def test_python_literal_rules_kept(self):
+        assert parse_mathematical_expression("08:30") is None
+        assert parse_mathematical_expression("+5") is None
+        assert parse_mathematical_expression("2**3") is None
+
+
 class TestConvertCurrency:
     RATES = {
         "USD": 1.0,
@@ -0,0 +1,106 @@
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+from config.config import CURRENCY_ABBREVIATIONS, ALL_CURRENCIES, CURRENCY_SYMBOLS
+
+
+class Mention(NamedTuple):
+    start: int
+    end: int
+    pattern: str
+    code: str
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class CurrencyLexicon:
+    """Aho-Corasick automaton over lowercased currency patterns.
+
+    Patterns that start (end) with a word character only match when the character
+    before (after) them is not one, like ``(?<!\\w)`` / ``(?!\\w)`` in a regex. All
+    methods expect lowercased text; positions index into it.
+    """
+
+    __slots__ = ('patterns', '_goto', '_fail', '_out')
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.patterns = {p.lower(): code for p, code in patterns.items()}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[str]] = [[]]
+        for pattern in self.patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _matches(self, text: str) -> List[Mention]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            for pattern in out[node]:
+                start = end - len(pattern)
+                if _is_word_char(pattern[0]) and start and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(pattern[-1]) and end < len(text) and _is_word_char(text[end]):
+                    continue
+                found.append(Mention(start, end, pattern, self.patterns[pattern]))
+        return found
+
+    def find_all(self, text: str) -> List[Mention]:
+        """Non-overlapping mentions, leftmost first and longest at each position."""
+        mentions = []
+        pos = 0
+        for mention in sorted(self._matches(text), key=lambda m: (m.start, -m.end)):
+            if mention.start >= pos:
+                mentions.append(mention)
+                pos = mention.end
+        return mentions
+
+    def first(self, text: str) -> Optional[Mention]:
+        mentions = self.find_all(text)
+        return mentions[0] if mentions else None
+
+    def strip(self, text: str) -> str:
+        """Text with every mention removed."""
+        parts = []
+        pos = 0
+        for mention in self.find_all(text):
+            parts.append(text[pos:mention.start])
+            pos = mention.end
+        parts.append(text[pos:])
+        return ''.join(parts)
+
+
+_ALL_CURRENCY_PATTERNS = {}
+_ALL_CURRENCY_PATTERNS.update(CURRENCY_SYMBOLS)
+_ALL_CURRENCY_PATTERNS.update(CURRENCY_ABBREVIATIONS)
+_ALL_CURRENCY_PATTERNS.update({k.upper(): k.upper() for k in ALL_CURRENCIES.keys()})
+
+CURRENCY_LEXICON = CurrencyLexicon(_ALL_CURRENCY_PATTERNS)
@@ -14,6 +14,15 @@ def get_currency_symbol(code: str) -> str:
     return symbol + ' '
 
 
+_CURRENCY_LABELS = {code: f"{get_currency_symbol(code)}{code}" for code in ALL_CURRENCIES}
+
+
+def currency_label(code: str) -> str:
+    """Symbol prefix plus code, e.g. "🇺🇸 USD"; precomputed for every known currency."""
+    label = _CURRENCY_LABELS.get(code)
+    return label if label is not None else f"{get_currency_symbol(code)}{code}"
+
+
 def read_changelog():
     global _CHANGELOG_CACHE
     if _CHANGELOG_CACHE is not None:
@@ -42,6 +51,14 @@ def read_changelog():
 
 
 def format_large_number(number, is_crypto=False, is_original_amount=False):
+    # Fast paths for the common magnitudes; same output as the general branches below.
+    if 1 <= number < 1e15:
+        if is_original_amount:
+            if number == int(number):
+                return f"{int(number):,}".replace(',', ' ')
+        elif not is_crypto:
+            return f"{number:,.2f}"
+
     if abs(number) > 1e100:
         return "♾️ Infinity"
 
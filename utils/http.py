@@ -1,17 +1,79 @@
 import asyncio
+import hashlib
 import logging
 import random
+import time
 import urllib.parse
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
 
 import aiohttp
+import ujson
 
-from config.config import HTTP_RETRIES, SEMAPHORE_LIMITS
+from config.config import (
+    HTTP_RETRIES, SEMAPHORE_LIMITS,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_OPEN_SECONDS, CIRCUIT_MAX_OPEN_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
 _http_session: Optional[aiohttp.ClientSession] = None
 _domain_semaphores: Dict[str, asyncio.Semaphore] = {}
+_circuit_breakers: Dict[str, 'CircuitBreaker'] = {}
+_validator_cache: Dict[str, '_CachedResponse'] = {}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures or a 429, then lets a
+    single half-open probe through once the cool-down (or ``Retry-After``) expires."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    __slots__ = ('host', 'state', 'failures', 'open_until', 'open_seconds', 'probe_in_flight')
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.open_seconds = float(CIRCUIT_OPEN_SECONDS)
+        self.probe_in_flight = False
+
+    def before_call(self):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() >= self.open_until:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return
+        raise CircuitOpenError(f"Circuit for {self.host} is {self.state}, failing fast")
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Circuit for %s closed", self.host)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_seconds = float(CIRCUIT_OPEN_SECONDS)
+        self.probe_in_flight = False
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        self.failures += 1
+        if retry_after is None and self.state == self.CLOSED and self.failures < CIRCUIT_FAILURE_THRESHOLD:
+            return
+        if self.state == self.HALF_OPEN:
+            self.open_seconds = min(self.open_seconds * 2, CIRCUIT_MAX_OPEN_SECONDS)
+        cool_down = retry_after if retry_after is not None else self.open_seconds
+        self.state = self.OPEN
+        self.open_until = time.monotonic() + cool_down
+        self.probe_in_flight = False
+        logger.warning("Circuit for %s opened for %.1fs after %d failure(s)", self.host, cool_down, self.failures)
 
 
 def set_http_session(session: aiohttp.ClientSession):
@@ -42,43 +104,158 @@ def _get_semaphore(host: str) -> asyncio.Semaphore:
     return _domain_semaphores[host]
 
 
-def _retry_delay_from_429(err: aiohttp.ClientResponseError, attempt: int) -> float:
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    if host not in _circuit_breakers:
+        _circuit_breakers[host] = CircuitBreaker(host)
+    return _circuit_breakers[host]
+
+
+def _retry_after_seconds(err: aiohttp.ClientResponseError) -> float:
     header_val = (err.headers or {}).get("Retry-After") if err.headers else None
     if header_val:
         try:
             return max(float(header_val), 0.1)
         except (TypeError, ValueError):
             pass
-    return 0.5 * (2 ** attempt) + random.random() * 0.2
+    return float(CIRCUIT_OPEN_SECONDS)
 
 
 async def _with_retries(coro_factory, host: str, retries: int = HTTP_RETRIES):
     last_exc = None
     sem = _get_semaphore(host)
+    breaker = get_circuit_breaker(host)
     for attempt in range(retries + 1):
+        breaker.before_call()
         try:
             async with sem:
-                return await coro_factory()
+                result = await coro_factory()
+            breaker.record_success()
+            return result
         except aiohttp.ClientResponseError as e:
             last_exc = e
+            if e.status == 429:
+                delay = _retry_after_seconds(e)
+                logger.warning("HTTP 429 from %s, backing off for %.2fs", host, delay)
+                breaker.record_failure(retry_after=delay)
+                break
+            if e.status >= 500:
+                breaker.record_failure()
+            elif breaker.probe_in_flight:
+                breaker.record_success()
             if attempt == retries:
                 break
-            if e.status == 429:
-                delay = _retry_delay_from_429(e, attempt)
-                logger.warning("HTTP 429 from %s, retrying in %.2fs (attempt %d/%d)", host, delay, attempt + 1, retries + 1)
-                await asyncio.sleep(delay)
-                continue
             await asyncio.sleep(0.3 * (2 ** attempt) + random.random() * 0.2)
         except (asyncio.TimeoutError, aiohttp.ClientError) as e:
             last_exc = e
+            breaker.record_failure()
             if attempt == retries:
                 break
             await asyncio.sleep(0.3 * (2 ** attempt) + random.random() * 0.2)
+        except BaseException:
+            breaker.probe_in_flight = False
+            raise
     if last_exc:
         raise last_exc
     raise RuntimeError("_with_retries failed without exception")
 
 
+async def hedged_requests(
+    attempts: Sequence[Tuple[Callable[[], Awaitable[Any]], float]],
+    on_result: Callable[[Any], bool],
+) -> bool:
+    """Run ``attempts`` best-first, starting the next one only when the current
+    one fails or stays silent for its hedge delay.
+
+    ``on_result`` receives every successful result and returns True once nothing
+    more is needed; all requests still in flight are then cancelled.
+    """
+    pending = set()
+    launched = 0
+    hedge_delay: Optional[float] = None
+
+    def _launch_next():
+        nonlocal launched, hedge_delay
+        factory, hedge_delay = attempts[launched]
+        launched += 1
+        pending.add(asyncio.create_task(factory()))
+
+    try:
+        if attempts:
+            _launch_next()
+        while pending:
+            wait_for = hedge_delay if launched < len(attempts) else None
+            done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.debug("Hedging: no response within %.2fs, starting attempt %d", wait_for, launched + 1)
+                _launch_next()
+                continue
+            for task in done:
+                pending.discard(task)
+                if task.cancelled():
+                    continue
+                exc = task.exception()
+                if exc is not None:
+                    logger.debug("Hedged attempt failed: %s", exc)
+                    continue
+                if on_result(task.result()):
+                    return True
+            if not pending and launched < len(attempts):
+                _launch_next()
+        return False
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+class _CachedResponse:
+    __slots__ = ('etag', 'last_modified', 'digest', 'payload')
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], digest: bytes, payload: Any):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.payload = payload
+
+
+async def get_json_conditional(
+    session: aiohttp.ClientSession, url: str, timeout: aiohttp.ClientTimeout
+) -> Tuple[Any, bool]:
+    """GET ``url`` as JSON, revalidating with ETag / Last-Modified.
+
+    Returns ``(payload, changed)``. ``changed`` is False on a 304 or when the body
+    hashes the same as last time; the previously decoded payload is returned then.
+    """
+    async def _get():
+        cached = _validator_cache.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        resp = await session.get(url, timeout=timeout, headers=headers)
+        async with resp:
+            if resp.status == 304 and cached is not None:
+                return cached.payload, False
+            resp.raise_for_status()
+            body = await resp.read()
+            etag = resp.headers.get('ETag')
+            last_modified = resp.headers.get('Last-Modified')
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if cached is not None and cached.digest == digest:
+            cached.etag, cached.last_modified = etag, last_modified
+            return cached.payload, False
+        payload = ujson.loads(body)
+        _validator_cache[url] = _CachedResponse(etag, last_modified, digest, payload)
+        return payload, True
+
+    return await _with_retries(_get, _host_of(url))
+
+
 def safe_bg_task(coro, name: str = "background"):
     task = asyncio.create_task(coro, name=name)
     def _on_done(t: asyncio.Task):
@@ -1,41 +1,28 @@
-import ast
 import logging
 import math
 import operator
 import re
-from typing import Tuple, Optional, cast
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from config.config import CURRENCY_ABBREVIATIONS, ALL_CURRENCIES, CURRENCY_SYMBOLS
+from config.config import PARSE_CACHE_SIZE
+from utils.currency_lexicon import CURRENCY_LEXICON
 
 logger = logging.getLogger(__name__)
 
-_ALL_CURRENCY_PATTERNS = {}
-_ALL_CURRENCY_PATTERNS.update(CURRENCY_SYMBOLS)
-_ALL_CURRENCY_PATTERNS.update(CURRENCY_ABBREVIATIONS)
-_ALL_CURRENCY_PATTERNS.update({k.upper(): k.upper() for k in ALL_CURRENCIES.keys()})
-
-_SORTED_CURRENCY_PATTERNS = sorted(_ALL_CURRENCY_PATTERNS.items(), key=lambda x: len(x[0]), reverse=True)
-
-_REGEX_PARTS = []
-for currency_pattern, _ in _SORTED_CURRENCY_PATTERNS:
-    starts_with_word = re.match(r'^\w', currency_pattern, re.UNICODE) is not None
-    ends_with_word = re.search(r'\w$', currency_pattern, re.UNICODE) is not None
-
-    prefix = r'(?<!\w)' if starts_with_word else ''
-    suffix = r'(?!\w)' if ends_with_word else ''
-    
-    _REGEX_PARTS.append(rf'{prefix}{re.escape(currency_pattern.lower())}{suffix}')
-
-_CURRENCY_REGEX = re.compile('|'.join(_REGEX_PARTS), re.IGNORECASE)
-
-_PATTERN_TO_CODE = {p.lower(): c for p, c in _ALL_CURRENCY_PATTERNS.items()}
-
 _SPACE_DIGIT_REGEX = re.compile(r'(\d)\s+(\d)')
 _STARTING_NUMBER_REGEX = re.compile(r'^([\d\s,.]+)')
 _SCIENTIFIC_REGEX = re.compile(r'^[-+]?(?:\d+(?:[.,]\d+)?|[.,]\d+)[eE][-+]?\d+$')
 _CONTAINS_SCI_NOTATION_REGEX = re.compile(r'\d[eE][-+]?\d')
 _MAX_ALLOWED_AMOUNT = 1e100
 
+_MATH_ALIASES = str.maketrans({'х': '*', '×': '*', '÷': '/', ':': '/', ' ': None})
+_MATH_TOKEN_REGEX = re.compile(r'(\d+\.?\d*|\.\d+)|(.)', re.DOTALL)
+_MATH_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+_MATH_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, 'neg': 3}
+_MATH_MAX_TOKENS = 512
+_MATH_MAX_DEPTH = 64
+
 _MULTIPLIERS = {
     'тыс': 1000, 'тысяч': 1000, 'тысячи': 1000, 'тысяча': 1000,
     'млн': 1000000, 'миллион': 1000000, 'миллионов': 1000000, 'миллиона': 1000000,
@@ -45,18 +32,48 @@ _MULTIPLIERS = {
     'thousand': 1000, 'million': 1000000, 'billion': 1000000000
 }
 
-_MULTIPLIER_REGEXES = {
-    re.compile(rf'(\d+(?:[.,]\d+)?)\s*{txt}\b', re.IGNORECASE): val 
-    for txt, val in _MULTIPLIERS.items()
-}
+NUMBER = 'number'
+MULTIPLIER = 'multiplier'
+CURRENCY = 'currency'
+OPERATOR = 'operator'
+SEPARATOR = 'separator'
+WORD = 'word'
 
-_FIND_NUMBERS_REGEX = re.compile(r'[-+]?(?:\d(?:\d|[.,]|\s(?=\d{3}))*\d|\d|[.,]\d+)(?:[eE][-+]?\d+)?')
-_SIMPLE_NUMBER_REGEX = re.compile(r'[^\d.]')
+# Currency mentions come from CURRENCY_LEXICON; this alternation tokenizes the text between
+# them. The first group that matches at a position wins. Words stop at digits so "e5" still
+# yields the number 5, and the Cyrillic "х" is only an operator when no letter follows it.
+# A leading "." or "," only starts a number (".5") after a non-alphanumeric character, so the
+# comma in "usd,2.5k" stays a separator.
+_TOKEN_REGEX = re.compile(
+    r'(?P<number>[-+]?(?:\d(?:\d|[.,]|\s(?=\d{3}))*\d|\d|(?<![^\W_])[.,]\d+)(?:[eE][-+]?\d+)?)'
+    r'|(?P<operator>[+\-*/()^×÷:]|х(?![^\W\d_]))'
+    r'|(?P<word>[^\W\d]+)'
+    r'|(?P<separator>\s+|[,;])'
+    r'|(?P<symbol>.)',
+    re.DOTALL,
+)
 
 _URL_REGEX = re.compile(
     r'http[s]?://(?:[a-zA-Z0-9]|[$-_@.&+]|[!*(),]|%[0-9a-fA-F][0-9a-fA-F])+'
 )
 
+_DASHES = str.maketrans({'−': '-', '–': '-', '—': '-', '‑': '-'})
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    value: Any = None
+
+
+class ConversionRequest(NamedTuple):
+    amount: float
+    source: str
+    targets: Tuple[str, ...] = ()
+    expression: Optional[str] = None  # math the amount was evaluated from, e.g. "(100+50)*2"
+
+
 _QUERY_LIKE_TEXT_REGEX = re.compile(
     r'\b\S+\.(?:php|aspx?|jsp|html?)\?\S*\b|\b[a-zA-Z]{2,10}\?\d+\b',
     re.IGNORECASE,
@@ -122,101 +139,215 @@ def _is_valid_amount(value: float) -> bool:
     return math.isfinite(value) and abs(value) <= _MAX_ALLOWED_AMOUNT
 
 
-def parse_mathematical_expression(expr: str) -> Optional[float]:
-    ops = {
-        ast.Add: operator.add, ast.Sub: operator.sub,
-        ast.Mult: operator.mul, ast.Div: operator.truediv,
-    }
-    
-    def _safe_eval(node: ast.AST) -> float:
-        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
-            return float(node.value)
-        elif isinstance(node, ast.BinOp) and type(node.op) in ops:
-            left = _safe_eval(cast(ast.AST, node.left))
-            right = _safe_eval(cast(ast.AST, node.right))
-            if isinstance(node.op, ast.Div) and right == 0:
-                raise ValueError("Division by zero")
-            return ops[type(node.op)](left, right)
-        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
-            return -_safe_eval(cast(ast.AST, node.operand))
-        raise ValueError("Unsafe expression")
+def _apply(op: str, values: List[float]):
+    right = values.pop()
+    if op == 'neg':
+        result = -right
+    else:
+        left = values.pop()
+        if op == '/' and right == 0:
+            raise ValueError("Division by zero")
+        result = _MATH_OPERATORS[op](left, right)
+    if not _is_valid_amount(result):
+        raise ValueError("Magnitude limit exceeded")
+    values.append(result)
+
 
+def _parse_mathematical_expression(expr: str) -> Optional[float]:
+    """Evaluate ``+ - * /``, unary minus and parentheses in one shunting-yard pass.
+
+    The loop is iterative, so long inputs cannot hit the recursion limit. Inputs with too
+    many tokens, nesting deeper than ``_MATH_MAX_DEPTH`` or values above
+    ``_MAX_ALLOWED_AMOUNT`` give None, like any other invalid expression.
+    """
+    expr = expr.translate(_MATH_ALIASES)
+    values: List[float] = []
+    ops: List[str] = []
+    expect_operand = True
     try:
-        expr = expr.replace('х', '*').replace('×', '*')
-        expr = expr.replace('÷', '/').replace(':', '/')
-        expr = expr.replace(' ', '')
-        
-        allowed_chars = '0123456789+-*/().'
-        if not all(c in allowed_chars for c in expr):
+        for count, match in enumerate(_MATH_TOKEN_REGEX.finditer(expr)):
+            if count >= _MATH_MAX_TOKENS or len(ops) > _MATH_MAX_DEPTH:
+                return None
+            number, op = match.group(1), match.group(2)
+            if expect_operand:
+                if number is not None:
+                    # Same literal rules as Python: "08" is not a number ("08:30" is a time).
+                    if len(number) > 1 and number[0] == '0' and number.isdigit() and number.strip('0'):
+                        return None
+                    value = float(number)
+                    if not _is_valid_amount(value):
+                        return None
+                    values.append(value)
+                    expect_operand = False
+                elif op == '(':
+                    ops.append(op)
+                elif op == '-':
+                    ops.append('neg')
+                else:
+                    return None
+            elif op in _MATH_PRECEDENCE:
+                while ops and ops[-1] != '(' and _MATH_PRECEDENCE[ops[-1]] >= _MATH_PRECEDENCE[op]:
+                    _apply(ops.pop(), values)
+                ops.append(op)
+                expect_operand = True
+            elif op == ')':
+                while ops and ops[-1] != '(':
+                    _apply(ops.pop(), values)
+                if not ops:
+                    return None
+                ops.pop()
+            else:
+                return None
+
+        if expect_operand:
             return None
-        
-        tree = ast.parse(expr, mode='eval')
-        return _safe_eval(tree.body)
-    except (SyntaxError, ValueError, TypeError, ZeroDivisionError, OverflowError):
+        while ops:
+            op = ops.pop()
+            if op == '(':
+                return None
+            _apply(op, values)
+    except ValueError:
         return None
+    return values[0]
 
 
-def parse_amount_and_currency(text: str) -> Tuple[Optional[float], Optional[str]]:
-    if not text:
-        return None, None
+def _scan(text: str, pos: int, endpos: int, tokens: List[Token]):
+    for match in _TOKEN_REGEX.finditer(text, pos, endpos):
+        kind = match.lastgroup
+        token_text = match.group()
+        value = None
+        if kind == WORD:
+            # "5к" is five thousand, "3кг" and "5к1" are not.
+            if token_text in _MULTIPLIERS and not text[match.end():match.end() + 1].isdecimal():
+                kind = MULTIPLIER
+                value = _MULTIPLIERS[token_text]
+        elif kind == 'symbol':
+            kind = WORD
+        tokens.append(Token(kind, token_text, match.start(), value))
 
-    text = text.replace('−', '-').replace('–', '-').replace('—', '-').replace('‑', '-')
 
-    if _QUERY_LIKE_TEXT_REGEX.search(text):
-        return None, None
+def tokenize(text: str) -> List[Token]:
+    """Split lowercased text into number, multiplier, currency, operator, separator and word tokens."""
+    tokens = []
+    pos = 0
+    for mention in CURRENCY_LEXICON.find_all(text):
+        _scan(text, pos, mention.start, tokens)
+        tokens.append(Token(CURRENCY, mention.pattern, mention.start, mention.code))
+        pos = mention.end
+    _scan(text, pos, len(text), tokens)
+    return tokens
 
-    text = _URL_REGEX.sub('', text)
-    if not text:
-        return None, None
 
-    text = text.strip()
-    
-    text_lower = text.lower()
-    
-    currency = None
-    
-    match = _CURRENCY_REGEX.search(text_lower)
-    if match:
-        matched_text = match.group(0)
-        currency = _PATTERN_TO_CODE.get(matched_text.lower())
-        
-    if not currency:
-        return None, None
-    
-    amount_text = _CURRENCY_REGEX.sub('', text_lower)
-    amount_text = amount_text.strip()
-    
-    math_operators = ['+', '-', '*', '/', '(', ')', '^', 'х', '×', '÷', ':']
-    has_math = any(op in amount_text for op in math_operators)
-    
+def _number_value(token: Token, factor: float = 1) -> Optional[float]:
+    # smart_number_parse only understands unsigned numbers, so "-1,5" is parsed as "1,5".
+    text = token.text
+    sign = -1 if text[0] == '-' else 1
+    try:
+        amount = sign * float(smart_number_parse(text.lstrip('+-'))) * factor
+    except (ValueError, TypeError) as e:
+        logger.debug(f"Failed to parse number '{token.text}': {e}")
+        return None
+    return amount if _is_valid_amount(amount) else None
+
+
+def _parse_amount(tokens: List[Token]) -> Tuple[Optional[float], Optional[str]]:
+    has_math = any(t.kind == OPERATOR or (t.kind == NUMBER and t.text[0] in '+-') for t in tokens)
     if has_math:
+        amount_text = ''.join(t.text for t in tokens if t.kind != CURRENCY).strip()
         result = parse_mathematical_expression(amount_text)
         if result is not None and _is_valid_amount(result):
-            return result, currency
-    
-    for mult_pattern, mult_value in _MULTIPLIER_REGEXES.items():
-        match = mult_pattern.search(amount_text)
-        if match:
-            base_number = smart_number_parse(match.group(1))
-            try:
-                amount = float(base_number) * mult_value
-                if _is_valid_amount(amount):
-                    return amount, currency
-            except (ValueError, TypeError) as e:
-                logger.debug(f"Failed to parse multiplier number '{match.group(1)}': {e}")
-                pass
-    
-    number_matches = _FIND_NUMBERS_REGEX.findall(amount_text)
-    
-    for number_str in number_matches:
-        if not number_str or not any(ch.isdigit() for ch in number_str):
-            continue
-        cleaned_number = smart_number_parse(number_str)
-        try:
-            amount = float(cleaned_number)
-            if _is_valid_amount(amount):
-                return amount, currency
-        except (ValueError, TypeError):
+            return result, amount_text
+
+    numbers = []
+    for i, token in enumerate(tokens):
+        if token.kind != NUMBER:
             continue
+        numbers.append(token)
+        # Currency mentions between a number and its multiplier are skipped ("2.5 usd k").
+        j = i + 1
+        while j < len(tokens) and (tokens[j].kind == CURRENCY or tokens[j].text.isspace()):
+            j += 1
+        if j < len(tokens) and tokens[j].kind == MULTIPLIER:
+            amount = _number_value(token, tokens[j].value)
+            if amount is not None:
+                return amount, None
+
+    for token in numbers:
+        amount = _number_value(token)
+        if amount is not None:
+            return amount, None
 
     return None, None
+
+
+def parse_tokens(tokens: List[Token]) -> Optional[ConversionRequest]:
+    """Conversion request from ``tokenize`` output.
+
+    The first currency is the source and every other one a target. The amount is, in order
+    of preference: the whole remainder as a math expression, the first number followed by
+    a multiplier word, the first number.
+    """
+    currencies = [t.value for t in tokens if t.kind == CURRENCY]
+    if not currencies:
+        return None
+
+    amount, expression = _parse_amount(tokens)
+    if amount is None:
+        return None
+
+    source = currencies[0]
+    targets = tuple(dict.fromkeys(code for code in currencies[1:] if code != source))
+    return ConversionRequest(amount, source, targets, expression)
+
+
+def _parse_conversion_request(text: str) -> Optional[ConversionRequest]:
+    if not text:
+        return None
+
+    text = text.translate(_DASHES)
+
+    if '?' in text and _QUERY_LIKE_TEXT_REGEX.search(text):
+        return None
+
+    if '://' in text:
+        text = _URL_REGEX.sub('', text)
+
+    return parse_tokens(tokenize(text.lower()))
+
+
+# Parsing is pure, so repeated inputs (and inline prefixes typed keystroke by keystroke)
+# are answered from these memos, keyed by the stripped, lowercased text.
+_memo_conversion_request = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse_conversion_request)
+_memo_mathematical_expression = lru_cache(maxsize=PARSE_CACHE_SIZE)(_parse_mathematical_expression)
+
+
+def parse_conversion_request(text: str) -> Optional[ConversionRequest]:
+    return _memo_conversion_request(text.strip().lower()) if text else None
+
+
+def parse_amount_and_currency(text: str) -> Tuple[Optional[float], Optional[str]]:
+    request = parse_conversion_request(text)
+    return (request.amount, request.source) if request else (None, None)
+
+
+def parse_mathematical_expression(expr: str) -> Optional[float]:
+    return _memo_mathematical_expression(expr.strip())
+
+
+def memo_stats(memo) -> Dict[str, Any]:
+    info = memo.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 3) if lookups else None,
+    }
+
+
+def parse_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        'request': memo_stats(_memo_conversion_request),
+        'math': memo_stats(_memo_mathematical_expression),
+    }
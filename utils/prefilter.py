@@ -0,0 +1,37 @@
+import re
+from typing import Any, Dict
+
+# Conversions, math expressions and every parse-error reply need at least one digit.
+_DIGIT_REGEX = re.compile(r'\d')
+
+
+class MessagePrefilter:
+    """One-scan check run before any parsing in ``handle_message``.
+
+    Group chats deliver every message to the bot; almost all of them are chatter
+    without a digit and can be dropped here.
+    """
+
+    __slots__ = ('passed', 'dropped')
+
+    def __init__(self):
+        self.passed = 0
+        self.dropped = 0
+
+    def check(self, text: str) -> bool:
+        if text.startswith('/') or _DIGIT_REGEX.search(text) is None:
+            self.dropped += 1
+            return False
+        self.passed += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.passed + self.dropped
+        return {
+            'passed': self.passed,
+            'dropped': self.dropped,
+            'drop_rate': round(self.dropped / total, 3) if total else None,
+        }
+
+
+message_prefilter = MessagePrefilter()
@@ -0,0 +1,231 @@
+"""Local stand-in for the public rate providers used by ``utils.rates``.
+
+Serves open.er-api, exchangerate-api, fawazahmed, CoinGecko and CoinCap response
+shapes on one port per provider (matching ``PROVIDER_URLS`` when ``RATES_STANDIN``
+is set), with per-provider knobs for latency, 429s, 5xx, malformed payloads and
+partial coverage. Knobs can be changed at runtime::
+
+    python -m utils.provider_standin --port 8089 --latency 0.2 --rate-limit 0.1
+    RATES_STANDIN=127.0.0.1:8089 COINCAP_API_KEY=x python main.py
+    curl -X POST 127.0.0.1:8089/_standin/behaviour/coingecko -d '{"error_rate": 1}'
+    curl 127.0.0.1:8089/_standin/stats
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import ujson
+from aiohttp import web
+
+from config.config import ACTIVE_CURRENCIES, CRYPTO_CURRENCIES, CRYPTO_ID_MAPPING, PROVIDER_URLS
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = tuple(PROVIDER_URLS)
+
+
+class Behaviour:
+    """Failure and latency knobs for one stand-in provider.
+
+    Latency is log-normal around ``latency`` seconds with shape ``latency_sigma``;
+    the ``*_rate`` knobs are per-request probabilities and ``coverage`` is the
+    fraction of currencies included in each payload.
+    """
+
+    __slots__ = ('latency', 'latency_sigma', 'rate_limit', 'retry_after', 'error_rate', 'malformed', 'coverage',
+                 'drift')
+
+    def __init__(self, latency: float = 0.05, latency_sigma: float = 0.5, rate_limit: float = 0.0,
+                 retry_after: float = 5.0, error_rate: float = 0.0, malformed: float = 0.0,
+                 coverage: float = 1.0, drift: float = 0.0):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.malformed = malformed
+        self.coverage = coverage
+        self.drift = drift
+
+    def update(self, values: Dict[str, Any]):
+        for key, value in values.items():
+            if key not in self.__slots__:
+                raise KeyError(key)
+            setattr(self, key, float(value))
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return rng.lognormvariate(0.0, self.latency_sigma) * self.latency if self.latency_sigma else self.latency
+
+    def as_dict(self) -> Dict[str, float]:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class ProviderStandin:
+    def __init__(self, seed: int = 0, defaults: Optional[Dict[str, Any]] = None):
+        self.rng = random.Random(seed)
+        self.behaviour: Dict[str, Behaviour] = {name: Behaviour(**(defaults or {})) for name in PROVIDERS}
+        self.stats: Dict[str, Dict[str, int]] = {name: {} for name in PROVIDERS}
+        # USD is worth 1 unit of itself; other fiat rates are units per USD, crypto prices are USD per coin.
+        self.fiat_rates = {code: 1.0 if code == 'USD' else round(10 ** self.rng.uniform(-0.5, 4.0), 6)
+                           for code in ACTIVE_CURRENCIES}
+        self.crypto_prices = {code: round(10 ** self.rng.uniform(-1.0, 5.0), 6) for code in CRYPTO_CURRENCIES}
+
+    def _count(self, provider: str, outcome: str):
+        self.stats[provider][outcome] = self.stats[provider].get(outcome, 0) + 1
+
+    def _covered(self, provider: str, codes: List[str]) -> List[str]:
+        coverage = self.behaviour[provider].coverage
+        if coverage >= 1.0:
+            return list(codes)
+        # Coverage gaps are stable per provider so repeated refreshes see the same holes.
+        keep = max(int(len(codes) * coverage), 0)
+        return sorted(codes, key=lambda c: hashlib.blake2b(f"{provider}:{c}".encode(), digest_size=4).digest())[:keep]
+
+    def _drifted(self, provider: str, value: float) -> float:
+        drift = self.behaviour[provider].drift
+        return round(value * (1.0 + self.rng.gauss(0.0, drift)), 8) if drift else value
+
+    def _fiat(self, provider: str) -> Dict[str, float]:
+        return {c: self._drifted(provider, self.fiat_rates[c]) for c in self._covered(provider, ACTIVE_CURRENCIES)}
+
+    def payload(self, provider: str, request: web.Request) -> Any:
+        if provider == 'open.er-api':
+            return {'result': 'success', 'base_code': 'USD', 'rates': self._fiat(provider)}
+        if provider == 'exchangerate-api':
+            return {'base': 'USD', 'rates': self._fiat(provider)}
+        if provider == 'fawazahmed':
+            return {'date': '2024-01-01', 'usd': {c.lower(): r for c, r in self._fiat(provider).items()}}
+        if provider == 'coingecko':
+            ids = set(request.query.get('ids', '').split(','))
+            mapping = CRYPTO_ID_MAPPING['coingecko']
+            return {
+                mapping[sym]: {'usd': self._drifted(provider, self.crypto_prices[sym])}
+                for sym in self._covered(provider, list(mapping)) if mapping[sym] in ids
+            }
+        if provider == 'coincap':
+            by_id = {asset_id: sym for sym, asset_id in CRYPTO_ID_MAPPING['coincap'].items()}
+            sym = by_id.get(request.match_info['asset_id'])
+            if sym is None or sym not in self._covered(provider, list(CRYPTO_ID_MAPPING['coincap'])):
+                raise web.HTTPNotFound()
+            return {'data': {'id': request.match_info['asset_id'], 'symbol': sym,
+                             'priceUsd': str(self._drifted(provider, self.crypto_prices[sym]))}}
+        raise web.HTTPNotFound()
+
+    def handler(self, provider: str):
+        async def _handle(request: web.Request) -> web.Response:
+            behaviour = self.behaviour[provider]
+            await asyncio.sleep(behaviour.sample_latency(self.rng))
+            roll = self.rng.random()
+            if roll < behaviour.rate_limit:
+                self._count(provider, '429')
+                return web.Response(status=429, headers={'Retry-After': str(int(behaviour.retry_after))})
+            roll -= behaviour.rate_limit
+            if roll < behaviour.error_rate:
+                self._count(provider, '503')
+                return web.Response(status=503, text='upstream unavailable')
+            roll -= behaviour.error_rate
+            if roll < behaviour.malformed:
+                self._count(provider, 'malformed')
+                body = self.rng.choice(['{"rates": {"EUR": 0.9', '<html>maintenance</html>', '[]', '{"rates": null}'])
+                return web.Response(text=body, content_type='application/json')
+
+            try:
+                body = ujson.dumps(self.payload(provider, request))
+            except web.HTTPNotFound:
+                self._count(provider, '404')
+                raise
+            etag = '"%s"' % hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+            if request.headers.get('If-None-Match') == etag:
+                self._count(provider, '304')
+                return web.Response(status=304, headers={'ETag': etag})
+            self._count(provider, '200')
+            return web.Response(text=body, content_type='application/json', headers={'ETag': etag})
+        return _handle
+
+    async def _set_behaviour(self, request: web.Request) -> web.Response:
+        provider = request.match_info['provider']
+        targets = PROVIDERS if provider == '*' else (provider,)
+        if any(name not in self.behaviour for name in targets):
+            raise web.HTTPNotFound()
+        try:
+            values = await request.json(loads=ujson.loads)
+            for name in targets:
+                self.behaviour[name].update(values)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise web.HTTPBadRequest(text=f"Invalid behaviour: {e}")
+        return web.json_response({name: self.behaviour[name].as_dict() for name in targets}, dumps=ujson.dumps)
+
+    async def _get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {name: {'behaviour': self.behaviour[name].as_dict(), 'responses': self.stats[name]} for name in PROVIDERS},
+            dumps=ujson.dumps,
+        )
+
+    def app_for(self, provider: str) -> web.Application:
+        """Application for one provider port; the control endpoints are served on every port."""
+        path = urlparse(PROVIDER_URLS[provider]).path
+        app = web.Application()
+        if provider == 'coincap':
+            app.router.add_get(path.rstrip('/') + '/{asset_id}', self.handler(provider))
+        else:
+            app.router.add_get(path, self.handler(provider))
+        app.router.add_post('/_standin/behaviour/{provider}', self._set_behaviour)
+        app.router.add_get('/_standin/stats', self._get_stats)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8089) -> List[web.AppRunner]:
+        """Bind provider ``i`` of ``PROVIDERS`` to ``port + i``; clean up with ``runner.cleanup()``."""
+        runners = []
+        for i, provider in enumerate(PROVIDERS):
+            runner = web.AppRunner(self.app_for(provider), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, host, port + i).start()
+            runners.append(runner)
+            logger.info(f"Stand-in {provider} listening on http://{host}:{port + i}")
+        return runners
+
+
+async def _serve(args: argparse.Namespace):
+    standin = ProviderStandin(seed=args.seed, defaults={
+        'latency': args.latency, 'latency_sigma': args.latency_sigma, 'rate_limit': args.rate_limit,
+        'retry_after': args.retry_after, 'error_rate': args.error_rate, 'malformed': args.malformed,
+        'coverage': args.coverage, 'drift': args.drift,
+    })
+    runners = await standin.start(args.host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the public rate providers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089, help="first port; provider i listens on port + i")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.05, help="median latency in seconds")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="log-normal shape of the latency")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="probability of a 429")
+    parser.add_argument('--retry-after', type=float, default=5.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability of a 503")
+    parser.add_argument('--malformed', type=float, default=0.0, help="probability of a malformed body")
+    parser.add_argument('--coverage', type=float, default=1.0, help="fraction of currencies in each payload")
+    parser.add_argument('--drift', type=float, default=0.0, help="relative stddev of per-request rate noise")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s [%(name)s]: %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import logging
+import os
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+
+from config.config import ALL_CURRENCIES
+
+logger = logging.getLogger(__name__)
+
+_TS_COLUMN = '_ts'
+
+
+class RateHistory:
+    """Append-only columnar store of USD-based rates, one row per second at most.
+
+    Every currency lives in its own ``<CODE>.col`` file next to an int64 ``_ts.col``
+    timestamp column, so appends are plain file writes and reads are memory-mapped
+    slices located by binary search on the timestamps.
+    """
+
+    def __init__(self, directory: str, codes: Iterable[str] = ALL_CURRENCIES, dtype=np.float64):
+        self.directory = directory
+        self.codes = tuple(codes)
+        self.dtype = np.dtype(dtype)
+        self._maps: Dict[str, np.ndarray] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._length = self._repair()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{column}.col")
+
+    def _column_dtype(self, column: str) -> np.dtype:
+        return np.dtype(np.int64) if column == _TS_COLUMN else self.dtype
+
+    def _rows_on_disk(self, column: str) -> int:
+        try:
+            return os.path.getsize(self._path(column)) // self._column_dtype(column).itemsize
+        except FileNotFoundError:
+            return 0
+
+    def _repair(self) -> int:
+        # The timestamp column is written last, so it defines how many rows are complete.
+        length = self._rows_on_disk(_TS_COLUMN)
+        ts_bytes = length * np.dtype(np.int64).itemsize
+        if os.path.exists(self._path(_TS_COLUMN)) and os.path.getsize(self._path(_TS_COLUMN)) != ts_bytes:
+            os.truncate(self._path(_TS_COLUMN), ts_bytes)
+
+        for code in self.codes:
+            path = self._path(code)
+            rows = self._rows_on_disk(code)
+            if rows > length:
+                os.truncate(path, length * self.dtype.itemsize)
+                logger.warning(f"Rate history column {code} truncated to {length} rows")
+            elif rows < length:
+                with open(path, 'ab') as f:
+                    f.write(np.full(length - rows, np.nan, dtype=self.dtype).tobytes())
+        return length
+
+    def _column(self, column: str) -> np.ndarray:
+        cached = self._maps.get(column)
+        if cached is not None:
+            return cached
+        if self._length == 0:
+            mapped = np.empty(0, dtype=self._column_dtype(column))
+        else:
+            mapped = np.memmap(self._path(column), dtype=self._column_dtype(column), mode='r', shape=(self._length,))
+        self._maps[column] = mapped
+        return mapped
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._column(_TS_COLUMN)
+
+    def _value_bytes(self, code: str, usd_rates: Mapping[str, float]) -> bytes:
+        value = usd_rates.get(code, np.nan) if code != 'USD' else 1.0
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+        return np.array([value if value > 0 else np.nan], dtype=self.dtype).tobytes()
+
+    def append(self, timestamp: float, usd_rates: Mapping[str, float]) -> bool:
+        """Append a snapshot; one landing in the same second as the last row replaces it."""
+        ts = int(timestamp)
+        last = int(self.timestamps[-1]) if self._length else None
+        if last is not None and ts < last:
+            return False
+
+        if ts == last:
+            offset = (self._length - 1) * self.dtype.itemsize
+            for code in self.codes:
+                with open(self._path(code), 'r+b') as f:
+                    f.seek(offset)
+                    f.write(self._value_bytes(code, usd_rates))
+            self._maps.clear()
+            return True
+
+        for code in self.codes:
+            with open(self._path(code), 'ab') as f:
+                f.write(self._value_bytes(code, usd_rates))
+        with open(self._path(_TS_COLUMN), 'ab') as f:
+            f.write(np.array([ts], dtype=np.int64).tobytes())
+
+        self._length += 1
+        self._maps.clear()
+        return True
+
+    def _cross(self, from_code: str, to_code: str, start: int, stop: int) -> np.ndarray:
+        if from_code not in self.codes or to_code not in self.codes:
+            raise KeyError(f"No rate history for {from_code}/{to_code}")
+        from_col = self._column(from_code)[start:stop].astype(np.float64)
+        to_col = self._column(to_code)[start:stop].astype(np.float64)
+        return to_col / from_col
+
+    def rate_at(self, from_code: str, to_code: str, t: float) -> Optional[float]:
+        """Rate of ``from_code`` in ``to_code`` as of the last snapshot at or before ``t``."""
+        row = int(np.searchsorted(self.timestamps, int(t), side='right')) - 1
+        if row < 0:
+            return None
+        value = float(self._cross(from_code, to_code, row, row + 1)[0])
+        return value if value == value else None
+
+    def series(self, from_code: str, to_code: str, t0: float, t1: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and rates of every snapshot with ``t0 <= ts <= t1``."""
+        timestamps = self.timestamps
+        start = int(np.searchsorted(timestamps, int(t0), side='left'))
+        stop = int(np.searchsorted(timestamps, int(t1), side='right'))
+        return np.asarray(timestamps[start:stop]), self._cross(from_code, to_code, start, stop)
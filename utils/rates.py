@@ -1,24 +1,264 @@
 import asyncio
+import itertools
 import logging
+import math
+import os
 import time
-from typing import Dict, Any, Optional
+from collections import deque
+from contextlib import AsyncExitStack
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Iterable, List, Mapping, Optional, Set, Tuple
 
 import aiohttp
+import numpy as np
 import ujson
 
 from config.config import (
-    CACHE_EXPIRATION_TIME, ACTIVE_CURRENCIES, CRYPTO_CURRENCIES,
-    CRYPTO_ID_MAPPING, HTTP_TOTAL_TIMEOUT, HTTP_CONNECT_TIMEOUT,
+    CACHE_EXPIRATION_TIME, ALL_CURRENCIES, ACTIVE_CURRENCIES, CRYPTO_CURRENCIES,
+    CRYPTO_ID_MAPPING, HTTP_TOTAL_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_HEDGE_DELAY,
     STALE_WHILE_REVALIDATE, HTTP_CONNECTOR_LIMIT,
-    HTTP_CONNECTOR_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL
+    HTTP_CONNECTOR_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL,
+    RATES_CACHE_PATH, RATES_CACHE_MAX_AGE, RATES_HISTORY_DIR,
+    FIAT_RATES_TTL, CRYPTO_RATES_TTL, PROVIDER_URLS, RATES_SHM_NAME, RATES_SHM_ROLE,
 )
-from utils.http import _host_of, _with_retries, _safe_bg_task, get_http_session
+from utils.http import _safe_bg_task, get_http_session, get_json_conditional, hedged_requests
+from utils.rate_history import RateHistory
+from utils.shared_rates import SharedRateSegment
 
 logger = logging.getLogger(__name__)
 
 cache: Dict[str, Any] = {}
 _revalidation_lock = asyncio.Lock()
-_rates_lock = asyncio.Lock()
+
+ASSET_CLASSES: Dict[str, List[str]] = {'fiat': ACTIVE_CURRENCIES, 'crypto': CRYPTO_CURRENCIES}
+ASSET_CLASS_TTL: Dict[str, float] = {'fiat': FIAT_RATES_TTL, 'crypto': CRYPTO_RATES_TTL}
+_class_locks: Dict[str, asyncio.Lock] = {asset_class: asyncio.Lock() for asset_class in ASSET_CLASSES}
+_class_fetched_at: Dict[str, float] = {}
+
+CURRENCY_CODES = tuple(ALL_CURRENCIES)
+CURRENCY_INDEX: Dict[str, int] = {code: i for i, code in enumerate(CURRENCY_CODES)}
+# Codes outside ALL_CURRENCIES map to an extra all-NaN row/column of the matrix.
+_UNKNOWN_ORDINAL = len(CURRENCY_CODES)
+
+_snapshot_generation = itertools.count(1)
+_snapshot: Optional['RateSnapshot'] = None
+_history: Optional[RateHistory] = None
+_snapshot_listeners: List[Callable[['RateSnapshot'], None]] = []
+_refresh_leader = True
+_persisted_mtime = 0.0
+_shared_segment: Optional[SharedRateSegment] = None
+_shared_reader_name: Optional[str] = None
+_shared_retry_at = 0.0
+_SHARED_ATTACH_RETRY = 1.0  # seconds between attach attempts while the writer is not up yet
+
+
+class RateSnapshot:
+    """Immutable view of one published rate set.
+
+    ``matrix[i, j]`` is the amount of currency ``j`` per one unit of currency ``i``
+    (ordinals from ``CURRENCY_INDEX``); missing or invalid rates are NaN.
+    """
+
+    __slots__ = ('generation', 'fetched_at', 'usd_rates', 'matrix', '_rates')
+
+    def __init__(self, rates: Dict[str, float], generation: int, fetched_at: float):
+        usd_rates = np.full(_UNKNOWN_ORDINAL + 1, np.nan)
+        for code, ordinal in CURRENCY_INDEX.items():
+            if code == 'USD':
+                usd_rates[ordinal] = 1.0
+                continue
+            try:
+                rate_f = float(rates.get(code, 0))
+            except (TypeError, ValueError):
+                continue
+            if rate_f > 0 and math.isfinite(rate_f):
+                usd_rates[ordinal] = rate_f
+
+        matrix = usd_rates[np.newaxis, :] / usd_rates[:, np.newaxis]
+        usd_rates.flags.writeable = False
+        matrix.flags.writeable = False
+
+        object.__setattr__(self, 'generation', generation)
+        object.__setattr__(self, 'fetched_at', fetched_at)
+        object.__setattr__(self, 'usd_rates', usd_rates)
+        object.__setattr__(self, 'matrix', matrix)
+        object.__setattr__(self, '_rates', rates)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RateSnapshot is immutable")
+
+    @classmethod
+    def from_usd_rates(cls, usd_rates: np.ndarray, generation: int, fetched_at: float) -> 'RateSnapshot':
+        rates = {code: float(v) for code, v in zip(CURRENCY_CODES, usd_rates) if v == v}
+        return cls(rates, generation, fetched_at)
+
+    @property
+    def rates(self) -> Mapping[str, float]:
+        return MappingProxyType(self._rates)
+
+    def __bool__(self) -> bool:
+        return bool(self._rates)
+
+    @staticmethod
+    def ordinals(codes: Iterable[str]) -> np.ndarray:
+        return np.fromiter((CURRENCY_INDEX.get(c, _UNKNOWN_ORDINAL) for c in codes), dtype=np.intp)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        i = CURRENCY_INDEX.get(from_currency)
+        j = CURRENCY_INDEX.get(to_currency)
+        if i is None or j is None:
+            return convert_currency(amount, from_currency, to_currency, self._rates)
+        factor = self.matrix[i, j]
+        if factor != factor:
+            raise KeyError(f"Rate not available for {from_currency}->{to_currency}")
+        return amount * float(factor)
+
+    def convert_to(self, amount: float, from_currency: str, to_currencies: Iterable[str]) -> np.ndarray:
+        row = self.matrix[CURRENCY_INDEX.get(from_currency, _UNKNOWN_ORDINAL)]
+        return amount * row[self.ordinals(to_currencies)]
+
+    def convert_many(
+        self, amounts: Iterable[float], from_codes: Iterable[str], target_codes: Iterable[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        amounts_arr = np.asarray(amounts, dtype=np.float64)
+        factors = self.matrix[np.ix_(self.ordinals(from_codes), self.ordinals(target_codes))]
+        result = amounts_arr[:, np.newaxis] * factors
+        return result, ~np.isnan(result)
+
+
+def _publish_snapshot(rates: Dict[str, float], fetched_at: Optional[float] = None) -> RateSnapshot:
+    global _snapshot
+    snapshot = RateSnapshot(rates, next(_snapshot_generation), fetched_at if fetched_at is not None else time.time())
+    _snapshot = snapshot
+    if _shared_segment is not None and _shared_segment.writer:
+        _shared_segment.publish(snapshot.generation, snapshot.fetched_at, snapshot.usd_rates)
+    _notify_snapshot_listeners(snapshot)
+    logger.debug(f"Published rate snapshot generation {snapshot.generation}")
+    return snapshot
+
+
+def get_current_snapshot() -> Optional[RateSnapshot]:
+    return _snapshot
+
+
+def add_snapshot_listener(listener: Callable[[RateSnapshot], None]):
+    """Call ``listener`` with every newly published snapshot (e.g. to drop derived caches)."""
+    _snapshot_listeners.append(listener)
+
+
+def _notify_snapshot_listeners(snapshot: RateSnapshot):
+    for listener in _snapshot_listeners:
+        try:
+            listener(snapshot)
+        except Exception:
+            logger.exception("Snapshot listener failed")
+
+
+def open_shared_rates(name: str = RATES_SHM_NAME, role: str = RATES_SHM_ROLE) -> bool:
+    """Use the shared snapshot segment ``name``; readers then never fetch rates themselves.
+
+    A reader whose writer has not created the segment yet keeps retrying on lookups.
+    """
+    global _shared_segment, _shared_reader_name, _snapshot_generation
+    if not name:
+        return False
+    if role != 'writer':
+        _shared_reader_name = name
+        return _attach_shared_reader()
+    try:
+        segment = SharedRateSegment(name, CURRENCY_CODES, writer=True)
+    except (OSError, ValueError) as shm_error:
+        logger.error(f"Cannot open shared rate segment {name}: {shm_error}")
+        return False
+    # Continue the generation sequence of a previous writer so readers never see a generation repeat.
+    _snapshot_generation = itertools.count(segment.generation + 1)
+    if _snapshot is not None:
+        segment.publish(next(_snapshot_generation), _snapshot.fetched_at, _snapshot.usd_rates)
+    _shared_segment = segment
+    logger.info(f"Publishing rate snapshots to shared segment {name}")
+    return True
+
+
+def _attach_shared_reader() -> bool:
+    global _shared_segment, _shared_retry_at
+    if time.monotonic() < _shared_retry_at:
+        return False
+    try:
+        _shared_segment = SharedRateSegment(_shared_reader_name, CURRENCY_CODES)
+    except (OSError, ValueError) as shm_error:
+        _shared_retry_at = time.monotonic() + _SHARED_ATTACH_RETRY
+        logger.warning(f"Shared rate segment {_shared_reader_name} not available yet: {shm_error}")
+        return False
+    logger.info(f"Reading rate snapshots from shared segment {_shared_reader_name}")
+    return True
+
+
+def close_shared_rates():
+    global _shared_segment, _shared_reader_name
+    if _shared_segment is not None:
+        _shared_segment.close()
+    _shared_segment = None
+    _shared_reader_name = None
+
+
+def is_shared_reader() -> bool:
+    return _shared_reader_name is not None
+
+
+def _read_shared_snapshot() -> Optional[RateSnapshot]:
+    global _snapshot
+    snapshot = _snapshot
+    if _shared_segment is None and not _attach_shared_reader():
+        return snapshot
+    if snapshot is not None and snapshot.generation == _shared_segment.generation:
+        return snapshot
+    published = _shared_segment.read()
+    if published is None:
+        return snapshot
+    generation, fetched_at, usd_rates = published
+    snapshot = RateSnapshot.from_usd_rates(usd_rates, generation, fetched_at)
+    _snapshot = snapshot
+    cache['exchange_rates'] = (snapshot._rates, fetched_at)
+    _notify_snapshot_listeners(snapshot)
+    logger.debug(f"Loaded shared rate snapshot generation {generation}")
+    return snapshot
+
+
+def _snapshot_for(rates: Dict[str, float]) -> RateSnapshot:
+    snapshot = _snapshot
+    if snapshot is not None and snapshot._rates is rates:
+        return snapshot
+    cached_item = cache.get('exchange_rates')
+    fetched_at = cached_item[1] if cached_item and cached_item[0] is rates else None
+    return _publish_snapshot(rates, fetched_at)
+
+
+def convert_many(
+    amounts: Iterable[float],
+    from_codes: Iterable[str],
+    target_codes: Iterable[str],
+    snapshot: Optional[RateSnapshot] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert ``amounts[k]`` from ``from_codes[k]`` into every target in one batch.
+
+    Returns a ``(len(amounts), len(target_codes))`` result array and a boolean mask
+    that is False wherever either rate is unavailable.
+    """
+    if snapshot is None:
+        snapshot = _snapshot
+    if snapshot is None:
+        raise KeyError("No rate snapshot published yet")
+    return snapshot.convert_many(amounts, from_codes, target_codes)
+
+
+async def get_rate_snapshot() -> Optional[RateSnapshot]:
+    if is_shared_reader():
+        snapshot = _read_shared_snapshot()
+        return snapshot if snapshot else None
+    rates = await get_exchange_rates()
+    if not rates:
+        return None
+    return _snapshot_for(rates)
 
 
 def _as_rates_dict(payload: Any) -> Optional[Dict[str, float]]:
@@ -60,6 +300,125 @@ def set_cached_data(key: str, data: Dict[str, float]):
     cache[key] = (data, time.time())
 
 
+def _persist_rates(rates: Dict[str, float], fetched_at: float):
+    if not RATES_CACHE_PATH:
+        return
+    tmp_path = f"{RATES_CACHE_PATH}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(ujson.dumps({'ts': fetched_at, 'rates': rates, 'classes': _class_fetched_at}))
+        os.replace(tmp_path, RATES_CACHE_PATH)
+    except (OSError, TypeError, ValueError, OverflowError) as persist_err:
+        logger.warning(f"Failed to persist rates to {RATES_CACHE_PATH}: {persist_err}")
+
+
+def get_rate_history() -> Optional[RateHistory]:
+    global _history
+    if _history is None and RATES_HISTORY_DIR:
+        try:
+            _history = RateHistory(RATES_HISTORY_DIR, CURRENCY_CODES)
+        except OSError as history_err:
+            logger.warning(f"Rate history unavailable at {RATES_HISTORY_DIR}: {history_err}")
+            return None
+    return _history
+
+
+def _record_history(rates: Dict[str, float], fetched_at: float):
+    history = get_rate_history()
+    if history is None:
+        return
+    try:
+        history.append(fetched_at, rates)
+    except OSError as history_err:
+        logger.warning(f"Failed to append rates to history: {history_err}")
+
+
+def _read_persisted_rates() -> Optional[Tuple[Dict[str, float], float, Dict[str, float]]]:
+    try:
+        with open(RATES_CACHE_PATH, 'r', encoding='utf-8') as f:
+            payload = ujson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as load_err:
+        logger.warning(f"Ignoring unreadable rates cache {RATES_CACHE_PATH}: {load_err}")
+        return None
+
+    if not isinstance(payload, dict):
+        return None
+    persisted = _as_rates_dict(payload.get('rates'))
+    try:
+        fetched_at = float(payload.get('ts', 0))
+    except (TypeError, ValueError):
+        return None
+    if not persisted or time.time() - fetched_at > RATES_CACHE_MAX_AGE:
+        logger.info("Persisted rates missing or too old, waiting for a fresh fetch")
+        return None
+    class_stamps = payload.get('classes')
+    if not isinstance(class_stamps, dict):
+        class_stamps = {}
+    return persisted, fetched_at, {c: float(class_stamps.get(c, fetched_at)) for c in ASSET_CLASSES}
+
+
+def load_persisted_rates() -> bool:
+    """Seed the cache from the last persisted rates, already due for revalidation.
+
+    The entry is timestamped as just expired, so the first lookup serves it through
+    the stale-while-revalidate path and triggers a background refresh.
+    """
+    if not RATES_CACHE_PATH or 'exchange_rates' in cache:
+        return False
+    loaded = _read_persisted_rates()
+    if loaded is None:
+        return False
+    persisted, fetched_at, _ = loaded
+    now = time.time()
+
+    # RATES_CACHE_MAX_AGE already bounds how old the file may be; stamping it with its real
+    # age would push an older file past the SWR grace and block the first lookup on a fetch.
+    cache['exchange_rates'] = (persisted, now - CACHE_EXPIRATION_TIME)
+    for asset_class, ttl in ASSET_CLASS_TTL.items():
+        _class_fetched_at[asset_class] = now - ttl
+    _publish_snapshot(persisted, fetched_at)
+    logger.info(f"Loaded {len(persisted)} persisted exchange rates ({int((now - fetched_at) / 60)}min old)")
+    return True
+
+
+def set_refresh_leader(is_leader: bool):
+    """Followers stop calling the providers and adopt the leader's persisted rates instead."""
+    global _refresh_leader
+    if is_leader != _refresh_leader:
+        logger.info(f"Rate refresh {'leader' if is_leader else 'follower'} mode")
+    _refresh_leader = is_leader
+
+
+def is_refresh_leader() -> bool:
+    return _refresh_leader
+
+
+def sync_persisted_rates() -> bool:
+    """Adopt the rates last persisted by the refresh leader; False if none are usable."""
+    global _persisted_mtime
+    if not RATES_CACHE_PATH:
+        return False
+    try:
+        mtime = os.stat(RATES_CACHE_PATH).st_mtime
+    except OSError:
+        return False
+    if mtime == _persisted_mtime and 'exchange_rates' in cache:
+        return True
+    loaded = _read_persisted_rates()
+    if loaded is None:
+        return False
+    persisted, fetched_at, class_stamps = loaded
+    _persisted_mtime = mtime
+    cache['exchange_rates'] = (persisted, fetched_at)
+    _class_fetched_at.update(class_stamps)
+    if _snapshot is None or _snapshot._rates != persisted:
+        _publish_snapshot(persisted, fetched_at)
+    logger.debug(f"Adopted {len(persisted)} persisted exchange rates from the refresh leader")
+    return True
+
+
 def _store_rates(new_rates: Dict[str, float]) -> Dict[str, float]:
     prev_item = cache.get('exchange_rates')
     prev_rates = _as_rates_dict(prev_item[0]) if prev_item else None
@@ -69,29 +428,54 @@ def _store_rates(new_rates: Dict[str, float]) -> Dict[str, float]:
         return prev_rates or {}
 
     merged = {**prev_rates, **new_rates} if prev_rates else new_rates
+    if merged == prev_rates:
+        # Nothing moved: extend the TTL but keep the current snapshot and its generation.
+        set_cached_data('exchange_rates', prev_rates)
+        logger.info(f"Fetched rates unchanged, keeping snapshot ({len(prev_rates)} rates)")
+        return prev_rates
     set_cached_data('exchange_rates', merged)
+    fetched_at = cache['exchange_rates'][1]
+    _publish_snapshot(merged, fetched_at)
+    _persist_rates(merged, fetched_at)
+    _record_history(merged, fetched_at)
     logger.info(f"Successfully cached {len(merged)} exchange rates ({len(new_rates)} freshly fetched)")
     return merged
 
 
+def _class_age(asset_class: str, now: float) -> float:
+    fetched_at = _class_fetched_at.get(asset_class)
+    if fetched_at is None:
+        # Rates cached without per-class bookkeeping count as fetched with the whole entry.
+        cached_item = cache.get('exchange_rates')
+        fetched_at = cached_item[1] if cached_item else None
+    return now - fetched_at if fetched_at is not None else math.inf
+
+
+def stale_asset_classes(now: Optional[float] = None, grace: float = 0.0) -> List[str]:
+    now = time.time() if now is None else now
+    return [c for c in ASSET_CLASSES if _class_age(c, now) >= ASSET_CLASS_TTL[c] + grace]
+
+
 async def get_exchange_rates() -> Dict[str, float]:
+    if is_shared_reader():
+        snapshot = _read_shared_snapshot()
+        return snapshot._rates if snapshot is not None else {}
     try:
-        cached_rates = _as_rates_dict(get_cached_data('exchange_rates'))
-        if cached_rates:
-            logger.debug("Using cached exchange rates")
-            return cached_rates
-
         stale_item = cache.get('exchange_rates')
+        cached_rates = _as_rates_dict(stale_item[0]) if stale_item else None
         now = time.time()
-        if stale_item:
-            data, ts = stale_item
-            if now - ts < (CACHE_EXPIRATION_TIME + STALE_WHILE_REVALIDATE):
+        if cached_rates:
+            stale = stale_asset_classes(now)
+            if not stale:
+                logger.debug("Using cached exchange rates")
+                return cached_rates
+            if not stale_asset_classes(now, grace=STALE_WHILE_REVALIDATE):
                 if not _revalidation_lock.locked():
-                    _safe_bg_task(_bg_refresh_rates(), name="stale_refresh_rates")
-                logger.info("Returning stale exchange rates while refreshing in background")
-                return data
+                    _safe_bg_task(_bg_refresh_rates(stale), name="stale_refresh_rates")
+                logger.info(f"Returning stale exchange rates while refreshing {', '.join(stale)} in background")
+                return cached_rates
 
-        rates = await refresh_rates()
+        rates = await refresh_rates(asset_classes=stale_asset_classes(now) if cached_rates else None)
 
         if not rates and stale_item:
             data, ts = stale_item
@@ -110,34 +494,334 @@ async def get_exchange_rates() -> Dict[str, float]:
         return {}
 
 
-async def _bg_refresh_rates():
+async def _bg_refresh_rates(asset_classes: Optional[Iterable[str]] = None):
     async with _revalidation_lock:
         try:
-            await refresh_rates(force=True)
+            await refresh_rates(force=True, asset_classes=asset_classes)
         except asyncio.CancelledError:
             raise
         except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError):
             logger.exception("Background rate refresh failed")
 
 
-async def refresh_rates(force: bool = False) -> Dict[str, float]:
-    if not force:
-        async with _rates_lock:
-            fresh = _as_rates_dict(get_cached_data('exchange_rates'))
-            if fresh:
+async def refresh_rates(force: bool = False, asset_classes: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    if not _refresh_leader:
+        sync_persisted_rates()
+        cached_item = cache.get('exchange_rates')
+        return (_as_rates_dict(cached_item[0]) or {}) if cached_item else {}
+    requested = sorted(asset_classes) if asset_classes else sorted(ASSET_CLASSES)
+    async with AsyncExitStack() as stack:
+        # Classes refresh independently; sorted acquisition keeps multi-class refreshes deadlock-free.
+        for asset_class in requested:
+            await stack.enter_async_context(_class_locks[asset_class])
+        if not force:
+            stale = set(stale_asset_classes())
+            requested = [c for c in requested if c in stale]
+            cached_item = cache.get('exchange_rates')
+            fresh = _as_rates_dict(cached_item[0]) if cached_item else None
+            if not requested and fresh:
                 return fresh
-            return await _fetch_rates_unlocked()
-    
-    async with _rates_lock:
-        return await _fetch_rates_unlocked()
+        return await _fetch_rates_unlocked(requested or sorted(ASSET_CLASSES))
 
 
-async def _fetch_rates_unlocked() -> Dict[str, float]:
-    session_to_close = None
+async def refresh_asset_class(asset_class: str) -> bool:
+    """Force-refresh one asset class; True when its providers returned data."""
+    if not _refresh_leader:
+        return sync_persisted_rates()
+    before = _class_fetched_at.get(asset_class)
+    await refresh_rates(force=True, asset_classes=[asset_class])
+    return _class_fetched_at.get(asset_class) != before
 
-    try:
+
+_FETCH_ERRORS = (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError)
+
+
+async def _get_json(session: aiohttp.ClientSession, url: str, timeout: aiohttp.ClientTimeout) -> Any:
+    payload, _ = await get_json_conditional(session, url, timeout)
+    return payload
+
+
+class RateProvider:
+    """A rate source covering a fixed set of currencies of one asset class.
+
+    ``fetch`` returns ``{code: units per 1 USD}`` for (at least part of) ``wanted``
+    and raises on transport or payload errors. Fallback providers are only tried after
+    every regular provider of their asset class.
+    """
+
+    fallback = False
+
+    def __init__(self, name: str, asset_class: str, currencies: Iterable[str]):
+        self.name = name
+        self.asset_class = asset_class
+        self.currencies = frozenset(currencies)
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    async def fetch(self, session: aiohttp.ClientSession, timeout: aiohttp.ClientTimeout,
+                    wanted: Set[str]) -> Dict[str, float]:
+        raise NotImplementedError
+
+
+class FiatJsonProvider(RateProvider):
+    def __init__(self, name: str, url: str):
+        super().__init__(name, 'fiat', ACTIVE_CURRENCIES)
+        self.url = url
+        self._last_normalized: Optional[Dict[str, float]] = None
+
+    async def fetch(self, session, timeout, wanted):
+        fiat_data, changed = await get_json_conditional(session, self.url, timeout)
+        if not changed and self._last_normalized is not None:
+            logger.debug(f"Fiat payload from {self.name} unchanged, skipping normalization")
+            return self._last_normalized
+        normalized = normalize_fiat_payload(fiat_data)
+        if normalized is None:
+            raise ValueError(f"Unexpected fiat payload from {self.name}")
+        self._last_normalized = normalized
+        return normalized
+
+
+class CoinGeckoProvider(RateProvider):
+    def __init__(self, url: str = 'https://api.coingecko.com/api/v3/simple/price'):
+        self.mapping = CRYPTO_ID_MAPPING['coingecko']
+        super().__init__('coingecko', 'crypto', self.mapping)
+        self.url = url
+
+    async def fetch(self, session, timeout, wanted):
+        symbols = [sym for sym in self.mapping if sym in wanted]
+        crypto_ids = ','.join(self.mapping[sym] for sym in symbols)
+        cg_result = await _get_json(session, f'{self.url}?ids={crypto_ids}&vs_currencies=usd', timeout)
+        if not isinstance(cg_result, dict):
+            raise ValueError("Unexpected CoinGecko payload")
+        crypto_rates = {}
+        for cg_symbol in symbols:
+            cg_entry = cg_result.get(self.mapping[cg_symbol])
+            try:
+                cg_usd_price = float(cg_entry.get('usd')) if isinstance(cg_entry, dict) else None
+            except (TypeError, ValueError):
+                cg_usd_price = None
+            if cg_usd_price and cg_usd_price > 0:
+                crypto_rates[cg_symbol] = 1.0 / cg_usd_price
+        return crypto_rates
+
+
+class CoinGeckoSingleProvider(CoinGeckoProvider):
+    """One CoinGecko request per coin, for when the bulk request failed and there is no CoinCap key."""
+
+    fallback = True
+
+    def __init__(self, url: str = 'https://api.coingecko.com/api/v3/simple/price'):
+        super().__init__(url)
+        self.name = 'coingecko-single'
+
+    @property
+    def enabled(self) -> bool:
+        from config.config import COINCAP_API_KEY
+        return not COINCAP_API_KEY
+
+    async def fetch(self, session, timeout, wanted):
+        crypto_rates = {}
+        for symbol in sorted(self.currencies & wanted):
+            coin_id = self.mapping[symbol]
+            try:
+                gecko_data = await _get_json(session, f'{self.url}?ids={coin_id}&vs_currencies=usd', timeout)
+                entry = gecko_data.get(coin_id) if isinstance(gecko_data, dict) else None
+                usd_price = float(entry.get('usd', 0)) if isinstance(entry, dict) else 0.0
+            except _FETCH_ERRORS as gecko_error:
+                logger.warning(f"Failed to fetch {symbol} from CoinGecko: {gecko_error}")
+                continue
+            if usd_price > 0:
+                crypto_rates[symbol] = 1.0 / usd_price
+        return crypto_rates
+
+
+class CoinCapProvider(RateProvider):
+    def __init__(self, url: str = 'https://rest.coincap.io/v3/assets'):
+        self.mapping = CRYPTO_ID_MAPPING['coincap']
+        super().__init__('coincap', 'crypto', self.mapping)
+        self.url = url
+
+    @property
+    def enabled(self) -> bool:
         from config.config import COINCAP_API_KEY
+        return bool(COINCAP_API_KEY)
 
+    async def fetch(self, session, timeout, wanted):
+        from config.config import COINCAP_API_KEY
+
+        async def _fetch_coincap_single(crypto_sym):
+            asset_id = self.mapping.get(crypto_sym, crypto_sym.lower())
+            alt_crypto_data = await _get_json(session, f'{self.url}/{asset_id}?apiKey={COINCAP_API_KEY}', timeout)
+            if isinstance(alt_crypto_data, dict) and isinstance(alt_crypto_data.get('data'), dict):
+                coincap_usd_price = float(alt_crypto_data['data'].get('priceUsd', 0))
+                if coincap_usd_price > 0:
+                    return crypto_sym, 1.0 / coincap_usd_price
+            return crypto_sym, None
+
+        symbols = sorted(self.currencies & wanted)
+        coincap_results = await asyncio.gather(*(_fetch_coincap_single(c) for c in symbols), return_exceptions=True)
+        crypto_rates = {}
+        for crypto_sym, coincap_item in zip(symbols, coincap_results):
+            if isinstance(coincap_item, tuple) and coincap_item[1] is not None:
+                crypto_rates[crypto_sym] = coincap_item[1]
+            elif isinstance(coincap_item, BaseException):
+                logger.warning(f"Failed to fetch {crypto_sym} from CoinCap v3: {coincap_item}")
+        if not crypto_rates and coincap_results and all(isinstance(r, BaseException) for r in coincap_results):
+            raise coincap_results[0]
+        return crypto_rates
+
+
+class ProviderStats:
+    __slots__ = ('latencies', 'error_rate', 'last_success', 'last_failure', 'calls', 'failures')
+
+    _ALPHA = 0.3
+
+    def __init__(self, window: int = 32):
+        self.latencies: deque = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool):
+        self.calls += 1
+        self.latencies.append(latency)
+        self.error_rate += self._ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.last_success = time.time()
+        else:
+            self.failures += 1
+            self.last_failure = time.time()
+
+    def record_cancelled(self, elapsed: float):
+        """A lower-bound latency for an attempt cut short, e.g. by a faster hedge.
+
+        Without it only the attempts that won would be sampled and the p90 behind
+        ``hedge_delay`` would keep drifting down.
+        """
+        self.latencies.append(elapsed)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def hedge_delay(self) -> float:
+        p90 = self.latency_percentile(90)
+        return min(p90, HTTP_TOTAL_TIMEOUT) if p90 is not None else HTTP_HEDGE_DELAY
+
+    def score(self) -> float:
+        # Unmeasured providers score 0 so they get tried; failures inflate the expected cost.
+        latency = self.latency_percentile(50) or 0.0
+        return (latency + HTTP_TOTAL_TIMEOUT * self.error_rate) * (1.0 + 4.0 * self.error_rate)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate, 3),
+            'p50_latency': self.latency_percentile(50),
+            'age': time.time() - self.last_success if self.last_success else None,
+        }
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._providers: List[RateProvider] = []
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def register(self, provider: RateProvider) -> RateProvider:
+        self._providers = [p for p in self._providers if p.name != provider.name] + [provider]
+        self._stats.setdefault(provider.name, ProviderStats())
+        return provider
+
+    def clear(self):
+        self._providers.clear()
+        self._stats.clear()
+
+    def stats(self, name: str) -> ProviderStats:
+        return self._stats.setdefault(name, ProviderStats())
+
+    def ordered(self, asset_class: Optional[str] = None) -> List[RateProvider]:
+        candidates = [
+            p for p in self._providers
+            if p.enabled and (asset_class is None or p.asset_class == asset_class)
+        ]
+        return sorted(candidates, key=lambda p: (p.fallback, self.stats(p.name).score()))
+
+    async def call(self, provider: RateProvider, session: aiohttp.ClientSession,
+                   timeout: aiohttp.ClientTimeout, wanted: Set[str]) -> Optional[Dict[str, float]]:
+        started = time.monotonic()
+        try:
+            result = await provider.fetch(session, timeout, wanted)
+        except asyncio.CancelledError:
+            self.stats(provider.name).record_cancelled(time.monotonic() - started)
+            raise
+        except _FETCH_ERRORS as provider_error:
+            self.stats(provider.name).record(time.monotonic() - started, ok=False)
+            logger.warning(f"Rate provider {provider.name} failed: {provider_error}")
+            return None
+        # A provider only contributes its own asset class: fiat payloads also quote BTC & co.
+        if result:
+            result = {code: rate for code, rate in result.items() if code in provider.currencies and code in wanted}
+        self.stats(provider.name).record(time.monotonic() - started, ok=bool(result))
+        if result:
+            logger.info(f"Fetched {provider.asset_class} rates from {provider.name}")
+        return result
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {p.name: self.stats(p.name).as_dict() for p in self._providers}
+
+
+provider_registry = ProviderRegistry()
+provider_registry.register(FiatJsonProvider('open.er-api', PROVIDER_URLS['open.er-api']))
+provider_registry.register(FiatJsonProvider('exchangerate-api', PROVIDER_URLS['exchangerate-api']))
+provider_registry.register(FiatJsonProvider('fawazahmed', PROVIDER_URLS['fawazahmed']))
+provider_registry.register(CoinGeckoProvider(PROVIDER_URLS['coingecko']))
+provider_registry.register(CoinCapProvider(PROVIDER_URLS['coincap']))
+provider_registry.register(CoinGeckoSingleProvider(PROVIDER_URLS['coingecko']))
+
+
+async def _fetch_asset_class(session: aiohttp.ClientSession, timeout: aiohttp.ClientTimeout,
+                             asset_class: str, wanted: Iterable[str], hedge: bool = False) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    missing = set(wanted)
+
+    async def _query(provider: RateProvider) -> Optional[Dict[str, float]]:
+        if not provider.currencies & missing:
+            return None
+        return await provider_registry.call(provider, session, timeout, set(missing))
+
+    def _merge(chunk: Optional[Dict[str, float]]) -> bool:
+        if chunk:
+            merged.update(chunk)
+            missing.difference_update(chunk)
+        return not missing
+
+    providers = provider_registry.ordered(asset_class)
+    if hedge:
+        await hedged_requests(
+            [(lambda p=p: _query(p), provider_registry.stats(p.name).hedge_delay()) for p in providers],
+            _merge,
+        )
+    else:
+        for provider in providers:
+            if _merge(await _query(provider)):
+                break
+
+    if missing:
+        logger.warning(f"Missing {asset_class} currencies after all providers: {missing}")
+    return merged
+
+
+async def _fetch_rates_unlocked(asset_classes: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    session_to_close = None
+    requested = list(asset_classes) if asset_classes else list(ASSET_CLASSES)
+
+    try:
         session_opt = get_http_session()
         if session_opt is None:
             session_to_close = aiohttp.ClientSession(
@@ -156,177 +840,35 @@ async def _fetch_rates_unlocked() -> Dict[str, float]:
         rates: Dict[str, float] = {}
         timeout = aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
 
-        fiat_sources = [
-            'https://open.er-api.com/v6/latest/USD',
-            'https://api.exchangerate-api.com/v4/latest/USD',
-            'https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@latest/v1/currencies/usd.json'
-        ]
-
-        async def _fetch_single_fiat(fiat_url: str):
-            source_host = _host_of(fiat_url)
-
-            async def _fiat(url=fiat_url):
-                resp = await session.get(url, timeout=timeout)
-                async with resp:
-                    resp.raise_for_status()
-                    return await resp.json(loads=ujson.loads)
-
-            fiat_data = await _with_retries(_fiat, source_host)
-
-            normalized = normalize_fiat_payload(fiat_data)
-            if normalized is not None:
-                logger.info(f"Fetched fiat rates from {source_host}")
-            return normalized
-
-        async def _fetch_all_fiat():
-            needed_fiat = set(ACTIVE_CURRENCIES)
-            merged: Dict[str, float] = {}
-            tasks = [asyncio.create_task(_fetch_single_fiat(url)) for url in fiat_sources]
-            try:
-                for coro in asyncio.as_completed(tasks):
-                    try:
-                        fiat_chunk = await coro
-                        if fiat_chunk:
-                            merged.update(fiat_chunk)
-                            if needed_fiat.issubset(merged.keys()):
-                                for t in tasks:
-                                    if not t.done():
-                                        t.cancel()
-                                return merged
-                    except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError) as fiat_error:
-                        logger.warning(f"Fiat source failed: {fiat_error}")
-                        continue
-            finally:
-                for t in tasks:
-                    if not t.done():
-                        t.cancel()
-                await asyncio.gather(*tasks, return_exceptions=True)
-            return merged or None
-
-        gecko_mapping = CRYPTO_ID_MAPPING['coingecko']
-        crypto_ids = ','.join(gecko_mapping.values())
-        url_cg = f'https://api.coingecko.com/api/v3/simple/price?ids={crypto_ids}&vs_currencies=usd'
-
-        async def _fetch_coingecko():
-            coingecko_host = _host_of(url_cg)
-            async def _cg():
-                resp = await session.get(url_cg, timeout=timeout)
-                async with resp:
-                    resp.raise_for_status()
-                    return await resp.json(loads=ujson.loads)
-            return await _with_retries(_cg, coingecko_host)
-
-        async def _fetch_all_crypto():
-            try:
-                cg_result = await _fetch_coingecko()
-                crypto_rates = {}
-                for cg_symbol, cg_id in gecko_mapping.items():
-                    if isinstance(cg_result, dict) and cg_id in cg_result and isinstance(cg_result[cg_id], dict):
-                        cg_usd_price = cg_result[cg_id].get('usd')
-                        try:
-                            cg_usd_price = float(cg_usd_price)
-                        except (TypeError, ValueError):
-                            cg_usd_price = None
-                        if cg_usd_price and cg_usd_price > 0:
-                            crypto_rates[cg_symbol] = 1.0 / cg_usd_price
-                logger.info("Fetched crypto rates from CoinGecko")
-                return crypto_rates
-            except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError) as coingecko_error:
-                logger.error(f"CoinGecko failed: {coingecko_error}")
-                return None
-
-        fiat_result, crypto_result = await asyncio.gather(
-            _fetch_all_fiat(), _fetch_all_crypto(), return_exceptions=True
+        results = await asyncio.gather(
+            *(_fetch_asset_class(session, timeout, c, ASSET_CLASSES[c], hedge=(c == 'fiat')) for c in requested),
+            return_exceptions=True,
         )
 
-        fiat_fetched = False
-        if isinstance(fiat_result, dict):
-            rates.update(fiat_result)
-            fiat_fetched = True
-        elif isinstance(fiat_result, Exception):
-            logger.error(f"Fiat fetch failed with exception: {fiat_result}")
-
-        if not fiat_fetched:
-            logger.error("All fiat currency sources failed!")
-
-        if isinstance(crypto_result, dict):
-            rates.update(crypto_result)
-        elif isinstance(crypto_result, Exception):
-            logger.error(f"Crypto fetch failed with exception: {crypto_result}")
-
-        all_currencies = set(ACTIVE_CURRENCIES + CRYPTO_CURRENCIES)
-        missing_currencies = all_currencies - set(rates.keys())
-
-        if missing_currencies:
-            logger.warning(f"Missing currencies after primary sources: {missing_currencies}")
-
-            missing_crypto = missing_currencies.intersection(set(CRYPTO_CURRENCIES))
-            if missing_crypto and COINCAP_API_KEY:
-                logger.info(f"Trying CoinCap v3 for: {missing_crypto}")
-                coincap_mapping = CRYPTO_ID_MAPPING['coincap']
-
-                async def _fetch_coincap_single(crypto_sym):
-                    asset_id = coincap_mapping.get(crypto_sym, crypto_sym.lower())
-                    url_cap = f'https://rest.coincap.io/v3/assets/{asset_id}?apiKey={COINCAP_API_KEY}'
-                    coincap_host = _host_of(url_cap)
-                    async def _cap(u=url_cap):
-                        resp = await session.get(u, timeout=timeout)
-                        async with resp:
-                            resp.raise_for_status()
-                            return await resp.json(loads=ujson.loads)
-                    try:
-                        alt_crypto_data = await _with_retries(_cap, coincap_host)
-                        if isinstance(alt_crypto_data, dict) and 'data' in alt_crypto_data:
-                            coincap_usd_price = float(alt_crypto_data['data'].get('priceUsd', 0))
-                            if coincap_usd_price > 0:
-                                logger.info(f"Fetched {crypto_sym} from CoinCap v3")
-                                return crypto_sym, 1.0 / coincap_usd_price
-                    except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError) as coincap_error:
-                        logger.warning(f"Failed to fetch {crypto_sym} from CoinCap v3: {coincap_error}")
-                    return crypto_sym, None
-
-                coincap_results = await asyncio.gather(
-                    *(_fetch_coincap_single(c) for c in missing_crypto),
-                    return_exceptions=True
-                )
-                for coincap_item in coincap_results:
-                    if isinstance(coincap_item, tuple) and coincap_item[1] is not None:
-                        rates[coincap_item[0]] = coincap_item[1]
-
-            elif missing_crypto:
-                logger.info(f"Trying CoinGecko individual requests for: {missing_crypto}")
-
-                for crypto_symbol in missing_crypto:
-                    if crypto_symbol in gecko_mapping:
-                        coin_id = gecko_mapping[crypto_symbol]
-                        url_gecko = f'https://api.coingecko.com/api/v3/simple/price?ids={coin_id}&vs_currencies=usd'
-                        request_host = _host_of(url_gecko)
-
-                        async def _gecko(u=url_gecko):
-                            resp = await session.get(u, timeout=timeout)
-                            async with resp:
-                                resp.raise_for_status()
-                                return await resp.json(loads=ujson.loads)
-
-                        try:
-                            gecko_data = await _with_retries(_gecko, request_host)
-                            if isinstance(gecko_data, dict) and coin_id in gecko_data:
-                                single_gecko_usd_price = float(gecko_data[coin_id].get('usd', 0))
-                                if single_gecko_usd_price > 0:
-                                    rates[crypto_symbol] = 1.0 / single_gecko_usd_price
-                                    logger.info(f"Fetched {crypto_symbol} from CoinGecko")
-                        except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError) as gecko_error:
-                            logger.warning(f"Failed to fetch {crypto_symbol} from CoinGecko: {gecko_error}")
+        fetched_at = time.time()
+        for asset_class, class_result in zip(requested, results):
+            if isinstance(class_result, dict):
+                # A class refresh must never overwrite codes owned by another class.
+                wanted = set(ASSET_CLASSES[asset_class])
+                class_result = {code: rate for code, rate in class_result.items() if code in wanted}
+                if class_result:
+                    rates.update(class_result)
+                    _class_fetched_at[asset_class] = fetched_at
+                    continue
+            if isinstance(class_result, Exception):
+                logger.error(f"{asset_class.capitalize()} fetch failed with exception: {class_result}")
+            logger.error(f"All {asset_class} currency sources failed!")
 
         rates = _store_rates(rates)
 
+        all_currencies = set().union(*(ASSET_CLASSES[c] for c in requested))
         final_missing = all_currencies - set(rates.keys())
         if final_missing:
             logger.error(f"Still missing currencies after all attempts: {final_missing}")
 
         return rates
 
-    except (RuntimeError, asyncio.TimeoutError, aiohttp.ClientError, ValueError, TypeError, KeyError) as refresh_error:
+    except _FETCH_ERRORS as refresh_error:
         logger.error(f"Critical error in _refresh_rates: {refresh_error}")
         return {}
     finally:
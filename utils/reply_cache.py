@@ -0,0 +1,63 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyCache:
+    """Bounded LRU of rendered replies (message texts or inline answers).
+
+    Keys start with the rate snapshot generation the text was rendered from; the
+    whole cache is dropped as soon as a key (or ``invalidate``) brings a new one.
+    """
+
+    __slots__ = ('maxsize', 'generation', 'hits', 'misses', '_entries')
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.generation: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple[Hashable, ...], Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        text = self._entries.get(key) if key[0] == self.generation else None
+        if text is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: Tuple[Hashable, ...], text: Any):
+        if self.maxsize <= 0:
+            return
+        if key[0] != self.generation:
+            if self.generation is not None and key[0] < self.generation:
+                return  # rendered from a snapshot that has already been replaced
+            self.invalidate(key[0])
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, generation: Optional[int] = None):
+        if self._entries:
+            logger.debug(f"Reply cache dropped {len(self._entries)} entries for generation {self.generation}")
+        self._entries.clear()
+        self.generation = generation
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'generation': self.generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
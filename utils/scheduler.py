@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import ClientError
+
+from utils.http import safe_bg_task
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshJob:
+    """Periodic job with its own cadence, jitter and error backoff.
+
+    ``func`` returns a truthy value on success; a falsy result, a timeout or an error
+    counts as a failure and reschedules the job after an exponential backoff capped
+    at ``interval``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        jitter: float = 0.1,
+        error_backoff: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.error_backoff = error_backoff
+        self.timeout = timeout
+        self.failures = 0
+        self.last_success: Optional[float] = None
+
+    def next_delay(self) -> float:
+        if self.failures:
+            base = min(self.error_backoff * (2 ** (self.failures - 1)), self.interval)
+        else:
+            base = self.interval
+        return max(base * (1 + random.uniform(-self.jitter, self.jitter)), 1.0)
+
+    async def run_once(self) -> bool:
+        try:
+            ok = bool(await asyncio.wait_for(self.func(), timeout=self.timeout))
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning("Refresh job %s timed out", self.name)
+            ok = False
+        except (ClientError, RuntimeError, ValueError, TypeError, KeyError):
+            logger.exception("Refresh job %s failed", self.name)
+            ok = False
+
+        if ok:
+            self.failures = 0
+            self.last_success = time.time()
+        else:
+            self.failures += 1
+        return ok
+
+    async def run(self):
+        while True:
+            delay = self.next_delay()
+            if self.failures:
+                logger.info("Refresh job %s retrying in %.0fs (failure #%d)", self.name, delay, self.failures)
+            await asyncio.sleep(delay)
+            if await self.run_once():
+                logger.info("Refresh job %s completed", self.name)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'interval': self.interval,
+            'failures': self.failures,
+            'age': time.time() - self.last_success if self.last_success else None,
+        }
+
+
+class RefreshScheduler:
+    def __init__(self):
+        self.jobs: Dict[str, RefreshJob] = {}
+
+    def add(self, job: RefreshJob) -> RefreshJob:
+        self.jobs[job.name] = job
+        return job
+
+    def start(self) -> List[asyncio.Task]:
+        return [safe_bg_task(job.run(), name=f"refresh_{name}") for name, job in self.jobs.items()]
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: job.status() for name, job in self.jobs.items()}
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Header: seq, generation, layout fingerprint (uint64) and fetched_at (float64), then one float64 per code.
+_HEADER_BYTES = 32
+_READ_ATTEMPTS = 100
+
+
+def _layout_fingerprint(codes: Sequence[str]) -> int:
+    return int.from_bytes(hashlib.blake2b(','.join(codes).encode(), digest_size=8).digest(), 'little')
+
+
+def _open(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    # The segment must outlive any single process (readers stay attached across writer restarts),
+    # so it is kept away from the resource tracker that would unlink it at exit.
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')  # type: ignore[attr-defined]
+        return segment
+
+
+class SharedRateSegment:
+    """USD rates of the current snapshot in a named shared-memory segment.
+
+    One writer publishes under a seqlock: ``seq`` is odd while a write is in
+    progress, and readers retry until they copy the payload between two equal,
+    even ``seq`` values. Readers only copy when ``generation`` changed.
+    """
+
+    def __init__(self, name: str, codes: Sequence[str], writer: bool = False):
+        self.name = name
+        self.codes = tuple(codes)
+        self.writer = writer
+        size = _HEADER_BYTES + 8 * len(self.codes)
+        fingerprint = _layout_fingerprint(self.codes)
+
+        created = False
+        if writer:
+            try:
+                self._shm = _open(name, create=True, size=size)
+                created = True
+            except FileExistsError:
+                # Left behind by a previous writer; keep its seq/generation so readers notice the next publish.
+                self._shm = _open(name)
+        else:
+            self._shm = _open(name)
+
+        if self._shm.size < size:
+            self._shm.close()
+            raise ValueError(f"Shared rate segment {name} is {self._shm.size} bytes, expected {size}")
+
+        buf = self._shm.buf
+        self._header = np.ndarray((3,), dtype=np.uint64, buffer=buf, offset=0)
+        self._fetched_at = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=24)
+        self._rates = np.ndarray((len(self.codes),), dtype=np.float64, buffer=buf, offset=_HEADER_BYTES)
+
+        if created or (writer and int(self._header[2]) != fingerprint):
+            self._header[0] = 0
+            self._header[1] = 0
+            self._header[2] = fingerprint
+            self._fetched_at[0] = 0.0
+            self._rates[:] = np.nan
+        elif int(self._header[2]) != fingerprint:
+            self.close()
+            raise ValueError(f"Shared rate segment {name} has a different currency layout")
+
+    @property
+    def generation(self) -> int:
+        return int(self._header[1])
+
+    def publish(self, generation: int, fetched_at: float, usd_rates: np.ndarray):
+        if not self.writer:
+            raise RuntimeError("Shared rate segment opened read-only")
+        seq = int(self._header[0])
+        self._header[0] = seq + 1
+        self._header[1] = generation
+        self._fetched_at[0] = fetched_at
+        self._rates[:] = usd_rates[:len(self.codes)]
+        self._header[0] = seq + 2
+
+    def read(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Consistent ``(generation, fetched_at, usd_rates)`` copy, or None if nothing was published."""
+        for _ in range(_READ_ATTEMPTS):
+            seq = int(self._header[0])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            generation = int(self._header[1])
+            fetched_at = float(self._fetched_at[0])
+            usd_rates = self._rates.copy()
+            if int(self._header[0]) == seq:
+                return (generation, fetched_at, usd_rates) if generation else None
+        logger.warning(f"Shared rate segment {self.name} kept changing during read")
+        return None
+
+    def close(self):
+        # Drop the numpy views first, SharedMemory.close() refuses while buffers are exported.
+        self._header = self._fetched_at = self._rates = None
+        self._shm.close()
+
+    def unlink(self):
+        if not hasattr(self._shm, '_track'):
+            # Pre-3.13 unlink() unregisters from the resource tracker, which _open() already did.
+            from multiprocessing import resource_tracker
+            resource_tracker.register(self._shm._name, 'shared_memory')  # type: ignore[attr-defined]
+        self._shm.unlink()
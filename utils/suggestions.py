@@ -0,0 +1,58 @@
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from utils.currency_lexicon import CURRENCY_LEXICON
+
+
+class SuggestionIndex:
+    """Character inverted index over lowercased currency words.
+
+    Scores match ``difflib.get_close_matches``: the characters an input shares with a word
+    bound its ``SequenceMatcher`` ratio from above (difflib's ``quick_ratio``), so the index
+    skips every word that cannot reach the cutoff and only the rest get the full ratio.
+    """
+
+    __slots__ = ('words', '_postings', 'suggest')
+
+    def __init__(self, words: Dict[str, str], cache_size: int = 1024):
+        self.words = {w.lower(): code for w, code in words.items()}
+        self._postings: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for word in self.words:
+            for char, count in Counter(word).items():
+                self._postings[char].append((word, count))
+        # Typos repeat (group chats especially), so recent inputs are answered from a memo.
+        self.suggest = lru_cache(maxsize=cache_size)(self._suggest)
+
+    def _suggest(self, text: str, max_results: int = 3, cutoff: float = 0.5) -> Tuple[str, ...]:
+        text = text.strip().lower()
+        if not text:
+            return ()
+        shared: Dict[str, int] = defaultdict(int)
+        for char, count in Counter(text).items():
+            for word, word_count in self._postings.get(char, ()):
+                shared[word] += min(count, word_count)
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(text)
+        scored = []
+        for word, common in shared.items():
+            if 2 * common / (len(text) + len(word)) < cutoff:
+                continue
+            matcher.set_seq1(word)
+            similarity = matcher.ratio()
+            if similarity >= cutoff:
+                # Among equal ratios more shared letters wins, so a transposition ("uds") beats a substitution.
+                scored.append((-similarity, -common, word != self.words[word].lower(), word))
+        suggestions: List[str] = []
+        for *_, word in sorted(scored):
+            code = self.words[word]
+            if code not in suggestions:
+                suggestions.append(code)
+                if len(suggestions) == max_results:
+                    break
+        return tuple(suggestions)
+
+
+SUGGESTION_INDEX = SuggestionIndex(CURRENCY_LEXICON.patterns)
@@ -0,0 +1,92 @@
+from typing import Dict, List, Tuple
+
+from config.languages import LANGUAGES
+from utils.formatter import currency_label, format_large_number
+
+_QUOTE_OPEN = "<blockquote expandable>"
+_QUOTE_CLOSE = "</blockquote>"
+
+
+class ReplyTemplate:
+    """Fixed text of every reply shape for one language and quote mode, built once at import."""
+
+    __slots__ = (
+        'fiat_block', 'crypto_block', 'inline_fiat_block', 'inline_crypto_block', 'inline_close',
+        'multi_fiat', 'multi_crypto', 'multi_open', 'multi_close', 'quote_open', 'quote_close',
+        'math_short', 'math_long',
+    )
+
+    def __init__(self, lang: str, use_quote: bool):
+        texts = LANGUAGES[lang]
+        fiat = texts.get('fiat_currencies', 'Fiat currencies')
+        crypto = texts.get('cryptocurrencies_output', 'Cryptocurrencies')
+        self.quote_open = _QUOTE_OPEN if use_quote else ""
+        self.quote_close = _QUOTE_CLOSE if use_quote else ""
+        self.fiat_block = f"\n{fiat}\n{self.quote_open}"
+        self.crypto_block = f"\n\n{crypto}\n{self.quote_open}"
+        self.inline_fiat_block = f"<b>{fiat}</b>\n\n{self.quote_open}"
+        self.inline_crypto_block = f"<b>{crypto}</b>\n\n{self.quote_open}"
+        self.inline_close = f"{self.quote_close}\n"
+        self.multi_fiat = fiat
+        self.multi_crypto = crypto
+        self.multi_open = self.quote_open
+        self.multi_close = f"{self.quote_close}\n\n"
+        self.math_short = texts.get('math_result_short', '{expression} = <b>{result}</b>').format
+        self.math_long = texts.get('math_result_long', '{expression}\n= <b>{result}</b>').format
+
+    def single(self, head: str, fiat_lines: List[str], crypto_lines: List[str], has_fiat: bool, has_crypto: bool) -> str:
+        parts = [head, "\n"]
+        if has_fiat:
+            parts += (self.fiat_block, "\n".join(fiat_lines), self.quote_close)
+        if has_crypto:
+            parts += (self.crypto_block, "\n".join(crypto_lines), self.quote_close)
+        return "".join(parts).strip()
+
+    def inline(self, head: str, fiat_lines: List[str], crypto_lines: List[str], has_fiat: bool, has_crypto: bool) -> str:
+        parts = [head, "\n\n"]
+        if has_fiat:
+            parts.append(self.inline_fiat_block)
+            parts += [f"{line}\n" for line in fiat_lines]
+            parts.append(self.inline_close)
+        if has_crypto:
+            parts.append(self.inline_crypto_block)
+            parts += [f"{line}\n" for line in crypto_lines]
+            parts.append(self.quote_close)
+        return "".join(parts)
+
+    def multi(self, blocks: List[Tuple[str, List[str], List[str]]], has_fiat: bool, has_crypto: bool) -> str:
+        parts = []
+        for head, fiat_lines, crypto_lines in blocks:
+            sections = []
+            if has_fiat:
+                sections.append(self.multi_fiat)
+                if fiat_lines:
+                    sections.append("\n".join(fiat_lines))
+            if has_crypto:
+                sections.append(self.multi_crypto)
+                if crypto_lines:
+                    sections.append("\n".join(crypto_lines))
+            parts += (head, "\n", self.multi_open, "\n\n".join(sections), self.multi_close)
+        return "".join(parts).strip()
+
+    def math(self, expression: str, result: float) -> str:
+        result_str = format_large_number(result)
+        render = self.math_short if len(expression) + len(result_str) <= 35 else self.math_long
+        return render(expression=expression, result=result_str)
+
+
+def amount_head(amount: float, code: str) -> str:
+    return f"{format_large_number(amount, is_original_amount=True)} {currency_label(code)}"
+
+
+def targeted(head: str, lines: List[str]) -> str:
+    return "\n= ".join([head, *lines])
+
+
+_TEMPLATES: Dict[Tuple[str, bool], ReplyTemplate] = {
+    (lang, use_quote): ReplyTemplate(lang, use_quote) for lang in LANGUAGES for use_quote in (False, True)
+}
+
+
+def get_template(lang: str, use_quote: bool = False) -> ReplyTemplate:
+    return _TEMPLATES[lang, bool(use_quote)]